@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+"""
+aio_runtime.py – run the controller on a single asyncio event loop
+
+`python3 main.py --runtime asyncio` replaces the five worker threads with
+callbacks and coroutines on one loop:
+
+ * serial reader    – `loop.add_reader()` on the port's file descriptor
+                      (a replayed capture is fed by a coroutine instead),
+ * supervisor       – a 10 ms periodic coroutine running `main.supervise`,
+ * worker steps     – `ChangeNotifier` callbacks that schedule main's
+                      throttle / steering / brake steps, once per burst,
+ * throttle output  – `LoopThrottleOutput`, write-coalescing like
+                      `ThrottleOutput` but flushed from the loop,
+ * jogs and brake motion – `LoopPulseTimer`, the `PulseTimer` interface on
+                      `loop.call_at`,
+ * link watchdog    – `LinkWatchdog.poll()` re-armed with `loop.call_at`,
+ * autonomy commands – `loop.add_reader()` on the command socket, expiry
+                      by `loop.call_at`.
+
+Nothing on the loop sleeps.  The event-log drainer and the latency socket
+keep their own threads.
+
+Compare the two runtimes on the same input – the scripted transmitter of
+sim.py by default, or a capture replayed on the kart itself:
+
+    python3 aio_runtime.py compare [--rate 1]
+    python3 aio_runtime.py compare --replay run.kcap
+"""
+import asyncio
+import functools
+import time
+from collections import deque
+
+from packets import BaudScanner, make_decoder
+from capture import Capture
+
+
+# ---------------------------------------------------------------------------
+# Loop-driven replacements for the threaded helpers
+# ---------------------------------------------------------------------------
+class _LoopPulse:
+    __slots__ = ("deadline", "off", "then", "handle")
+
+    def __init__(self, deadline, off, then):
+        self.deadline = deadline
+        self.off = off
+        self.then = then
+        self.handle = None
+
+
+class LoopPulseTimer:
+    """`PulseTimer` on an event loop; call it from the loop's thread only."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._active = {}
+        self._errors = deque(maxlen=1024)   # achieved − requested width (s)
+
+    def start(self, key, on, off, width: float, then=None) -> None:
+        self.cancel(key)
+        on()
+        p = _LoopPulse(self._loop.time() + width, off, then)
+        p.handle = self._loop.call_at(p.deadline, self._expire, key, p)
+        self._active[key] = p
+
+    def extend(self, key, width: float) -> bool:
+        p = self._active.get(key)
+        if p is None:
+            return False
+        p.handle.cancel()
+        p.deadline = self._loop.time() + width
+        p.handle = self._loop.call_at(p.deadline, self._expire, key, p)
+        return True
+
+    def cancel(self, key) -> bool:
+        p = self._active.pop(key, None)
+        if p is None:
+            return False
+        p.handle.cancel()
+        p.off()
+        return True
+
+    def cancel_all(self) -> None:
+        while self._active:
+            self.cancel(next(iter(self._active)))
+
+    def active(self, key) -> bool:
+        return key in self._active
+
+    def accuracy(self) -> dict:
+        errs = list(self._errors)
+        if not errs:
+            return dict(pulses=0, mean_us=None, max_us=None)
+        return dict(pulses=len(errs),
+                    mean_us=sum(errs) / len(errs) * 1e6,
+                    max_us=max(errs, key=abs) * 1e6)
+
+    def close(self) -> None:
+        self.cancel_all()
+
+    def _expire(self, key, p: _LoopPulse) -> None:
+        if self._active.get(key) is not p:
+            return
+        del self._active[key]
+        p.off()
+        self._errors.append(self._loop.time() - p.deadline)
+        if p.then is not None:
+            p.then()
+
+
+class LoopThrottleOutput:
+    """`ThrottleOutput` for the loop: `set_wiper` queues, a `call_soon`
+    callback sends only the newest value, `call_later` does the refresh
+    and the slew ramp."""
+
+    RETRY = 0.02                           # s, re-send after a failed readback
+
+    def __init__(self, throttle: "throttle.Throttle", loop: asyncio.AbstractEventLoop,
+                 refresh: float = None, verify: bool = False, slew: float = None):
+        from throttle import SlewLimiter
+        self.throttle = throttle
+        self.refresh = refresh
+        self.verify = verify
+        self.slew = SlewLimiter(slew) if slew else None
+        self._loop = loop
+        self._pending = None
+        self._target = None
+        self._last = None
+        self._dirty = False
+        self._scheduled = False
+        self._refresh_at = None
+        self._ramp_at = None
+
+        # statistics
+        self.requested = 0
+        self.written = 0
+        self.refreshes = 0
+        self.verify_failures = 0
+
+    @property
+    def enable(self):
+        return self.throttle.enable
+
+    def set_wiper(self, value: int) -> None:
+        self.requested += 1
+        self._pending = max(0, min(255, int(value)))
+        if not self._scheduled:
+            self._scheduled = True
+            self._loop.call_soon(self._write)
+
+    def enable_output(self, state: bool = True) -> None:
+        self.throttle.enable_output(state)
+
+    def disable(self) -> None:
+        self.throttle.enable_output(False)
+        self.set_wiper(0)
+
+    def flush(self, timeout: float = 1.0) -> bool:
+        self._write()
+        return True
+
+    def stats(self) -> dict:
+        sent = self.written - self.refreshes
+        return dict(requested=self.requested, written=self.written,
+                    refreshes=self.refreshes, saved=self.requested - sent,
+                    verify_failures=self.verify_failures,
+                    slew_limited=self.slew.limited if self.slew else 0)
+
+    def close(self) -> None:
+        self.flush()
+        for handle in (self._refresh_at, self._ramp_at):
+            if handle is not None:
+                handle.cancel()
+        self.throttle.close()
+
+    def _write(self) -> None:
+        self._scheduled = False
+        value, self._pending = self._pending, None
+        if value is None:
+            return
+        self._target = value
+        self._step()
+
+    def _step(self) -> None:
+        value = self._target
+        if self.slew is not None:
+            value = self.slew.next(value, self._last)
+        if value != self._last or self._dirty:
+            self._send(value)
+        if value != self._target and self._ramp_at is None:
+            self._ramp_at = self._loop.call_later(self.slew.tick, self._ramp)
+
+    def _ramp(self) -> None:
+        self._ramp_at = None
+        self._step()
+
+    def _refresh(self) -> None:
+        self._refresh_at = None
+        if self._last is not None:
+            self.refreshes += 1
+            self._send(self._last)
+
+    def _send(self, value: int) -> None:
+        self.throttle.set_wiper(value)
+        self._last = value
+        self.written += 1
+        self._dirty = bool(self.verify and self.throttle.read_wiper() != value)
+        if self._dirty:
+            self.verify_failures += 1      # keep it as _last and send it again
+        delay = self.RETRY if self._dirty else self.refresh
+        if self._refresh_at is not None:
+            self._refresh_at.cancel()
+            self._refresh_at = None
+        if delay:
+            self._refresh_at = self._loop.call_later(delay, self._refresh)
+
+
+class _Step:
+    """Runs a main.py worker step once per burst of change notifications,
+    and again after *repeat* s for as long as the step returns True."""
+
+    def __init__(self, loop, fn, repeat: float = None):
+        self._loop = loop
+        self._fn = fn
+        self._repeat = repeat
+        self._queued = False
+        self._again = None
+
+    def fire(self) -> None:
+        if not self._queued:
+            self._queued = True
+            self._loop.call_soon(self._run)
+
+    def _run(self) -> None:
+        self._queued = False
+        if self._again is not None:
+            self._again.cancel()
+            self._again = None
+        if self._fn() and self._repeat:
+            self._again = self._loop.call_later(self._repeat, self.fire)
+
+
+# ---------------------------------------------------------------------------
+# Runtime
+# ---------------------------------------------------------------------------
+def run(ctl, args, recorder=None) -> None:
+    """
+    Run the controller until *args.duration* expires (or Ctrl-C).  *ctl* is
+    the main module itself – its state, notifier, watchdog and worker steps
+    are shared with the threaded runtime.
+    """
+    asyncio.run(_main(ctl, args, recorder))
+
+
+async def _replay(cap: Capture, speed: float, dec, receive, recorder):
+    t0 = time.monotonic()
+    for t, data in cap:
+        wait = t0 + (t / speed if speed else 0.0) - time.monotonic()
+        await asyncio.sleep(max(0.0, wait))    # always yield to the steps
+        receive(dec, bytes(data), time.monotonic(), recorder)
+
+
+async def _supervisor(ctl, actuators):
+    while True:
+        ctl.supervise(actuators)
+        await asyncio.sleep(0.01)
+
+
+async def _main(ctl, args, recorder):
+    loop = asyncio.get_running_loop()
+    # nothing runs on the loop yet, so bring-up may block it
+    actuators, ser, dec = ctl.bring_up(
+        args, ctl.boot, recorder,
+        output=lambda th: LoopThrottleOutput(th, loop, refresh=ctl.THROTTLE_REFRESH,
+                                             slew=ctl.THROTTLE_SLEW),
+        timer=lambda: LoopPulseTimer(loop))
+    throttle, steering, brake = (actuators[k] for k in ("throttle", "steering", "brake"))
+
+    for name, step, act, channels, repeat in (
+            ("throttle", ctl.throttle_step, throttle, ctl.THROTTLE_CHANNELS, None),
+            ("steering", ctl.steering_step, steering, ctl.STEERING_CHANNELS, ctl.STEER_REPEAT),
+            ("brake", ctl.brake_step, brake, ctl.BRAKE_CHANNELS, None)):
+        s = _Step(loop, functools.partial(step, act), repeat)
+        ctl.changes.subscribe(name, channels, callback=s.fire)
+        s.fire()                               # same first pass as the workers
+
+    watchdog = ctl.watchdog
+    watchdog.start(throttle, steering, brake, thread=False)
+
+    def watch():
+        loop.call_at(watchdog.poll(), watch)
+
+    loop.call_soon(watch)
+
+    commands = ctl.commands
+    expire = None
+
+    def command_ready():
+        nonlocal expire
+        commands.drain()
+        if expire is not None:
+            expire.cancel()
+        t = commands.expiry()
+        expire = loop.call_at(t, commands.check) if t is not None else None
+
+    loop.add_reader(commands.fileno(), command_ready)
+    loop.add_reader(ctl.curve_link.fileno(), ctl.curve_link.drain)
+
+    tasks = [loop.create_task(_supervisor(ctl, actuators))]
+    ctl.arm(ctl.boot)
+    print(ctl.boot.report() if args.boot_report else ctl.boot.summary())
+    if ctl.links is not None:                  # --link: a reader per receiver
+        arb = ctl.links
+
+        def link_readable(link):
+            try:
+                data = link.ser.read(link.ser.in_waiting or 1)
+            except (OSError, TypeError):
+                loop.remove_reader(link.ser.fileno())
+                link.lost()                   # no reopen on the loop: it stays down
+                return
+            arb.receive(link, data, time.monotonic())
+
+        for link in arb.links:
+            if link.ser is not None:
+                link.ser.timeout = 0
+                loop.add_reader(link.ser.fileno(), link_readable, link)
+
+        def arbitrate():
+            loop.call_at(arb.poll(), arbitrate)
+
+        loop.call_soon(arbitrate)
+    elif args.replay:
+        ctl.receiver = make_decoder(args.format, channels=ctl.channel_map.channels)
+        tasks.append(loop.create_task(
+            _replay(Capture(args.replay), args.replay_speed, ctl.receiver,
+                    ctl.receive, recorder)))
+    else:
+        if ser is not None:                    # opened and checked by bring_up()
+            ser.timeout = 0
+            ctl.receiver, scan = dec, None
+        else:
+            import serial
+            scan = (BaudScanner(fmt=args.format, channels=ctl.channel_map.channels)
+                    if args.baud == "auto" else None)
+            ser = serial.Serial(args.port, scan.baud if scan else int(args.baud), timeout=0)
+            if scan is None:
+                ctl.receiver = make_decoder(args.format, channels=ctl.channel_map.channels)
+        rotate = None
+
+        def next_baud():
+            nonlocal rotate
+            ser.baudrate = scan.next()
+            ser.reset_input_buffer()
+            rotate = loop.call_later(scan.window, next_baud)
+
+        def readable():
+            data = ser.read(ser.in_waiting or 1)
+            if ctl.receiver is not None:
+                ctl.receive(ctl.receiver, data, time.monotonic(), recorder)
+            elif scan.feed(data):              # baud scan has locked
+                rotate.cancel()
+                ctl.receiver = scan.decoder
+                print(f"[Receiver] {scan.decoder.format} frames at {scan.baud} baud")
+                ctl.publish(scan.decoder, time.monotonic())
+                if recorder is not None:
+                    recorder.set_baud(scan.baud)
+
+        if scan is not None:
+            rotate = loop.call_later(scan.window, next_baud)
+        loop.add_reader(ser.fileno(), readable)
+
+    t_end = loop.time() + args.duration
+    try:
+        while not args.duration or loop.time() < t_end:
+            ctl.status(throttle, args.verbose)
+            await asyncio.sleep(1)
+    finally:
+        loop.remove_reader(commands.fileno())
+        for link in (ctl.links.links if ctl.links is not None else ()):
+            if link.ser is not None:
+                loop.remove_reader(link.ser.fileno())
+        if ser is not None and ctl.links is None:
+            loop.remove_reader(ser.fileno())
+            ser.close()
+        for t in tasks:
+            t.cancel()
+
+
+# ---------------------------------------------------------------------------
+# Runtime comparison
+# ---------------------------------------------------------------------------
+def _compare(argv=None) -> dict:
+    import argparse
+    import json
+    import os
+    import resource
+    import subprocess
+    import sys
+    import tempfile
+
+    ap = argparse.ArgumentParser(prog="aio_runtime.py compare",
+                                 description="threads vs asyncio on the same input")
+    ap.add_argument("--replay", metavar="FILE",
+                    help="run main.py from this capture (on the kart) instead of sim.py")
+    ap.add_argument("--rate", type=float, default=1.0,
+                    help="sim.py clock rate (keep at 1 for latency numbers)")
+    args = ap.parse_args(argv)
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    tmp = tempfile.mkdtemp(prefix="autokart-cmp-")
+    results = {}
+    for runtime in ("threads", "asyncio"):
+        dump = os.path.join(tmp, f"{runtime}.trace.json")
+        extra = ["--runtime", runtime, "--trace-dump", dump,
+                 "--trace-socket", os.path.join(tmp, f"{runtime}.sock")]
+        if args.replay:
+            cap = Capture(args.replay)
+            cmd = [sys.executable, "main.py", "--replay", args.replay,
+                   "--duration", f"{cap.duration + 1.0:.1f}",
+                   "--log", os.path.join(tmp, f"{runtime}.evlog")] + extra
+            cap.close()
+        else:
+            sim_json = os.path.join(tmp, f"{runtime}.sim.json")
+            cmd = [sys.executable, "sim.py", "--rate", str(args.rate),
+                   "--json", sim_json] + extra
+        before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        t0 = time.perf_counter()
+        subprocess.run(cmd, cwd=here, check=True, stdout=subprocess.DEVNULL)
+        wall = time.perf_counter() - t0
+        after = resource.getrusage(resource.RUSAGE_CHILDREN)
+        with open(dump) as f:
+            trace = json.load(f)
+        r = dict(wall_s=wall,
+                 user_s=after.ru_utime - before.ru_utime,
+                 sys_s=after.ru_stime - before.ru_stime,
+                 voluntary_cs=after.ru_nvcsw - before.ru_nvcsw,
+                 involuntary_cs=after.ru_nivcsw - before.ru_nivcsw)
+        # the tail of read→write is dominated by re-reads after e-stop / link
+        # wake-ups, so only the median is a fair command-latency figure
+        for sink in ("throttle", "steering", "brake"):
+            r[f"{sink}_p50_us"] = trace.get(f"read→write:{sink}", {}).get("p50_us")
+        if not args.replay:
+            with open(sim_json) as f:
+                sim = json.load(f)
+            for k in ("throttle_ms", "steering_ms", "brake_ms",
+                      "estop_enable_low_ms", "linkloss_enable_low_ms"):
+                r[k] = sim.get(k)
+        results[runtime] = r
+
+    print(f"{'':24s} {'threads':>12s} {'asyncio':>12s}")
+    for k in results["threads"]:
+        row = [results[rt][k] for rt in ("threads", "asyncio")]
+        print(f"{k:24s} " + " ".join("           —" if v is None else f"{v:12.3f}"
+                                      if isinstance(v, float) else f"{v:12d}" for v in row))
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) >= 2 and sys.argv[1] == "compare":
+        _compare(sys.argv[2:])
+    else:
+        print("usage: aio_runtime.py compare [--rate R] [--replay FILE]")
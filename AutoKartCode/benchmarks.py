@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+benchmarks.py – hot-path benchmarks with saved baselines
+
+Runs without hardware (SPI is sim.py's `FakeSpiDev`, GPIO the in-memory
+`gpio_backend.MockBackend`) and reports one set of metrics per benchmark:
+
+    packets     parse_packet + convert_packet on good and malformed lines,
+                PacketDecoder / FrameDecoder throughput, channel map with
+                and without the conditioning stage
+    contention  Shared publish and worker wake-up while the listener and
+                all worker threads run
+    throttle    Throttle.set_wiper and ThrottleOutput.set_wiper call cost
+    steering    set_direction call cost, achieved jog / fault-reset width
+    e2e         packet → actuator and e-stop latencies from sim.py --rate 1
+                (about 25 s; --quick leaves it out)
+
+Every metric says whether lower or higher is better, and how much it moves
+between identical runs (its noise floor).  Timed loops are repeated and
+the best repeat kept.
+
+    python3 benchmarks.py run [--only packets,steering] [--quick] [--out FILE]
+    python3 benchmarks.py save [--baseline FILE]         # run, keep as baseline
+    python3 benchmarks.py compare [RESULTS] [--baseline FILE] [--threshold 0.25]
+
+`compare` runs the suite (or loads RESULTS) and exits 1 if any metric got
+worse than the baseline by more than the threshold *and* its noise floor,
+or if a baseline metric of a benchmark that ran is missing from the results.
+Baselines are per machine: save one on the kart's Pi, compare there.
+Correctness – decoders, channel map against convert_packet, watchdog and
+e-stop transitions on mock GPIO – is checked by `python3 -m pytest` (tests/).
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(HERE, "bench_baseline.json")
+
+# better: "lower" / "higher"; noise: absolute change that is not a regression
+Metric = namedtuple("Metric", "value unit better noise")
+
+
+def _best(fn, repeat: int = 7) -> float:
+    """Shortest of *repeat* runs of fn() (seconds)."""
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def _pct(xs, q: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * q))]
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks
+# ---------------------------------------------------------------------------
+def bench_packets() -> dict:
+    from packets import (parse_packet, convert_packet, PacketDecoder, FrameDecoder,
+                         _synthetic_stream, _synthetic_frames)
+    good = [line.decode() for line in _synthetic_stream(5000).splitlines()
+            if b"\xff" not in line]
+    bad = ["", "992,992", "992,992,1809,1809,1809,1809,1809", "abc,def,1,2,3,4",
+           "99x,992,1809,1809,1809,1809", "-5,992,1809,1809,1809,1809",
+           "1" * 200, ",,,,,", "992;992;1809;1809;1809;1809", "\x00\xff\x10"] * 500
+
+    def lines(batch):
+        for s in batch:
+            pkt = parse_packet(s)
+            if pkt:
+                convert_packet(pkt)
+
+    csv, frames = _synthetic_stream(), _synthetic_frames()
+
+    def decode(cls, data):
+        dec = cls()
+        for i in range(0, len(data), 256):
+            if dec.feed(data[i:i + 256]):
+                convert_packet(dec.latest())
+
+    t_good, t_bad = _best(lambda: lines(good)), _best(lambda: lines(bad))
+    from main import MAPPED
+    from channel_map import ChannelMap
+    from conditioning import Conditioner
+    frames6 = [parse_packet(s) for s in good[:5000]]
+    cmap, cond = ChannelMap.default(MAPPED), Conditioner(order=MAPPED)
+    t_map = _best(lambda: [cmap(f) for f in frames6], 3)
+    t_cond = _best(lambda: [cond(f) for f in frames6], 3)
+    t_csv = _best(lambda: decode(PacketDecoder, csv), 3)
+    t_bin = _best(lambda: decode(FrameDecoder, frames), 3)
+    n = 20000                             # records in each synthetic stream
+    return {
+        "parse_convert_good": Metric(len(good) / t_good, "lines/s", "higher", 0.0),
+        "parse_convert_malformed": Metric(len(bad) / t_bad, "lines/s", "higher", 0.0),
+        "decoder_csv": Metric(n / t_csv, "records/s", "higher", 0.0),
+        "decoder_binary": Metric(n / t_bin, "records/s", "higher", 0.0),
+        "map_raw": Metric(len(frames6) / t_map, "frames/s", "higher", 0.0),
+        "map_conditioned": Metric(len(frames6) / t_cond, "frames/s", "higher", 0.0),
+    }
+
+
+def bench_contention(seconds: float = 2.0, rate: float = 1000.0) -> dict:
+    """The listener publishing at *rate* while every worker waits and reads."""
+    import main as ctl
+    from notify import ChangeNotifier
+    state, changes = ctl.Shared(), ChangeNotifier()
+    stop = threading.Event()
+    reads = [0]
+    publish = []
+
+    def worker(sub, keepalive):
+        n = 0
+        while not stop.is_set():
+            sub.wait(keepalive)
+            state.read().mapped
+            n += 1
+        reads[0] += n
+
+    def supervisor():
+        n, seq = 0, 0
+        while not stop.is_set():
+            snap = state.read()
+            if state.changed(seq):
+                seq = snap.seq
+            n += 1
+            time.sleep(0.01)
+        reads[0] += n
+
+    subs = [(changes.subscribe("throttle", ctl.THROTTLE_CHANNELS), None),
+            (changes.subscribe("steering", ctl.STEERING_CHANNELS), ctl.STEER_REPEAT),
+            (changes.subscribe("brake", ctl.BRAKE_CHANNELS), None)]
+    threads = [threading.Thread(target=worker, args=a, daemon=True) for a in subs]
+    threads.append(threading.Thread(target=supervisor, daemon=True))
+    for t in threads:
+        t.start()
+    period = 1.0 / rate
+    t_end = time.monotonic() + seconds
+    i = 0
+    while time.monotonic() < t_end:
+        raw = (992 + (i % 400), 992 - (i % 300), 1809, 1809, 1809,
+               1809 if i % 50 else 992)
+        t0 = time.perf_counter()
+        mapped = ctl.channel_map(raw)
+        state.publish(raw, mapped)
+        changes.update(mapped)
+        publish.append(time.perf_counter() - t0)
+        i += 1
+        time.sleep(period)
+    stop.set()
+    changes.wake()
+    for t in threads:
+        t.join(1.0)
+    wake = [x for sub, _ in subs for x in sub.latency]
+    us = 1e6
+    return {
+        "publish_p50": Metric(_pct(publish, 0.5) * us, "µs", "lower", 5.0),
+        "publish_p99": Metric(_pct(publish, 0.99) * us, "µs", "lower", 20.0),
+        "wake_p50": Metric(_pct(wake, 0.5) * us, "µs", "lower", 20.0),
+        "wake_p99": Metric(_pct(wake, 0.99) * us, "µs", "lower", 200.0),
+        "packets": Metric(i / seconds, "/s", "higher", rate * 0.1),
+    }
+
+
+def _fake_hardware():
+    """SPI from sim.py, GPIO in memory; before the drivers are imported."""
+    import gpio_backend
+    import sim
+    if "throttle" not in sys.modules:
+        sim.install_spidev()
+    return gpio_backend.MockBackend()
+
+
+def bench_throttle(n: int = 20000) -> dict:
+    backend = _fake_hardware()
+    from throttle import Throttle, ThrottleOutput
+    th = Throttle(backend=backend)
+    vals = [i & 0xFF for i in range(n)]
+
+    def direct():
+        for v in vals:
+            th.set_wiper(v)
+
+    out = ThrottleOutput(th)
+
+    def queued():
+        for v in vals:
+            out.set_wiper(v)
+
+    t_direct, t_queued = _best(direct), _best(queued)
+    out.close()
+    th.close()
+    return {
+        "set_wiper": Metric(t_direct / n * 1e6, "µs", "lower", 0.5),
+        "output_set_wiper": Metric(t_queued / n * 1e6, "µs", "lower", 0.5),
+    }
+
+
+def bench_steering(jogs: int = 40, width: float = 0.02) -> dict:
+    backend = _fake_hardware()
+    from steering import Steering
+    st = Steering(backend=backend)
+    st.JOG_PULSE = width
+    pins = (26, 22)                       # jog-neg, jog-pos
+    calls = []
+    for i in range(jogs):
+        t = time.perf_counter()
+        st.set_direction(1 if i % 2 else -1)
+        calls.append(time.perf_counter() - t)
+        time.sleep(width + st.FAULT_PULSE + 0.01)
+    st.close()
+
+    def widths(pin_set, nominal):
+        rise, out = {}, []
+        for e in backend.edges:
+            if e.pin in pin_set:
+                if e.level:
+                    rise[e.pin] = e.t
+                elif e.pin in rise:
+                    out.append(abs(e.t - rise.pop(e.pin) - nominal))
+        return out
+
+    jog, fault = widths(pins, width), widths((12,), st.FAULT_PULSE)
+    us = 1e6
+    return {
+        "set_direction": Metric(_pct(calls, 0.5) * us, "µs", "lower", 5.0),
+        "jog_error_p50": Metric(_pct(jog, 0.5) * us, "µs", "lower", 100.0),
+        "jog_error_max": Metric(max(jog) * us, "µs", "lower", 1000.0),
+        "fault_error_p50": Metric(_pct(fault, 0.5) * us, "µs", "lower", 100.0),
+    }
+
+
+def bench_e2e() -> dict:
+    """sim.py at 1× with the in-memory GPIO backend, in its own process."""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        path = f.name
+    try:
+        subprocess.run([sys.executable, os.path.join(HERE, "sim.py"), "--rate", "1",
+                        "--gpio", "mock", "--json", path],
+                       cwd=HERE, check=True, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, timeout=300)
+        with open(path) as f:
+            rep = json.load(f)
+    finally:
+        os.unlink(path)
+    keys = ("throttle_ms", "steering_ms", "brake_ms", "estop_enable_low_ms",
+            "estop_wiper_zero_ms", "estop_brake_ms", "linkloss_enable_low_ms")
+    return {k[:-3]: Metric(rep[k], "ms", "lower", 2.0) for k in keys
+            if rep.get(k) is not None}
+
+
+BENCHMARKS = dict(packets=bench_packets, contention=bench_contention,
+                  throttle=bench_throttle, steering=bench_steering, e2e=bench_e2e)
+
+
+# ---------------------------------------------------------------------------
+# Running, saving, comparing
+# ---------------------------------------------------------------------------
+def run(names=None) -> dict:
+    results = {}
+    for name in names or BENCHMARKS:
+        print(f"[Bench] {name} …", file=sys.stderr, flush=True)
+        for metric, m in BENCHMARKS[name]().items():
+            results[f"{name}.{metric}"] = m._asdict()
+    return dict(host=platform.node(), machine=platform.machine(),
+                python=platform.python_version(), time=time.time(), results=results)
+
+
+def compare(base: dict, new: dict, threshold: float = 0.25, names=None) -> list:
+    """[(key, base, new, change)] for metrics worse than *threshold* (relative)
+    and their noise floor (absolute); change > 0 is worse.  A baseline metric
+    missing from *new* is listed with new and change None – *names* limits
+    that to the benchmarks that were run."""
+    worse = []
+    for key, b in base["results"].items():
+        if names is not None and key.split(".")[0] not in names:
+            continue
+        n = new["results"].get(key)
+        if n is None:
+            worse.append((key, b, None, None))
+            continue
+        if not b["value"]:
+            continue
+        delta = n["value"] - b["value"]
+        if b["better"] == "higher":
+            delta = -delta
+        change = delta / abs(b["value"])
+        if change > threshold and delta > b["noise"]:
+            worse.append((key, b, n, change))
+    return worse
+
+
+def _table(res: dict, base: dict = None) -> str:
+    out = [f"  {'metric':38s} {'value':>12s} {'':8s}" + ("  vs baseline" if base else "")]
+    for key, m in res["results"].items():
+        line = f"  {key:38s} {m['value']:12,.2f} {m['unit']:8s}"
+        b = base and base["results"].get(key)
+        if b and b["value"]:
+            line += f"  {(m['value'] - b['value']) / abs(b['value']):+7.1%}"
+        out.append(line)
+    return "\n".join(out)
+
+
+def _load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save(res: dict, path: str) -> None:
+    with open(path, "w") as f:
+        json.dump(res, f, indent=1)
+    print(f"[Bench] wrote {path}")
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Hot-path benchmarks and regression check")
+    ap.add_argument("cmd", choices=("run", "save", "compare"))
+    ap.add_argument("results", nargs="?", help="compare: saved results instead of a new run")
+    ap.add_argument("--only", help=f"comma-separated: {','.join(BENCHMARKS)}")
+    ap.add_argument("--quick", action="store_true", help="leave out the e2e sim run")
+    ap.add_argument("--out", help="run: also write the results here")
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--threshold", type=float, default=0.25,
+                    help="relative change that counts as a regression")
+    args = ap.parse_args()
+    names = args.only.split(",") if args.only else [
+        n for n in BENCHMARKS if not (args.quick and n == "e2e")]
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        ap.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    if args.cmd == "compare":
+        if not os.path.exists(args.baseline):
+            print(f"[Bench] no baseline at {args.baseline} – run `save` first", file=sys.stderr)
+            sys.exit(2)
+        base = _load(args.baseline)
+        if args.results:
+            res = _load(args.results)
+        else:
+            names = [n for n in names if any(k.startswith(n + ".") for k in base["results"])]
+            res = run(names)
+        if base.get("host") != res.get("host"):
+            print(f"[Bench] note: baseline from {base.get('host')}, this is {res.get('host')}")
+        print(_table(res, base))
+        worse = compare(base, res, args.threshold, names)
+        for key, b, n, change in worse:
+            if n is None:
+                print(f"MISSING    {key}: in the baseline, not reported any more")
+                continue
+            print(f"REGRESSION {key}: {b['value']:,.2f} → {n['value']:,.2f} {n['unit']} "
+                  f"({change:+.0%} worse)")
+        missing = sum(n is None for _, _, n, _ in worse)
+        print(f"[Bench] {len(worse) - missing} regression(s) beyond {args.threshold:.0%}"
+              + (f", {missing} metric(s) missing" if missing else ""))
+        sys.exit(1 if worse else 0)
+
+    res = run(names)
+    print(_table(res))
+    if args.cmd == "save":
+        _save(res, args.baseline)
+    elif args.out:
+        _save(res, args.out)
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+boot.py – parallel bring-up, self-tests and a startup timing report
+
+`Boot` times every phase of startup from the moment the process was
+created (not from when Python got round to main()), runs independent
+phases on their own threads, and collects pass / fail for the self-tests:
+
+    boot = Boot()                    # "interpreter + imports" ends here
+    ...
+    boot.lap("setup")                # … and "setup" here
+    built = boot.parallel(dict(throttle=make_throttle, receiver=open_port))
+    boot.check("gpio", gpio_test, devices)
+    if not boot.ok: ...              # GPIO-24 stays low
+    print(boot.report())
+
+main.py's `bring_up()` uses it to build the throttle, steering and brake
+drivers and open the receiver at the same time – each importing its own
+driver modules, so the imports overlap the port and SPI waits – then runs
+the self-tests below; the drive enable (GPIO-24) is only armed once every
+one of them passed.
+
+Self-tests
+    wiper_test     MCP4162: write two values and read each back over MISO
+    gpio_test      every output line claimed exactly once, GPIO-24 low
+    first_packet   the receiver delivers a valid frame within the timeout
+
+Run stand-alone on the kart to check the hardware without driving it:
+
+    python3 boot.py [--port /dev/ttyAMA0] [--baud auto] [--skip wiper,…]
+"""
+import os
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+Phase = namedtuple("Phase", "name t_start t_end thread ok detail")
+
+
+class BootError(Exception):
+    """A self-test failed; the message says what was wrong."""
+
+
+def _boot_origin():
+    """time.monotonic() value at power-on (CLOCK_BOOTTIME zero), or None."""
+    try:
+        m0 = time.monotonic()
+        since = time.clock_gettime(time.CLOCK_BOOTTIME)
+        m1 = time.monotonic()
+    except (AttributeError, OSError):
+        return None
+    return (m0 + m1) / 2 - since
+
+
+def _process_start(origin) -> float:
+    """time.monotonic() value at which this process was created."""
+    if origin is None:
+        return time.monotonic()
+    try:
+        with open("/proc/self/stat") as f:
+            ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        return origin + ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.monotonic()
+
+
+class Boot:
+    def __init__(self):
+        self.t_boot = _boot_origin()       # power-on on the monotonic clock
+        self.t0 = _process_start(self.t_boot)
+        self.phases = []
+        self.t_ready = None
+        self._lock = threading.Lock()
+        self._lap = self.t0
+        self.lap("interpreter + imports")
+
+    # ------------------------------------------------------------------
+    def lap(self, name: str) -> None:
+        """Record a phase from the end of the previous lap until now."""
+        t, self._lap = self._lap, time.monotonic()
+        self._add(name, t, True, "")
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time the block; an exception marks the phase failed and propagates."""
+        t = time.monotonic()
+        box = {"detail": ""}
+        try:
+            yield box
+        except Exception as e:
+            self._add(name, t, False, f"{type(e).__name__}: {e}")
+            raise
+        self._add(name, t, True, box["detail"])
+
+    def parallel(self, tasks: dict, timeout: float = None) -> dict:
+        """Run {name: fn} on one thread each; {name: result or None if it failed}."""
+        results = {}
+
+        def run(name, fn):
+            try:
+                with self.phase(name):
+                    results[name] = fn()
+            except Exception:
+                results[name] = None
+
+        threads = [threading.Thread(target=run, args=(n, fn), name=f"boot-{n}", daemon=True)
+                   for n, fn in tasks.items()]
+        for t in threads:
+            t.start()
+        t_end = None if timeout is None else time.monotonic() + timeout
+        for t in threads:
+            t.join(None if t_end is None else max(0.0, t_end - time.monotonic()))
+        for name, t in zip(tasks, threads):
+            if t.is_alive():
+                self._add(name, time.monotonic(), False, "timed out")
+                results[name] = None
+        return results
+
+    def check(self, name: str, fn, *args) -> bool:
+        """Run a self-test: it returns a detail string or raises."""
+        try:
+            with self.phase(name) as p:
+                p["detail"] = fn(*args) or ""
+            return True
+        except Exception:
+            return False
+
+    def note(self, name: str, detail: str) -> None:
+        """Set the detail text of phase *name*."""
+        with self._lock:
+            self.phases = [p._replace(detail=detail) if p.name == name else p
+                           for p in self.phases]
+
+    def skip(self, name: str, why: str) -> None:
+        self._add(name, time.monotonic(), True, f"skipped – {why}")
+
+    def ready(self) -> None:
+        self.t_ready = time.monotonic()
+
+    @property
+    def ok(self) -> bool:
+        return all(p.ok for p in self.phases)
+
+    def failures(self) -> list:
+        return [p for p in self.phases if not p.ok]
+
+    def _add(self, name, t_start, ok, detail):
+        with self._lock:
+            self.phases.append(Phase(name, t_start, time.monotonic(),
+                                     threading.current_thread().name, ok, detail))
+
+    # ------------------------------------------------------------------
+    def summary(self) -> str:
+        if self.t_ready is None:
+            return f"[Boot] FAILED: {', '.join(p.name for p in self.failures())}"
+        line = f"[Boot] ready {(self.t_ready - self.t0) * 1e3:.0f} ms after process start"
+        if self.t_boot is not None:
+            line += f", {self.t_ready - self.t_boot:.1f} s after power-on"
+        return line
+
+    def report(self, width: int = 40) -> str:
+        """Per-phase table with a timeline bar, in start order."""
+        end = max([p.t_end for p in self.phases] + [self.t_ready or 0.0])
+        span = max(end - self.t0, 1e-9)
+        out = [self.summary(),
+               f"  {'phase':24s} {'start':>8s} {'ms':>8s}  {'':{width}s}  thread"]
+        for p in sorted(self.phases, key=lambda p: p.t_start):
+            a = int((p.t_start - self.t0) / span * width)
+            b = max(a + 1, int((p.t_end - self.t0) / span * width))
+            bar = " " * a + "█" * (b - a)
+            out.append(f"  {p.name:24s} {(p.t_start - self.t0) * 1e3:8.1f} "
+                       f"{(p.t_end - p.t_start) * 1e3:8.1f}  {bar:{width}s}  "
+                       f"{p.thread:12s} {'ok  ' if p.ok else 'FAIL'} {p.detail}")
+        return "\n".join(out)
+
+    def as_dict(self) -> dict:
+        return dict(ok=self.ok, ready_ms=None if self.t_ready is None else
+                    (self.t_ready - self.t0) * 1e3,
+                    phases=[dict(name=p.name, start_ms=(p.t_start - self.t0) * 1e3,
+                                 ms=(p.t_end - p.t_start) * 1e3, thread=p.thread,
+                                 ok=p.ok, detail=p.detail) for p in self.phases])
+
+
+# ---------------------------------------------------------------------------
+# Self-tests
+# ---------------------------------------------------------------------------
+def wiper_test(throttle, values=(0x55, 0x00)) -> str:
+    """Write each value to the MCP4162 and read it back (needs MISO wired)."""
+    for v in values:
+        throttle.set_wiper(v)
+        got = throttle.read_wiper()
+        if got != v:
+            raise BootError(f"wiper wrote {v}, read back {got}")
+    return f"wrote/read {', '.join(map(str, values))}"
+
+
+def gpio_test(devices: dict, enable=None) -> str:
+    """
+    *devices*: {owner: [output lines]}.  Every line must be open
+    and claimed by one owner only; *enable* (GPIO-24) must still be low.
+    """
+    claimed = {}
+    for owner, devs in devices.items():
+        for dev in devs:
+            if dev.closed:
+                raise BootError(f"{owner}: a line is closed")
+            pin = str(dev.pin)                       # "GPIO24"
+            if pin in claimed:
+                raise BootError(f"{pin} claimed by {claimed[pin]} and {owner}")
+            claimed[pin] = owner
+    if enable is not None and enable.value:
+        raise BootError("GPIO-24 is already high")
+    return f"{len(claimed)} lines: {', '.join(sorted(claimed, key=lambda p: int(p[4:])))}"
+
+
+def outputs(obj) -> list:
+    """The output lines an actuator object holds (its `gpio_backend` groups)."""
+    from gpio_backend import LineGroup
+    inner = getattr(obj, "throttle", None)           # ThrottleOutput → Throttle
+    found = [line for v in vars(obj).values() if isinstance(v, LineGroup)
+             for line in v.lines()]
+    return found + (outputs(inner) if inner is not None else [])
+
+
+def first_packet(ser, dec, receive, timeout: float, recorder=None) -> float:
+    """Read until *dec* has a valid frame; seconds it took."""
+    t0 = time.monotonic()
+    while not dec.count:
+        if timeout and time.monotonic() - t0 > timeout:
+            raise BootError(f"no valid packet within {timeout:g} s")
+        receive(dec, ser.read(ser.in_waiting or 1), time.monotonic(), recorder)
+    return time.monotonic() - t0
+
+
+# ---------------------------------------------------------------------------
+# Stand-alone hardware check
+# ---------------------------------------------------------------------------
+if __name__ == "__main__":
+    import argparse
+    import main as ctl
+    ap = argparse.ArgumentParser(description="Bring the kart hardware up, self-test, release")
+    ap.add_argument("--port", default="/dev/ttyAMA0")
+    ap.add_argument("--baud", default=ctl.UART_BAUD)
+    ap.add_argument("--format", choices=("auto", "csv", "binary"), default=ctl.RX_FORMAT)
+    ap.add_argument("--boot-timeout", type=float, default=10.0)
+    ap.add_argument("--skip", default="", help="comma-separated: wiper,gpio,receiver")
+    args = ap.parse_args()
+    args.replay, args.boot_skip = None, args.skip
+    boot = Boot()
+    actuators, ser, dec = ctl.bring_up(args, boot)     # prints the report on failure
+    boot.ready()
+    print(boot.report())
+    for act in actuators.values():
+        act.close()
+    if ser is not None:
+        ser.close()
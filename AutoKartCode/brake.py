@@ -5,49 +5,154 @@ brake.py – linear-actuator brake driver (Pi 5)
 Wiring (BCM):
     extend (forward)  → GPIO 16
     retract (reverse) → GPIO 17
+
+The actuator has no position feedback, so position (0.0 = fully retracted,
+1.0 = fully extended) is estimated from the time spent energised in each
+direction, using the calibrated stroke times below.  Motions run on a
+`PulseTimer` and never block the caller:
+
+    RETRACTED ──extend()──▶ EXTENDING ──▶ EXTENDED
+        ▲                                    │
+        └──── RETRACTING ◀──retract()────────┘
+
+A new command preempts a motion still in progress, `stop()` halts it where
+it is (STOPPED), and `apply()` / `release()` do nothing if the brake is
+already at, or already heading for, that end.  Both lines are one
+`gpio_backend` group: starting a motion releases the other direction and
+energises this one in a single write, so they are never both on.
 """
+import threading
+import time
 from time import sleep
-from gpiozero import LED
+import gpio_backend
+from pulse import PulseTimer
+from eventlog import log, SRC_BRAKE, EV_BRAKE_MOVE, EV_BRAKE_SETTLE, EV_BRAKE_STOP
+from latency import TRACER
+
+RETRACTED, EXTENDING, EXTENDED, RETRACTING, STOPPED = (
+    "RETRACTED", "EXTENDING", "EXTENDED", "RETRACTING", "STOPPED")
+
+
+class _Motion:
+    __slots__ = ("direction", "t0", "pos0")
+
+    def __init__(self, direction, t0, pos0):
+        self.direction = direction
+        self.t0 = t0
+        self.pos0 = pos0
 
 
 class Brake:
-    def __init__(self, fwd_pin: int = 16, rev_pin: int = 17):
-        self._fwd = LED(fwd_pin)   # extend / apply brake
-        self._rev = LED(rev_pin)   # retract / release brake
+    # --- calibration (seconds for a full stroke) --------------------------
+    EXTEND_STROKE = 5.0
+    RETRACT_STROKE = 5.0
+    OVERDRIVE = 0.10        # keep driving 10 % of a stroke into the end stop
+
+    def __init__(self, fwd_pin: int = 16, rev_pin: int = 17,
+                 position: float = 0.0, timer: PulseTimer = None, backend=None):
+        # fwd: extend / apply brake, rev: retract / release brake
+        self._io = (backend or gpio_backend.default()).claim(
+            "brake", dict(fwd=fwd_pin, rev=rev_pin))
+        self._timer = timer or PulseTimer("brake-motion")
+        self._lock = threading.Lock()          # serialises callers
+        self._pos = position
+        self._motion = None
+        self._state = RETRACTED if position <= 0.0 else EXTENDED if position >= 1.0 else STOPPED
+        self._idle = threading.Event()
+        self._idle.set()
         print(f"[Brake] Initialised – EXT GPIO{fwd_pin}, RET GPIO{rev_pin}")
 
+    # ---------- status --------------------------------------------------
+    @property
+    def state(self) -> str:
+        return self._state
+
+    @property
+    def position(self) -> float:
+        """Estimated position, 0.0 retracted … 1.0 extended."""
+        m = self._motion
+        if m is None:
+            return self._pos
+        return self._estimate(m, time.monotonic())
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until the current motion has finished."""
+        return self._idle.wait(timeout)
+
     # ---------- high-level actions ------------------------------------
-    def extend(self, duration: float = 5.0):
-        """Apply brake for *duration* seconds."""
-        print("[Brake] Extending actuator …")
-        self._rev.off()
-        self._fwd.on()
-        sleep(duration)
-        self._fwd.off()
-
-    def retract(self, duration: float = 5.0):
-        """Release brake for *duration* seconds."""
-        print("[Brake] Retracting actuator …")
-        self._fwd.off()
-        self._rev.on()
-        sleep(duration)
-        self._rev.off()
+    def extend(self, duration: float = None):
+        """Start extending; for *duration* s, or to the end stop if None."""
+        self._move(+1, duration)
+
+    def retract(self, duration: float = None):
+        """Start retracting; for *duration* s, or to the end stop if None."""
+        self._move(-1, duration)
 
     def stop(self):
         """De-energise both outputs immediately."""
-        self._fwd.off()
-        self._rev.off()
+        with self._lock:
+            log(SRC_BRAKE, EV_BRAKE_STOP)
+            if not self._timer.cancel("motion"):
+                self._io.set(fwd=0, rev=0)
 
     def apply(self):
-        """Fallback apply method to match expected interface."""
-        print("[Brake] Applying brake (via apply()) …")
-        self.extend(1.0)
+        """Apply the brake fully; no-op if already applied or applying."""
+        if self._state not in (EXTENDED, EXTENDING):
+            self.extend()
+
+    def release(self):
+        """Release the brake fully; no-op if already released or releasing."""
+        if self._state not in (RETRACTED, RETRACTING):
+            self.retract()
+
+    # ---------- motion --------------------------------------------------
+    def _move(self, direction: int, duration: float = None):
+        with self._lock:
+            stroke = self.EXTEND_STROKE if direction > 0 else self.RETRACT_STROKE
+            if duration is None:
+                end = 1.0 if direction > 0 else 0.0
+                duration = (abs(end - self.position) + self.OVERDRIVE) * stroke
+
+            self._timer.cancel("motion")           # settles any running motion
+            pin, other = ("fwd", "rev") if direction > 0 else ("rev", "fwd")
+            motion = _Motion(direction, time.monotonic(), self._pos)
+            io = self._io
+
+            def on():
+                io.set(**{other: 0, pin: 1})
+                if TRACER.enabled:
+                    TRACER.write("brake")
+
+            def off():
+                io.set(**{pin: 0})
+                self._settle(motion)
+
+            self._idle.clear()
+            self._motion = motion
+            self._state = EXTENDING if direction > 0 else RETRACTING
+            log(SRC_BRAKE, EV_BRAKE_MOVE, direction, int(duration * 1000), int(self._pos * 1000))
+            self._timer.start("motion", on, off, duration)
+
+    def _estimate(self, m: _Motion, now: float) -> float:
+        stroke = self.EXTEND_STROKE if m.direction > 0 else self.RETRACT_STROKE
+        return max(0.0, min(1.0, m.pos0 + m.direction * (now - m.t0) / stroke))
+
+    def _settle(self, m: _Motion):
+        """Motion *m* has ended (timer thread or a preempting caller)."""
+        if self._motion is not m:
+            return
+        self._pos = self._estimate(m, time.monotonic())
+        self._motion = None
+        self._state = (RETRACTED if self._pos <= 0.0 else
+                       EXTENDED if self._pos >= 1.0 else STOPPED)
+        self._idle.set()
+        log(SRC_BRAKE, EV_BRAKE_SETTLE, int(self._pos * 1000))
 
     # ---------- housekeeping / context manager ------------------------
     def close(self):
         self.stop()
-        self._fwd.close()
-        self._rev.close()
+        self._timer.close()
+        self._io.close()
         print("[Brake] GPIOs released")
 
     def __enter__(self):
@@ -63,7 +168,9 @@ if __name__ == "__main__":
         with Brake() as brk:
             brk.apply()
             sleep(2)
-            brk.retract(3)
+            print(f"[Brake] {brk.state} at {brk.position:.2f} – reversing")
+            brk.retract()
+            brk.wait()
+            print(f"[Brake] {brk.state} at {brk.position:.2f}")
     except KeyboardInterrupt:
         pass
-
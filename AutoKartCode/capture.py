@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+capture.py – timestamped record / replay of receiver byte streams
+
+A capture is two append-only files that can both be memory-mapped:
+
+    run.kcap        64-byte header, then the raw bytes exactly as read
+    run.kcap.idx    16-byte header, then one 16-byte entry per read():
+                        u64 t_ns     arrival time, ns after the header's t0
+                        u32 offset   into run.kcap's payload
+                        u32 length
+
+kcap header: magic "AKCAP\\0", u16 version, u32 baud, f64 wall-clock start,
+f64 monotonic start, 32-byte port name.
+
+`CaptureWriter` is what `uart_listener --record` uses: two buffered
+`write()` calls per read, no per-read syscall.  `Capture` maps a recording
+for random access and `ReplayPort` is a serial-like object that plays one
+back into `uart_listener` at 1×, N× or as fast as possible (speed 0).
+
+    python3 capture.py info run.kcap
+    python3 capture.py record /dev/ttyACM0 115200 run.kcap
+    python3 capture.py bench run.kcap
+"""
+import mmap
+import struct
+import time
+
+MAGIC = b"AKCAP\x00"
+IDX_MAGIC = b"AKCAPIDX"
+VERSION = 1
+HEADER = struct.Struct("<6sHIdd32s4x")     # 64 bytes
+IDX_HEADER = struct.Struct("<8sII")        # magic, version, entry size
+ENTRY = struct.Struct("<QII")              # 16 bytes
+
+
+class CaptureWriter:
+    def __init__(self, path: str, port: str = "", baud: int = 0, flush_every: int = 64):
+        self.t0 = time.monotonic()
+        self._data = open(path, "wb")
+        self._idx = open(path + ".idx", "wb")
+        self._data.write(HEADER.pack(MAGIC, VERSION, baud, time.time(), self.t0,
+                                     port.encode()[:32]))
+        self._idx.write(IDX_HEADER.pack(IDX_MAGIC, VERSION, ENTRY.size))
+        self._offset = 0
+        self._flush_every = flush_every
+        self.count = 0
+
+    def set_baud(self, baud: int) -> None:
+        """Fill in the header's baud rate once auto-detection has found it."""
+        pos = self._data.tell()
+        self._data.seek(8)                  # after magic + version
+        self._data.write(struct.pack("<I", baud))
+        self._data.seek(pos)
+
+    def write(self, data: bytes, t: float = None) -> None:
+        """Append one read's worth of bytes, received at monotonic time *t*."""
+        if not data:
+            return
+        if t is None:
+            t = time.monotonic()
+        self._data.write(data)
+        self._idx.write(ENTRY.pack(int((t - self.t0) * 1e9), self._offset, len(data)))
+        self._offset += len(data)
+        self.count += 1
+        if self.count % self._flush_every == 0:
+            self.flush()
+
+    def flush(self) -> None:
+        self._data.flush()
+        self._idx.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self._data.close()
+        self._idx.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class Capture:
+    """Read-only, memory-mapped view of a recording."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = open(path, "rb")
+        self._fi = open(path + ".idx", "rb")
+        self._data = mmap.mmap(self._fd.fileno(), 0, access=mmap.ACCESS_READ)
+        self._idx = mmap.mmap(self._fi.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.version, self.baud, self.t0_wall, self.t0, port = \
+            HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC or IDX_HEADER.unpack_from(self._idx, 0)[0] != IDX_MAGIC:
+            raise ValueError(f"{path}: not a kart capture")
+        self.port = port.rstrip(b"\0").decode(errors="replace")
+        # a crash can leave a torn last entry – ignore it
+        self._n = (len(self._idx) - IDX_HEADER.size) // ENTRY.size
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, i: int):
+        """(seconds since start, memoryview of the bytes) for read *i*."""
+        if not 0 <= i < self._n:
+            raise IndexError(i)
+        t_ns, off, length = ENTRY.unpack_from(self._idx, IDX_HEADER.size + i * ENTRY.size)
+        base = HEADER.size + off
+        return t_ns * 1e-9, memoryview(self._data)[base:base + length]
+
+    def __iter__(self):
+        for i in range(self._n):
+            yield self[i]
+
+    @property
+    def duration(self) -> float:
+        return self[self._n - 1][0] if self._n else 0.0
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._data) - HEADER.size
+
+    def close(self) -> None:
+        self._data.close()
+        self._idx.close()
+        self._fd.close()
+        self._fi.close()
+
+
+class ReplayPort:
+    """
+    Serial-port stand-in that releases a capture's reads on their original
+    schedule scaled by *speed* (0 = as fast as possible).  Supports the
+    subset of pyserial used by `uart_listener`.
+    """
+
+    def __init__(self, capture: Capture, speed: float = 1.0, timeout: float = 0.1):
+        self.capture = capture
+        self.speed = speed
+        self.timeout = timeout
+        self._i = 0
+        self._pending = b""
+        self._start = time.monotonic()
+
+    @property
+    def finished(self) -> bool:
+        return self._i >= len(self.capture) and not self._pending
+
+    def _due(self, i: int) -> float:
+        t, _ = self.capture[i]
+        return self._start + (t / self.speed if self.speed else 0.0)
+
+    @property
+    def in_waiting(self) -> int:
+        n = len(self._pending)
+        if self._i < len(self.capture) and time.monotonic() >= self._due(self._i):
+            n += len(self.capture[self._i][1])
+        return n
+
+    def read(self, size: int = 1) -> bytes:
+        if not self._pending:
+            if self._i >= len(self.capture):
+                time.sleep(self.timeout)
+                return b""
+            wait = self._due(self._i) - time.monotonic()
+            if wait > self.timeout:
+                time.sleep(self.timeout)
+                return b""
+            if wait > 0:
+                time.sleep(wait)
+            self._pending = bytes(self.capture[self._i][1])
+            self._i += 1
+        out, self._pending = self._pending[:size], self._pending[size:]
+        return out
+
+    def close(self) -> None:
+        pass
+
+
+# ---------------------------------------------------------------------------
+# Command line
+# ---------------------------------------------------------------------------
+def _bench(path: str) -> None:
+    from packets import make_decoder, convert_packet
+    cap = Capture(path)
+    dec = make_decoder("auto")
+    t0 = time.perf_counter()
+    for _, data in cap:
+        if dec.feed(data):
+            convert_packet(dec.latest())
+    dt = time.perf_counter() - t0
+    s = dec.stats()
+    print(f"{len(cap)} reads, {cap.nbytes} bytes, {cap.duration:.1f} s of link time")
+    print(f"{s['frames']} frames, {s['malformed']} malformed, {s['overrun']} overrun "
+          f"in {dt * 1e3:.1f} ms ({(s['frames'] + s['overrun']) / dt:,.0f} frames/s)")
+
+
+def _record(port: str, baud: int, path: str) -> None:
+    import serial
+    with serial.Serial(port, baud, timeout=0.1) as ser, \
+            CaptureWriter(path, port, baud) as rec:
+        print(f"Recording {port} @ {baud} → {path}  (Ctrl-C to stop)")
+        try:
+            while True:
+                data = ser.read(ser.in_waiting or 1)
+                rec.write(data, time.monotonic())
+        except KeyboardInterrupt:
+            print(f"\n{rec.count} reads recorded")
+
+
+if __name__ == "__main__":
+    import sys
+    cmd = sys.argv[1] if len(sys.argv) > 1 else ""
+    if cmd == "info" and len(sys.argv) == 3:
+        c = Capture(sys.argv[2])
+        print(f"port {c.port!r} @ {c.baud} baud, started "
+              f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(c.t0_wall))}")
+        print(f"{len(c)} reads, {c.nbytes} bytes, {c.duration:.3f} s")
+    elif cmd == "record" and len(sys.argv) == 5:
+        _record(sys.argv[2], int(sys.argv[3]), sys.argv[4])
+    elif cmd == "bench" and len(sys.argv) == 3:
+        _bench(sys.argv[2])
+    else:
+        print("usage: capture.py info FILE | record PORT BAUD FILE | bench FILE")
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+channel_map.py – config-driven mapping from receiver channels to commands
+
+A profile (JSON) lists the mapped outputs in order; each one names a source
+channel, a transform and an optional clamp:
+
+    {"name": "default", "channels": 6, "outputs": [
+        {"name": "throttle", "source": 0, "transform": "linear",
+         "in": [992, 1809], "out": [0, 255]},
+        {"name": "steering", "source": 1, "transform": "deadband",
+         "center": 992, "width": 0},
+        {"name": "brake", "source": 2, "transform": "threshold",
+         "op": ">", "level": 992, "invert": true},
+        ...]}
+
+Transforms
+    linear     "in": [a, b] → "out": [c, d], input clamped to the range
+               (b < a inverts), optional "deadband": half-width around
+               "center" (default: middle of "in") that maps to the centre
+    threshold  1 if  x <op> "level"  else 0   (op: > >= < <=)
+    equality   1 if x is "value" (or one of "values") else 0
+    deadband   −1 below "center" − "width", +1 above "center" + "width", else 0
+    "invert": true swaps 1/0 (threshold, equality) or the sign (deadband);
+    "true" / "false" replace the 1 / 0 outputs; "clamp": [lo, hi].
+
+main.py looks outputs up by name: the six of `PACKET_OUTPUTS` plus
+"steer_effort" (the steering stick's deflection, −1000 … +1000, used by
+the proportional steering mode).
+
+`ChannelMap` compiles a profile once: every output becomes a lookup table
+indexed directly by the raw u16 value (plus a short clamped table for
+anything outside that range), and the per-frame kernel is generated as a
+single expression of table lookups.  `DEFAULT_PROFILE` reproduces
+`packets.convert_packet` bit for bit in its `PACKET_OUTPUTS`.
+
+    python3 channel_map.py dump > profile.json
+    python3 channel_map.py check [profile.json]
+    python3 channel_map.py bench [profile.json]
+"""
+import json
+import operator
+from array import array
+
+DEFAULT_PROFILE = {
+    "name": "default",
+    "channels": 6,
+    "outputs": [
+        # throttle 1809-992 → 0-255 (reversed)
+        {"name": "throttle", "source": 0, "transform": "linear",
+         "in": [992, 1809], "out": [0, 255]},
+        # steering >992:1, ==992:0, <992:-1
+        {"name": "steering", "source": 1, "transform": "deadband",
+         "center": 992, "width": 0},
+        # brake >992→0 else 1
+        {"name": "brake", "source": 2, "transform": "threshold",
+         "op": ">", "level": 992, "invert": True},
+        # e-stop A/B <1809→1 else 0
+        {"name": "estop_a", "source": 3, "transform": "threshold",
+         "op": "<", "level": 1809},
+        {"name": "estop_b", "source": 4, "transform": "threshold",
+         "op": "<", "level": 1809},
+        # mode 172→1 (auto) else 0 (remote)
+        {"name": "mode", "source": 5, "transform": "equality", "value": 172},
+        # steering deflection per mille, + = left, 992 → 0
+        {"name": "steer_effort", "source": 1, "transform": "linear",
+         "in": [172, 1812], "out": [-1000, 1000]},
+    ],
+}
+
+# convert_packet()'s outputs, in its order
+PACKET_OUTPUTS = ("throttle", "steering", "brake", "estop_a", "estop_b", "mode")
+
+FULL = 1 << 16          # full lookup tables cover every u16 channel value
+
+_OPS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+
+
+# ---------------------------------------------------------------------------
+# Transforms: (output spec) → (function of one raw value, breakpoints)
+# ---------------------------------------------------------------------------
+def _linear(o):
+    a, b = o["in"]
+    c, d = o["out"]
+    lo, hi = min(a, b), max(a, b)
+    span = b - a
+    if not span:
+        raise ValueError(f"output {o.get('name')!r}: linear input range {a}-{b} is empty")
+    centre = o.get("center", (a + b) / 2)
+    band = o.get("deadband", 0)
+
+    def f(x):
+        x = max(lo, min(hi, x))
+        if band and abs(x - centre) <= band:
+            x = centre
+        return int(c + ((x - a) / span) * (d - c))
+
+    return f, (lo, hi, centre - band, centre + band)
+
+
+def _threshold(o):
+    op, level = _OPS[o["op"]], o["level"]
+    return (lambda x: op(x, level)), (level,)
+
+
+def _equality(o):
+    values = frozenset(o["values"] if "values" in o else (o["value"],))
+    return (lambda x: x in values), tuple(values)
+
+
+def _deadband(o):
+    c, w = o["center"], o.get("width", 0)
+    return (lambda x: 1 if x > c + w else -1 if x < c - w else 0), (c - w, c + w)
+
+
+_TRANSFORMS = dict(linear=_linear, threshold=_threshold, equality=_equality,
+                   deadband=_deadband)
+
+
+def _compile_output(o):
+    """→ (values, lo, hi): output for raw x is values[clamp(x, lo, hi) - lo]."""
+    kind = o["transform"]
+    if kind not in _TRANSFORMS:
+        raise ValueError(f"output {o.get('name')!r}: unknown transform {kind!r}")
+    f, points = _TRANSFORMS[kind](o)
+    if kind in ("threshold", "equality"):
+        yes, no = o.get("true", 1), o.get("false", 0)
+        if o.get("invert"):
+            yes, no = no, yes
+        g = lambda x: yes if f(x) else no          # noqa: E731
+    elif kind == "deadband" and o.get("invert"):
+        g = lambda x: -f(x)                        # noqa: E731
+    else:
+        g = f
+    if "clamp" in o:
+        c_lo, c_hi = o["clamp"]
+        h = g
+        g = lambda x: max(c_lo, min(c_hi, h(x)))   # noqa: E731
+
+    # the transform is constant beyond its outermost breakpoints
+    lo = int(min(points)) - 1
+    hi = int(max(points)) + 2
+    return [g(x) for x in range(lo, hi + 1)], lo, hi
+
+
+def _table(vals, lead: int = 0, trail: int = 0):
+    """*vals* as the narrowest array, padded with *lead* copies of the first
+    value and *trail* of the last (built by repetition: startup cost)."""
+    for code in ("b", "h", "i"):
+        try:
+            return (array(code, vals[:1]) * lead + array(code, vals) +
+                    array(code, vals[-1:]) * trail)
+        except OverflowError:
+            pass
+    raise ValueError("output values do not fit 32 bits")
+
+
+class ChannelMap:
+    """A compiled profile; call it with one frame of raw channel values."""
+
+    def __init__(self, profile: dict, order=None):
+        self.profile = profile
+        self.name = profile.get("name", "")
+        self.channels = int(profile["channels"])
+        outputs = profile["outputs"]
+        if order is not None:
+            by_name = {o["name"]: o for o in outputs}
+            missing = [n for n in order if n not in by_name]
+            if missing:
+                raise ValueError(f"profile {self.name!r} lacks outputs {missing}")
+            outputs = [by_name[n] for n in order]
+        self.names = tuple(o["name"] for o in outputs)
+
+        env = {}
+        loads, fast, slow = [], [], []
+        for i, o in enumerate(outputs):
+            src = o["source"]
+            if not 0 <= src < self.channels:
+                raise ValueError(f"output {o['name']!r}: source {src} out of range")
+            vals, lo, hi = _compile_output(o)
+            # short table over the breakpoints, inputs clamped onto its ends
+            env[f"S{i}"] = _table(vals)
+            slow.append(f"S{i}[(x{src} if {lo} <= x{src} <= {hi} else "
+                        f"{lo} if x{src} < {lo} else {hi}) - {lo}]")
+            # full table over every u16 input: one index per output per frame
+            if hi < FULL:
+                env[f"F{i}"] = _table(vals[max(0, -lo):], max(0, lo), FULL - 1 - hi)
+                neg = vals[0] if lo >= 0 else slow[-1]
+                fast.append(f"F{i}[x{src}] if x{src} >= 0 else {neg}")
+            else:
+                fast.append(slow[-1])
+            load = f"x{src} = v[{src}]"
+            if load not in loads:
+                loads.append(load)
+        # generated once: a single expression per frame, no loop or call per
+        # output; a value above the full table's range falls back to the
+        # clamped short tables
+        body = "\n    ".join(loads)
+        src = (f"def kernel(v):\n    {body}\n    try:\n        return ["
+               + ",\n                ".join(fast) + "]\n    except IndexError:\n"
+               "        return [" + ",\n                ".join(slow) + "]\n")
+        # batch version: the same lookups inlined in one comprehension over
+        # a row-major buffer
+        ch = self.channels
+        rows = ",\n                 ".join(fast)
+        for s in sorted({o["source"] for o in outputs}):
+            rows = rows.replace(f"x{s}", f"v[i + {s}]")
+        src += (f"\ndef batch(v, n):\n    try:\n        return [[{rows}]\n"
+                f"                for i in range(0, n * {ch}, {ch})]\n"
+                f"    except IndexError:\n"
+                f"        return [kernel(v[i:i + {ch}]) for i in range(0, n * {ch}, {ch})]\n")
+        exec(compile(src, f"<channel_map {self.name}>", "exec"), env)
+        self._kernel = env["kernel"]
+        self._batch = env["batch"]
+        self.source = src
+
+    @classmethod
+    def default(cls, order=None) -> "ChannelMap":
+        return cls(DEFAULT_PROFILE, order)
+
+    @classmethod
+    def load(cls, path: str, order=None) -> "ChannelMap":
+        with open(path) as f:
+            return cls(json.load(f), order)
+
+    def __call__(self, vals) -> list:
+        return self._kernel(vals)
+
+    def map_batch(self, frames, n: int) -> list:
+        """Map *n* row-major frames (e.g. `PacketDecoder.frames`)."""
+        return self._batch(frames, n)
+
+
+# ---------------------------------------------------------------------------
+# Command line
+# ---------------------------------------------------------------------------
+def _check(cmap: ChannelMap) -> int:
+    """Differences against convert_packet over every input that matters."""
+    import random
+    from packets import convert_packet
+    cmap = ChannelMap(cmap.profile, PACKET_OUTPUTS)
+    neutral = [992, 992, 1809, 1809, 1809, 1809]
+    bad = 0
+    for ch in range(6):
+        for x in range(-1000, 70000):
+            v = list(neutral)
+            v[ch] = x
+            if cmap(v) != convert_packet(v):
+                bad += 1
+    rnd = random.Random(2)
+    for _ in range(200_000):
+        v = [rnd.randint(0, 2047) for _ in range(6)]
+        if cmap(v) != convert_packet(v):
+            bad += 1
+    return bad
+
+
+def _bench(cmap: ChannelMap, n: int = 200_000) -> None:
+    """Map *n* frames from one row-major buffer, keeping every result."""
+    import random
+    import time
+    from packets import convert_packet
+    cmap = ChannelMap(cmap.profile, PACKET_OUTPUTS)
+    rnd = random.Random(1)
+    ch = cmap.channels
+    frames = array("i", (rnd.randint(172, 1811) for _ in range(n * ch)))
+    runs = [("ChannelMap()", lambda: [cmap(frames[i:i + ch]) for i in range(0, n * ch, ch)]),
+            ("map_batch", lambda: cmap.map_batch(frames, n))]
+    if ch == 6:
+        runs.insert(0, ("convert_packet",
+                        lambda: [convert_packet(frames[i:i + ch]) for i in range(0, n * ch, ch)]))
+    for name, fn in runs:
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        print(f"{name:16s} : {n / dt:12,.0f} frames/s")
+
+
+if __name__ == "__main__":
+    import sys
+    cmd = sys.argv[1] if len(sys.argv) > 1 else ""
+    cmap = ChannelMap.load(sys.argv[2]) if len(sys.argv) > 2 else ChannelMap.default()
+    if cmd == "dump":
+        json.dump(cmap.profile, sys.stdout, indent=2)
+        print()
+    elif cmd == "check":
+        bad = _check(cmap)
+        print(f"{cmap.name}: {'bit-identical to' if not bad else f'{bad} differences from'} "
+              f"convert_packet")
+        sys.exit(1 if bad else 0)
+    elif cmd == "bench":
+        _bench(cmap)
+    else:
+        print("usage: channel_map.py dump|check|bench [PROFILE]")
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+command_link.py – autonomy setpoints over a Unix datagram socket
+
+The autonomy stack (the `cmd_vel_bridge` node in ros2_ws/src/auto_kart_control,
+or the stand-in publisher below) sends one 20-byte datagram per command to
+/tmp/autokart-cmd.sock:
+
+    4s   b"AKC1"     magic
+    u32  seq         +1 per command
+    f64  t_sent      CLOCK_MONOTONIC seconds at send (same host)
+    i16  throttle    0-255 wiper value
+    i8   steering    +1 left / 0 / −1 right
+    u8   brake       1 = apply
+
+`CommandListener` keeps only the newest command and drops it once it is
+older than `max_age`; sequence order is only enforced against a command
+that is still fresh, so a restarted publisher counting from 1 again is
+taken as soon as the old one has expired.  A stalled or crashed publisher
+turns into "no command" – throttle 0, steering stopped, brake applied –
+instead of the last setpoint being held.  The workers in main.py consume it while the
+mode channel says autonomous.
+
+`on_change()` runs whenever the newest command changes *or* expires.  The
+threaded runtime calls `start()`; the asyncio runtime instead watches
+`fileno()` and calls `drain()` / `check()` from its loop.
+
+    python3 command_link.py publish [--rate 50] [--pattern sweep|fixed]
+    python3 command_link.py listen
+    python3 command_link.py bench
+"""
+import os
+import selectors
+import socket
+import struct
+import threading
+import time
+from collections import namedtuple
+
+SOCKET = "/tmp/autokart-cmd.sock"
+MAGIC = b"AKC1"
+CMD = struct.Struct("<4sIdhbB")            # 20 bytes
+
+Command = namedtuple("Command", "seq t_sent t_rx throttle steering brake")
+
+
+def encode(seq: int, throttle: int, steering: int, brake: int, t_sent: float = None) -> bytes:
+    if t_sent is None:
+        t_sent = time.monotonic()
+    return CMD.pack(MAGIC, seq & 0xFFFFFFFF, t_sent, throttle, steering, brake)
+
+
+class CommandListener:
+    def __init__(self, path: str = SOCKET, max_age: float = 0.2, on_change=None):
+        self.path = path
+        self.max_age = max_age
+        self.on_change = on_change
+        self._cmd = None
+        self._expired = True
+        self._stop = threading.Event()
+        if os.path.exists(path):
+            os.unlink(path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(path)
+        self._sock.setblocking(False)
+
+        # statistics
+        self.received = 0
+        self.stale = 0            # already older than max_age on arrival
+        self.malformed = 0
+        self.out_of_order = 0
+        self.expired = 0          # publisher went quiet while a command was live
+
+    # ------------------------------------------------------------------
+    # Consumer side
+    # ------------------------------------------------------------------
+    def latest(self):
+        """The newest command if it is still fresh, else None."""
+        cmd = self._cmd
+        if cmd is None or time.monotonic() - cmd.t_sent > self.max_age:
+            return None
+        return cmd
+
+    def stats(self) -> dict:
+        return dict(received=self.received, stale=self.stale, malformed=self.malformed,
+                    out_of_order=self.out_of_order, expired=self.expired,
+                    live=self.latest() is not None)
+
+    # ------------------------------------------------------------------
+    # Driving it
+    # ------------------------------------------------------------------
+    def fileno(self) -> int:
+        return self._sock.fileno()
+
+    def drain(self) -> None:
+        """Read every queued datagram (non-blocking)."""
+        changed = False
+        while True:
+            try:
+                data = self._sock.recv(64)
+            except BlockingIOError:
+                break
+            changed |= self._accept(data, time.monotonic())
+        if changed and self.on_change is not None:
+            self.on_change()
+
+    def expiry(self):
+        """When the newest command goes stale (monotonic), or None."""
+        if self._cmd is None or self._expired:
+            return None
+        return self._cmd.t_sent + self.max_age
+
+    def check(self) -> None:
+        """Report the newest command going stale (call at `expiry()`)."""
+        t = self.expiry()
+        if t is not None and time.monotonic() >= t:
+            self._expired = True
+            self.expired += 1
+            if self.on_change is not None:
+                self.on_change()
+
+    def start(self) -> None:
+        threading.Thread(target=self._run, name="command-link", daemon=True).start()
+
+    def close(self) -> None:
+        self._stop.set()
+        self._sock.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    # ------------------------------------------------------------------
+    def _run(self):
+        sel = selectors.DefaultSelector()
+        sel.register(self._sock, selectors.EVENT_READ)
+        while not self._stop.is_set():
+            t = self.expiry()
+            if sel.select(None if t is None else max(0.0, t - time.monotonic())):
+                self.drain()
+            self.check()
+
+    def _accept(self, data: bytes, t_rx: float) -> bool:
+        if len(data) != CMD.size:
+            self.malformed += 1
+            return False
+        magic, seq, t_sent, throttle, steering, brake = CMD.unpack(data)
+        if magic != MAGIC or steering not in (-1, 0, 1):
+            self.malformed += 1
+            return False
+        self.received += 1
+        if t_rx - t_sent > self.max_age:
+            self.stale += 1
+            return False
+        old = self._cmd
+        if (old is not None and t_rx - old.t_sent <= self.max_age
+                and ((seq - old.seq) & 0xFFFFFFFF) >= 0x80000000):
+            self.out_of_order += 1
+            return False
+        self._cmd = Command(seq, t_sent, t_rx, max(0, min(255, throttle)), steering, brake)
+        self._expired = False
+        return True
+
+
+class CommandSender:
+    """Client side; what the ROS bridge does, in Python.  Never blocks: a
+    command the controller has no room for is dropped and counted."""
+
+    def __init__(self, path: str = SOCKET):
+        self.path = path
+        self.seq = 0
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+
+        # statistics
+        self.dropped = 0          # queue full, or controller not running (yet)
+
+    def send(self, throttle: int, steering: int = 0, brake: int = 0) -> float:
+        t = time.monotonic()
+        self.seq += 1
+        try:
+            self._sock.sendto(encode(self.seq, throttle, steering, brake, t), self.path)
+        except (BlockingIOError, FileNotFoundError, ConnectionRefusedError):
+            self.dropped += 1
+        return t
+
+    def close(self) -> None:
+        self._sock.close()
+
+
+# ---------------------------------------------------------------------------
+# Stand-in publisher / tools
+# ---------------------------------------------------------------------------
+def publish(rate: float = 50.0, pattern: str = "sweep", path: str = SOCKET,
+            duration: float = 0.0, stop: threading.Event = None) -> int:
+    """Send commands at *rate* Hz: a throttle/steering sweep or a fixed setpoint."""
+    tx = CommandSender(path)
+    period = 1.0 / rate
+    t0 = time.monotonic()
+    nxt = t0
+    try:
+        while not (stop is not None and stop.is_set()):
+            t = time.monotonic() - t0
+            if duration and t >= duration:
+                break
+            if pattern == "fixed":
+                tx.send(120, 0, 0)
+            else:                              # 8 s cycle
+                phase = t % 8.0
+                throttle = int(255 * min(phase, 8.0 - phase) / 4.0)
+                steering = 1 if phase < 2 else -1 if 4 <= phase < 6 else 0
+                tx.send(throttle, steering, 1 if phase > 7.5 else 0)
+            nxt += period
+            time.sleep(max(0.0, nxt - time.monotonic()))
+    finally:
+        tx.close()
+    return tx.seq
+
+
+def _bench(n: int = 5000, rate: float = 2000.0) -> None:
+    """Send → on_change latency through the socket, no controller."""
+    path = f"/tmp/autokart-cmd-bench-{os.getpid()}.sock"
+    lat = []
+    done = threading.Event()
+
+    def seen():
+        cmd = rx.latest()
+        if cmd is not None:
+            lat.append(time.monotonic() - cmd.t_sent)
+        if rx.received >= n:
+            done.set()
+
+    rx = CommandListener(path, max_age=1.0, on_change=seen)
+    rx.start()
+    tx = CommandSender(path)
+    for i in range(n):
+        tx.send(i & 0xFF)
+        time.sleep(1.0 / rate)
+    done.wait(5.0)
+    rx.close()
+    lat.sort()
+    us = 1e6
+    print(f"{rx.received} commands at {rate:g}/s, {len(lat)} wake-ups, {rx.stale} stale")
+    print(f"send→listener  p50 {lat[len(lat) // 2] * us:7.1f} µs  "
+          f"p99 {lat[int(len(lat) * 0.99)] * us:7.1f} µs  max {lat[-1] * us:7.1f} µs")
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Autonomy command link tools")
+    ap.add_argument("cmd", choices=("publish", "listen", "bench"))
+    ap.add_argument("--path", default=SOCKET)
+    ap.add_argument("--rate", type=float, default=50.0)
+    ap.add_argument("--pattern", choices=("sweep", "fixed"), default="sweep")
+    args = ap.parse_args()
+    if args.cmd == "publish":
+        print(f"Publishing {args.pattern} at {args.rate:g} Hz → {args.path}  (Ctrl-C to stop)")
+        try:
+            publish(args.rate, args.pattern, args.path)
+        except KeyboardInterrupt:
+            pass
+    elif args.cmd == "listen":
+        def show():
+            c = rx.latest()
+            print(c if c is not None else "— stale —")
+        rx = CommandListener(args.path, on_change=show)
+        rx.start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print(rx.stats())
+    else:
+        _bench()
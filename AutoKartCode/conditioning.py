@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+conditioning.py – filtering, deadbands and hysteresis between parser and mapper
+
+`Conditioner` takes the decoder's raw frame and returns the mapped command
+like a `ChannelMap` does, with three stages in between:
+
+ 1. filter   – a ring of the last `window` frames; per channel the value is
+               passed through ("none"), replaced by the window median
+               ("median"), or held back when it jumps more than "outlier"
+               counts from the last value passed on, the frame before did
+               not jump with it and it does not continue the trend of the
+               two frames before ("outlier"): a single wild frame never
+               gets through, a real stick step arrives one frame late and
+               a fast sweep loses only its first frame.  "pass": "up" or
+               "down" lets jumps that way through at once, so only the
+               other direction is confirmed.  The medians of all channels
+               come out of one pass over the ring.
+ 2. deadband – widens a "deadband" output's centre, or gives a "linear"
+               output a deadband of "deadband" counts around its centre
+               (or around "center", e.g. the throttle's idle end) – the
+               profile is rewritten and compiled once.
+ 3. hysteresis – a threshold / deadband output keeps its previous value
+               while its channel is within "hysteresis" counts of the
+               breakpoint it would switch at: a stick resting on the edge
+               no longer flips the command on every count of noise.
+
+Configuration (JSON, `--condition FILE` in main.py):
+
+    {"window": 5, "step": 100,
+     "channels": [{"filter": "none"}, …, {"filter": "median"}],
+     "outputs": {"steering": {"deadband": 12, "hysteresis": 6}, …}}
+
+The default drops single-frame spikes on throttle and steering – a lone
+full-scale throttle value would otherwise put full throttle out – at the
+cost of one frame at the start of a move over 200 counts (a few ms on
+binary frames, 250 ms on the 1200-baud CSV link).  The brake passes the
+apply edge (falling counts) straight through and only confirms a
+release, so a lone corrupt value can never hold the brake off.  It takes
+the median for the mode switch and leaves the e-stop channels alone:
+nothing may delay or latch an e-stop here, and a config that filters them
+is rejected.
+
+`stats()` gives per-channel noise (deviation from the window median; a
+deviation over "step" counts is a moved stick and only counted) and,
+per discrete output, how many command changes the raw mapping would have
+made and how many the conditioner suppressed.
+
+    python3 conditioning.py [--noise 6] [--spikes 0.01] [--config FILE]
+"""
+import json
+from collections import deque
+
+from channel_map import ChannelMap, DEFAULT_PROFILE
+
+DEFAULT_CONFIG = {
+    "window": 5,
+    "step": 100,                                # counts off the median: a moved stick
+    "channels": [
+        {"filter": "outlier", "outlier": 200},  # throttle
+        {"filter": "outlier", "outlier": 200},  # steering
+        {"filter": "outlier", "outlier": 200,   # brake: apply (≤ 992) never waits,
+         "pass": "down"},                       # a release needs two frames
+        {"filter": "none"},                     # e-stop A – never delayed
+        {"filter": "none"},                     # e-stop B
+        {"filter": "median"},                   # mode: a switch takes 3 of 5
+    ],
+    "outputs": {
+        "throttle": {"deadband": 8, "center": 992},
+        "steering": {"deadband": 12, "hysteresis": 6},
+        "steer_effort": {"deadband": 12},
+        "brake": {"hysteresis": 40},
+    },
+}
+
+FILTERS = ("none", "median", "outlier")
+PASS = {None: 0, "up": 1, "down": -1}           # "outlier" jumps let through at once
+
+
+def _breakpoints(o):
+    """Where a discrete output switches, half-way between the raw counts."""
+    kind = o["transform"]
+    if kind == "threshold":
+        lvl = o["level"]
+        return (lvl + 0.5,) if o["op"] in (">", "<=") else (lvl - 0.5,)
+    if kind == "deadband":
+        c, w = o["center"], o.get("width", 0)
+        return (c - w - 0.5, c + w + 0.5)
+    raise ValueError(f"output {o['name']!r}: no hysteresis on a {kind!r} output")
+
+
+def _with_deadband(o, d, center=None):
+    o = dict(o)
+    if o["transform"] == "deadband":
+        o["width"] = o.get("width", 0) + d
+    elif o["transform"] == "linear":
+        o["deadband"] = o.get("deadband", 0) + d
+        if center is not None:          # e.g. throttle idle, at one end of the range
+            o["center"] = center
+    else:
+        raise ValueError(f"output {o['name']!r}: no deadband on a {o['transform']!r} "
+                         f"output (use hysteresis)")
+    return o
+
+
+class Conditioner:
+    """Callable raw frame → mapped command, conditioned; see the module doc."""
+
+    def __init__(self, profile: dict = DEFAULT_PROFILE, config: dict = DEFAULT_CONFIG,
+                 order=None):
+        self.config = config
+        outs = config.get("outputs", {})
+        unknown = set(outs) - {o["name"] for o in profile["outputs"]}
+        if unknown:
+            raise ValueError(f"conditioning for unknown outputs {sorted(unknown)}")
+        tuned = dict(profile, outputs=[
+            _with_deadband(o, outs[o["name"]]["deadband"], outs[o["name"]].get("center"))
+            if outs.get(o["name"], {}).get("deadband") else o
+            for o in profile["outputs"]])
+        self.map = ChannelMap(tuned, order)         # what the workers get
+        self.raw_map = ChannelMap(profile, order)   # for the suppressed counts
+        self.channels = self.map.channels
+        self.names = self.map.names
+
+        chans = config.get("channels", [])
+        kinds = [(chans[c] if c < len(chans) else {}).get("filter", "none")
+                 for c in range(self.channels)]
+        bad = [k for k in kinds if k not in FILTERS]
+        bad += [c.get("pass") for c in chans if c.get("pass") not in PASS]
+        if bad:
+            raise ValueError(f"unknown filter(s) {bad}")
+        estop = sorted({o["source"] for o in profile["outputs"]
+                        if o["name"].startswith("estop") and kinds[o["source"]] != "none"})
+        if estop:
+            raise ValueError(f"channel(s) {estop} carry an e-stop: filter must be \"none\"")
+        self._median = tuple(c for c, k in enumerate(kinds) if k == "median")
+        self._outlier = tuple((c, chans[c].get("outlier", 200), PASS[chans[c].get("pass")])
+                              for c, k in enumerate(kinds) if k == "outlier")
+        self._ring = deque(maxlen=max(1, config.get("window", 5)))
+
+        # hysteresis: (output index, source, raw counts that hold the output)
+        by_name = {o["name"]: o for o in tuned["outputs"]}
+        self._hyst = []
+        for i, name in enumerate(self.names):
+            h = outs.get(name, {}).get("hysteresis", 0)
+            if not h:
+                continue
+            o = by_name[name]
+            hold = frozenset(x for bp in _breakpoints(o)
+                             for x in range(int(bp - h + 0.5), int(bp + h + 0.5)))
+            if o["transform"] == "deadband" and o.get("center") in hold:
+                raise ValueError(f"output {name!r}: hysteresis {h} reaches the centre – "
+                                 f"widen its deadband past it")
+            self._hyst.append((i, o["source"], hold))
+        self._discrete = tuple(i for i, n in enumerate(self.names)
+                               if by_name[n]["transform"] != "linear")
+
+        self._last = None                            # conditioned raw
+        self._prev = None                            # previous raw frame
+        self._prev2 = None                           # … and the one before
+        self._mapped = None
+        self._raw_mapped = None
+
+        # statistics
+        self.frames = 0
+        self._sum = [0] * self.channels              # Σ(x − median), exact ints
+        self._sum2 = [0] * self.channels             # Σ(x − median)²
+        self._dev_max = [0] * self.channels
+        self._steps = [0] * self.channels            # deviations too big to be noise
+        self._step = config.get("step", 100)
+        self.rejected = [0] * self.channels          # outliers replaced
+        self.raw_changes = [0] * len(self.names)     # what the raw mapping did
+        self.changes = [0] * len(self.names)         # what we passed on
+
+    @classmethod
+    def load(cls, path: str, profile: dict = DEFAULT_PROFILE, order=None) -> "Conditioner":
+        with open(path) as f:
+            return cls(profile, json.load(f), order)
+
+    # ------------------------------------------------------------------
+    def __call__(self, raw) -> list:
+        raw = list(raw)
+        ring = self._ring
+        ring.append(raw)
+        mid = len(ring) // 2
+        med = [s[mid] for s in map(sorted, zip(*ring))]      # every channel at once
+        x = raw[:]
+        for c in self._median:
+            x[c] = med[c]
+        last, prev, prev2 = self._last, self._prev, self._prev2
+        if last is not None:
+            for c, limit, fast in self._outlier:
+                jump = x[c] - last[c]
+                if (abs(jump) > limit and jump * fast <= 0
+                        and abs(x[c] - prev[c]) > limit
+                        and abs(x[c] - 2 * prev[c] + prev2[c]) > limit):
+                    x[c] = last[c]                   # unconfirmed jump: hold
+                    self.rejected[c] += 1
+        self._last, self._prev, self._prev2 = x, raw, raw if prev is None else prev
+
+        mapped = self.map(x)
+        prev = self._mapped
+        if prev is not None:
+            for i, c, hold in self._hyst:
+                if mapped[i] != prev[i] and x[c] in hold:
+                    mapped[i] = prev[i]
+        self._account(raw, med, mapped, prev)
+        self._mapped = mapped
+        return mapped
+
+    def _account(self, raw, med, mapped, prev):
+        self.frames += 1
+        if raw != med:                  # whole-frame compares skip the common case
+            dev = [a - b for a, b in zip(raw, med)]
+            self._dev_max = [max(m, abs(d)) for m, d in zip(self._dev_max, dev)]
+            lim = self._step                  # a moved stick, not noise
+            if max(dev) > lim or min(dev) < -lim:
+                self._steps = [n + (abs(d) > lim) for n, d in zip(self._steps, dev)]
+                dev = [d if abs(d) <= lim else 0 for d in dev]
+            self._sum = [s + d for s, d in zip(self._sum, dev)]
+            self._sum2 = [s + d * d for s, d in zip(self._sum2, dev)]
+        raw_mapped = self.raw_map(raw)
+        rp = self._raw_mapped
+        if prev is not None:
+            if raw_mapped != rp:
+                for i in self._discrete:
+                    self.raw_changes[i] += raw_mapped[i] != rp[i]
+            if mapped != prev:
+                for i in self._discrete:
+                    self.changes[i] += mapped[i] != prev[i]
+        self._raw_mapped = raw_mapped
+
+    # ------------------------------------------------------------------
+    @property
+    def suppressed(self) -> int:
+        """Command changes the raw mapping made that never reached a worker."""
+        return sum(max(0, r - c) for r, c in zip(self.raw_changes, self.changes))
+
+    def stats(self) -> dict:
+        chans = []
+        for s, s2, m, k, r in zip(self._sum, self._sum2, self._dev_max, self._steps,
+                                  self.rejected):
+            n = max(1, self.frames - k)
+            chans.append(dict(noise=max(0.0, s2 / n - (s / n) ** 2) ** 0.5,
+                              max_dev=m, steps=k, rejected=r))
+        outs = {self.names[i]: dict(raw_changes=self.raw_changes[i], changes=self.changes[i],
+                                    suppressed=max(0, self.raw_changes[i] - self.changes[i]))
+                for i in self._discrete}
+        return dict(frames=self.frames, suppressed=self.suppressed,
+                    channels=chans, outputs=outs)
+
+
+# ---------------------------------------------------------------------------
+# Stand-alone: a noisy stick through the raw mapping and the conditioner
+# ---------------------------------------------------------------------------
+if __name__ == "__main__":
+    import argparse
+    import random
+    import time
+    from channel_map import PACKET_OUTPUTS
+    ap = argparse.ArgumentParser(description="Conditioning on a noisy synthetic stick")
+    ap.add_argument("--noise", type=float, default=6.0, help="Gaussian σ in counts")
+    ap.add_argument("--spikes", type=float, default=0.01, help="fraction of wild values")
+    ap.add_argument("--frames", type=int, default=20000)
+    ap.add_argument("--config", help="conditioning JSON (default: built-in)")
+    args = ap.parse_args()
+
+    cond = (Conditioner.load(args.config, order=PACKET_OUTPUTS) if args.config
+            else Conditioner(order=PACKET_OUTPUTS))
+    rnd = random.Random(4)
+    # a stick resting at centre, a slow left / right sweep, the brake resting
+    # near its threshold, all with receiver noise and the odd corrupt value
+    frames = []
+    for i in range(args.frames):
+        phase = (i % 2000) / 2000
+        steer = 992 if phase < 0.5 else 992 + int(300 * (phase - 0.75) / 0.25)
+        clean = (1400, steer, 995, 1809, 1809, 1809)
+        v = [max(0, int(round(x + rnd.gauss(0, args.noise)))) if c < 3 else x
+             for c, x in enumerate(clean)]
+        if rnd.random() < args.spikes:
+            v[rnd.randrange(3)] = rnd.choice((0, 172, 1811, 2047))
+        frames.append(v)
+    t = time.perf_counter()
+    for v in frames:
+        cond(v)
+    dt = time.perf_counter() - t
+    s = cond.stats()
+    print(f"{s['frames']} frames, σ {args.noise:g} counts, {args.spikes:.0%} spikes: "
+          f"{dt / len(frames) * 1e6:.1f} µs/frame")
+    for c, ch in enumerate(s["channels"][:3]):
+        print(f"  ch{c}  noise σ {ch['noise']:6.1f}  max dev {ch['max_dev']:5d}  "
+              f"steps {ch['steps']:4d}  rejected {ch['rejected']}")
+    for name, o in s["outputs"].items():
+        print(f"  {name:8s} raw mapping {o['raw_changes']:6d} changes → "
+              f"{o['changes']:5d}  ({o['suppressed']} suppressed)")
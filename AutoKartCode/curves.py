@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+curves.py – throttle response curves, compiled to lookup tables
+
+The channel map turns the throttle stick into a position 0-255; a curve
+turns that position into the wiper value.  Every curve is compiled once
+into a 256-byte table, so shaping the throttle costs one index per packet
+whatever the curve:
+
+    linear    wiper = position
+    expo      (1-k)·x + k·x³          – soft around idle, full at full stick
+    scurve    (1-k)·x + k·smoothstep  – soft at both ends
+    points    piecewise linear through [[position, wiper], …]
+
+Any curve takes "max" (the wiper at full stick) – the default "pit" curve
+is a linear one capped at 90, for pits and paddocks.  Idle always maps to
+a zero wiper; a curve that does not is rejected.
+
+`CurveSet` holds the compiled tables and the active one in `table`.
+Switching is a single reference swap, so the throttle worker reads it
+without a lock.  Curves can be switched
+
+ * from a receiver channel – `follow(raw)` splits the stick range into one
+   band per curve (main.py --curve-channel N), or
+ * locally – `CurveListener` takes curve names as datagrams on a Unix
+   socket (`python3 curves.py select NAME`).
+
+    python3 curves.py print [--curves FILE]      # tables, every 16th position
+    python3 curves.py plot  [--curves FILE]      # all curves on one ASCII plot
+    python3 curves.py bench                      # table lookup vs formula
+    python3 curves.py select NAME [--socket PATH]
+"""
+import json
+import os
+import selectors
+import socket
+import threading
+import time
+
+from eventlog import log, SRC_THROTTLE, EV_CURVE
+
+SOCKET = "/tmp/autokart-curve.sock"
+TOP = 255                         # throttle position / wiper full scale
+
+DEFAULT_CURVES = {
+    "linear": {"type": "linear"},
+    "expo": {"type": "expo", "k": 0.6},
+    "scurve": {"type": "scurve", "k": 0.8},
+    "pit": {"type": "linear", "max": 90},
+}
+
+# switch positions on a receiver channel: one band per curve over this range
+SWITCH_RANGE = (172, 1811)
+
+
+def _points(pts):
+    pts = [(float(x), float(y)) for x, y in pts]
+    if len(pts) < 2 or any(b[0] <= a[0] for a, b in zip(pts, pts[1:])):
+        raise ValueError("points: need two or more, positions strictly increasing")
+
+    def f(x):
+        x *= TOP
+        if x <= pts[0][0]:
+            return pts[0][1] / TOP
+        for (x0, y0), (x1, y1) in zip(pts, pts[1:]):
+            if x <= x1:
+                return (y0 + (x - x0) * (y1 - y0) / (x1 - x0)) / TOP
+        return pts[-1][1] / TOP
+
+    return f
+
+
+def _shape(spec):
+    kind, k = spec.get("type", "linear"), spec.get("k", 0.5)
+    if kind == "linear":
+        return lambda x: x
+    if kind == "expo":
+        return lambda x: (1 - k) * x + k * x ** 3
+    if kind == "scurve":
+        return lambda x: (1 - k) * x + k * x * x * (3 - 2 * x)
+    if kind == "points":
+        return _points(spec["points"])
+    raise ValueError(f"unknown curve type {kind!r}")
+
+
+def compile_curve(spec: dict) -> bytes:
+    """Position 0-255 → wiper 0-255, as a 256-byte table."""
+    f, top = _shape(spec), spec.get("max", TOP)
+    if not 0 < top <= TOP:
+        raise ValueError(f"max {top} outside 1-{TOP}")
+    table = bytes(max(0, min(TOP, round(top * f(i / TOP)))) for i in range(TOP + 1))
+    if table[0]:
+        raise ValueError(f"idle maps to wiper {table[0]}, not 0")
+    return table
+
+
+class CurveSet:
+    """Compiled curves and the active table; see the module doc."""
+
+    def __init__(self, specs: dict = DEFAULT_CURVES, active: str = "linear",
+                 channel: int = None):
+        self.tables = {}
+        for name, spec in specs.items():
+            try:
+                self.tables[name] = compile_curve(spec)
+            except (ValueError, KeyError, TypeError) as e:
+                raise ValueError(f"curve {name!r}: {e}") from None
+        self.names = tuple(self.tables)
+        if active not in self.tables:
+            raise ValueError(f"no curve {active!r} (have {', '.join(self.names)})")
+        self.active = active
+        self.table = self.tables[active]
+        self.channel = channel             # raw receiver channel to follow, or None
+        lo, hi = SWITCH_RANGE
+        n = len(self.names)
+        self._bands = bytes(min(n - 1, max(0, (r - lo) * n // (hi - lo + 1)))
+                            for r in range(1 << 11))
+        self._band = None
+
+        # statistics
+        self.swaps = 0
+
+    @classmethod
+    def load(cls, path: str, active: str = "linear", channel: int = None) -> "CurveSet":
+        with open(path) as f:
+            return cls(json.load(f), active, channel)
+
+    def select(self, name: str) -> bool:
+        """Make *name* the active curve; True if that changed anything."""
+        table = self.tables[name]
+        if table is self.table:
+            return False
+        self.table = table                 # the swap the worker sees
+        self.active = name
+        self.swaps += 1
+        log(SRC_THROTTLE, EV_CURVE, self.names.index(name))
+        return True
+
+    def follow(self, raw: int) -> bool:
+        """Select by the switch channel's raw value (called per packet)."""
+        band = self._bands[raw] if 0 <= raw < len(self._bands) else self._band
+        if band == self._band:
+            return False
+        self._band = band
+        return self.select(self.names[band])
+
+    def stats(self) -> dict:
+        return dict(active=self.active, swaps=self.swaps, curves=self.names)
+
+
+class CurveListener:
+    """Curve names as datagrams on a Unix socket → `CurveSet.select`."""
+
+    def __init__(self, curves: CurveSet, path: str = SOCKET, on_change=None):
+        self.curves = curves
+        self.path = path
+        self.on_change = on_change
+        self._stop = threading.Event()
+        if os.path.exists(path):
+            os.unlink(path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(path)
+        self._sock.setblocking(False)
+
+        # statistics
+        self.received = 0
+        self.unknown = 0
+
+    def fileno(self) -> int:
+        return self._sock.fileno()
+
+    def drain(self) -> None:
+        """Read every queued datagram (non-blocking)."""
+        changed = False
+        while True:
+            try:
+                data = self._sock.recv(64)
+            except BlockingIOError:
+                break
+            self.received += 1
+            name = data.decode(errors="replace").strip()
+            if name not in self.curves.tables:
+                self.unknown += 1
+                continue
+            changed |= self.curves.select(name)
+        if changed and self.on_change is not None:
+            self.on_change()
+
+    def start(self) -> None:
+        threading.Thread(target=self._run, name="curve-link", daemon=True).start()
+
+    def close(self) -> None:
+        self._stop.set()
+        self._sock.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def _run(self):
+        sel = selectors.DefaultSelector()
+        sel.register(self._sock, selectors.EVENT_READ)
+        while not self._stop.is_set():
+            if sel.select(0.5):
+                self.drain()
+
+
+# ---------------------------------------------------------------------------
+# Command line
+# ---------------------------------------------------------------------------
+def _print(curves: CurveSet) -> None:
+    print("position " + "".join(f"{n:>8s}" for n in curves.names))
+    for i in list(range(0, TOP + 1, 16)) + [TOP]:
+        print(f"{i:8d} " + "".join(f"{curves.tables[n][i]:8d}" for n in curves.names))
+
+
+def _plot(curves: CurveSet, width: int = 64, height: int = 24) -> None:
+    marks = "*o+x#@%&"
+    grid = [[" "] * width for _ in range(height)]
+    for k, name in enumerate(curves.names):
+        t = curves.tables[name]
+        for col in range(width):
+            y = t[round(col * TOP / (width - 1))]
+            grid[height - 1 - round(y * (height - 1) / TOP)][col] = marks[k % len(marks)]
+    print(f"wiper {TOP}")
+    for row in grid:
+        print("  |" + "".join(row))
+    print("  +" + "-" * width + f"  position 0-{TOP}")
+    print("   " + "  ".join(f"{marks[k % len(marks)]} {n}" for k, n in enumerate(curves.names)))
+
+
+def _bench(curves: CurveSet, n: int = 200_000) -> None:
+    from channel_map import ChannelMap
+    cmap = ChannelMap.default(("throttle",))
+    raws = [992 + (i * 7) % 818 for i in range(n)]
+    k = DEFAULT_CURVES["expo"]["k"]
+
+    def formula():                     # convert_packet's throttle arithmetic
+        for t in raws:
+            offset = max(0, min(817, 1809 - t))
+            int(((817 - offset) / 817) * 255)
+
+    def formula_expo():                # the same with the curve evaluated per packet
+        for t in raws:
+            x = (817 - max(0, min(817, 1809 - t))) / 817
+            round(255 * ((1 - k) * x + k * x ** 3))
+
+    def lookup():                      # channel-map table, then the curve table
+        table = curves.tables["expo"]
+        kernel = cmap._kernel
+        for t in raws:
+            table[kernel((t,))[0]]
+
+    pos = [cmap((t,))[0] for t in raws]
+
+    def lookup_only():                 # what throttle_step adds per packet
+        table = curves.tables["expo"]
+        for p in pos:
+            table[p]
+
+    t0 = time.perf_counter()
+    for name, spec in DEFAULT_CURVES.items():
+        compile_curve(spec)
+    t_compile = (time.perf_counter() - t0) / len(DEFAULT_CURVES)
+    print(f"compile: {t_compile * 1e6:.0f} µs per curve")
+    for label, fn in (("formula, linear", formula), ("formula, expo", formula_expo),
+                      ("map + curve tables", lookup), ("curve table only", lookup_only)):
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        print(f"{label:20s} {dt / n * 1e9:7.0f} ns/packet")
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Throttle response curves")
+    ap.add_argument("cmd", choices=("print", "plot", "bench", "select"))
+    ap.add_argument("name", nargs="?", help="curve to select")
+    ap.add_argument("--curves", metavar="FILE", help="curve definitions (JSON)")
+    ap.add_argument("--socket", default=SOCKET, help="controller's curve socket")
+    args = ap.parse_args()
+    curves = CurveSet.load(args.curves) if args.curves else CurveSet()
+    if args.cmd == "print":
+        _print(curves)
+    elif args.cmd == "plot":
+        _plot(curves)
+    elif args.cmd == "bench":
+        _bench(curves)
+    else:
+        if not args.name:
+            ap.error("select needs a curve name")
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            s.sendto(args.name.encode(), args.socket)
+        except (FileNotFoundError, ConnectionRefusedError):
+            raise SystemExit(f"[Curve] no controller listening on {args.socket}")
+        print(f"[Curve] asked for {args.name!r}")
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+estop.py – latched e-stop state machine for the safety supervisor
+
+The supervisor polls every 10 ms; `EstopMachine.step(cause)` turns those
+polls into transitions and runs the actuator actions only on the edges:
+
+    RUN ──cause──▶ ESTOP_ENTERING ──actions issued──▶ ESTOPPED
+     ▲                                                 │   ▲
+     │                                      cause gone │   │ cause back
+     └──── clear held for clear_hold ─── RECOVERING ◀──┘───┘
+
+ * entering   `enter(cause)` once – the same ordered sequence every time,
+              so entry takes the same path and the same time
+ * latched    `hold()` re-asserts the safe outputs every `reassert` s
+              while ESTOPPED / RECOVERING, in case something glitched
+ * leaving    the cause must stay gone for `clear_hold` s before
+              `release()` re-enables the drive; a cause that comes back
+              in the meantime returns to ESTOPPED without new actions
+ * running    `keep()` (if given) re-asserts the enable every `reassert` s
+
+Every transition is time-stamped (`transitions`, `entered`) and logged as
+an ESTOP_STATE event.  `step()` on an unchanged state costs a compare.
+
+    python3 estop.py      # actuator calls: 10 ms re-issue loop vs this
+"""
+import time
+from collections import deque, namedtuple
+
+from eventlog import log, SRC_MAIN, EV_ESTOP_STATE
+
+RUN, ESTOP_ENTERING, ESTOPPED, RECOVERING = "RUN", "ESTOP_ENTERING", "ESTOPPED", "RECOVERING"
+STATES = (RUN, ESTOP_ENTERING, ESTOPPED, RECOVERING)
+
+# why the machine left RUN
+CAUSE_SWITCH, CAUSE_LINK, CAUSE_SUPERVISOR = 1, 2, 3
+CAUSES = {CAUSE_SWITCH: "e-stop switch", CAUSE_LINK: "receiver link lost",
+          CAUSE_SUPERVISOR: "supervisor process lost"}
+
+Transition = namedtuple("Transition", "t prev state cause")
+
+
+class EstopMachine:
+    def __init__(self, enter, hold, release, keep=None,
+                 clear_hold: float = 0.25, reassert: float = 0.5):
+        self.enter = enter
+        self.hold = hold
+        self.release = release
+        self.keep = keep
+        self.clear_hold = clear_hold
+        self.reassert = reassert
+        now = time.monotonic()
+        self.state = RUN
+        self.cause = None
+        self.entered = {RUN: now}            # state → when it was last entered
+        self.transitions = deque(maxlen=64)
+        self._t_assert = now
+
+        # statistics
+        self.trips = 0
+        self.reasserts = 0
+        self.entry_s = deque(maxlen=64)      # ENTERING → ESTOPPED (actions issued)
+
+    # ------------------------------------------------------------------
+    def step(self, cause=None, now: float = None) -> str:
+        """One supervisor pass; *cause* is a CAUSE_* while the e-stop holds."""
+        if now is None:
+            now = time.monotonic()
+        st = self.state
+        if cause:
+            if st == RUN:
+                self.trips += 1
+                self._to(ESTOP_ENTERING, cause, now)
+                t0 = time.monotonic()
+                self.enter(cause)
+                dt = time.monotonic() - t0
+                self.entry_s.append(dt)
+                self._to(ESTOPPED, cause, now + dt)
+                self._t_assert = now + dt
+            elif st == RECOVERING:
+                self._to(ESTOPPED, cause, now)
+            elif now - self._t_assert >= self.reassert:
+                self._reassert(self.hold, now)
+        elif st == ESTOPPED:
+            self._to(RECOVERING, None, now)
+        elif st == RECOVERING:
+            if now - self.entered[RECOVERING] >= self.clear_hold:
+                self.release()
+                self._to(RUN, None, now)
+                self._t_assert = now
+            elif now - self._t_assert >= self.reassert:
+                self._reassert(self.hold, now)
+        elif self.keep is not None and now - self._t_assert >= self.reassert:
+            self._reassert(self.keep, now)
+        return self.state
+
+    @property
+    def active(self) -> bool:
+        """True from entering until the drive is released again."""
+        return self.state != RUN
+
+    def stats(self) -> dict:
+        entry = sorted(self.entry_s)
+        return dict(state=self.state, trips=self.trips, reasserts=self.reasserts,
+                    entry_ms_max=entry[-1] * 1e3 if entry else None,
+                    transitions=[(round(t.t, 4), t.prev, t.state, t.cause)
+                                 for t in self.transitions])
+
+    # ------------------------------------------------------------------
+    def _to(self, state: str, cause, now: float) -> None:
+        prev, self.state = self.state, state
+        if cause is not None:
+            self.cause = cause
+        elif state == RUN:
+            self.cause = None
+        self.entered[state] = now
+        self.transitions.append(Transition(now, prev, state, cause))
+        log(SRC_MAIN, EV_ESTOP_STATE, STATES.index(state), STATES.index(prev), cause or 0)
+
+    def _reassert(self, fn, now: float) -> None:
+        fn()
+        self.reasserts += 1
+        self._t_assert = now
+
+
+# ---------------------------------------------------------------------------
+# Stand-alone comparison
+# ---------------------------------------------------------------------------
+if __name__ == "__main__":
+    from collections import Counter
+    calls = Counter()
+
+    def act(name):
+        return lambda *a: calls.update((name,))
+
+    # 20 s at the supervisor's 10 ms: e-stop 2-7 s, a 30 ms bounce at 7.1 s,
+    # link loss 12-14 s
+    period, n = 0.01, 2000
+
+    def cause_at(t):
+        if 2.0 <= t < 7.0 or 7.1 <= t < 7.13:
+            return CAUSE_SWITCH
+        return CAUSE_LINK if 12.0 <= t < 14.0 else None
+
+    # the old loop: every action on every pass
+    for i in range(n):
+        if cause_at(i * period):
+            for a in ("enable.off", "throttle.disable", "steering.disable", "brake.apply"):
+                act(a)()
+        else:
+            act("enable.on")()
+    old, calls = calls, Counter()
+
+    sm = EstopMachine(enter=act("enter"), hold=act("hold"), release=act("release"),
+                      keep=act("keep"))
+    for i in range(n):
+        sm.step(cause_at(i * period), now=i * period)
+    print(f"{n} passes at {period * 1e3:g} ms, e-stop 2-7 s (+30 ms bounce), link loss 12-14 s")
+    print(f"  re-issue every pass : {sum(old.values()):5d} actuator calls  {dict(old)}")
+    # enter = 4 actuator calls, hold 4, release 2, keep 1
+    cost = dict(enter=4, hold=4, release=2, keep=1)
+    print(f"  state machine       : {sum(cost[k] * v for k, v in calls.items()):5d} "
+          f"actuator calls  {dict(calls)}")
+    print(f"  {sm.trips} trips; transitions:")
+    for t in sm.transitions:
+        print(f"    {t.t:6.2f} s  {t.prev:14s} → {t.state:14s} "
+              f"{CAUSES.get(t.cause, '')}")
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+eventlog.py – fixed-size binary event records instead of print()
+
+Hot paths call `log(source, event, *values)`, which packs one 40-byte record
+into a preallocated ring buffer with `struct.pack_into` – no formatting, no
+syscall.  A background drainer (`start()`) copies completed records to a file
+a few times a second, and hands them to any `sinks` (telemetry.py).  Decode
+a log offline with:
+
+    python3 eventlog.py decode autokart.evlog
+
+Record layout (little-endian, 40 bytes)
+───────────────────────────────────────
+    u32  seq + 1       slot stamp – lets the drainer spot unwritten/lapped slots
+    f64  t             time.monotonic()
+    u16  source        SRC_*
+    u16  event         EV_*
+    6 × i32 values     meaning given by EVENTS[event]
+"""
+import itertools
+import struct
+import threading
+import time
+
+REC = struct.Struct("<IdHH6i")
+MAGIC = b"AKEVLOG1"
+_STAMP = struct.Struct("<I")
+_M32 = 0xFFFFFFFF
+
+# --- sources -----------------------------------------------------------------
+SRC_MAIN, SRC_THROTTLE, SRC_STEERING, SRC_BRAKE = 1, 2, 3, 4
+SOURCES = {SRC_MAIN: "Main", SRC_THROTTLE: "Throttle",
+           SRC_STEERING: "Steering", SRC_BRAKE: "Brake"}
+
+# --- events ------------------------------------------------------------------
+EV_RAW, EV_MAPPED, EV_ESTOP, EV_ESTOP_CLEAR, EV_LINK, EV_RX = 1, 2, 3, 4, 5, 6
+EV_ESTOP_STATE = 7
+EV_LINK_SWITCH = 8
+EV_WIPER, EV_THR_DISABLE = 10, 11
+EV_CURVE = 12
+EV_JOG, EV_JOG_EXTEND, EV_FAULT_RESET, EV_STEER_DISABLE, EV_STEER_ENABLE = 20, 21, 22, 23, 24
+EV_JOG_TRAIN = 25
+EV_BRAKE_MOVE, EV_BRAKE_SETTLE, EV_BRAKE_STOP = 30, 31, 32
+
+EVENTS = {
+    EV_RAW:           ("RAW", ("thr", "steer", "brake", "ea", "eb", "mode")),
+    EV_MAPPED:        ("MAPPED", ("thr", "steer", "brake", "ea", "eb", "mode")),
+    EV_ESTOP:         ("ESTOP", ()),
+    EV_ESTOP_CLEAR:   ("ESTOP_CLEAR", ()),
+    EV_LINK:          ("LINK", ("level", "prev")),
+    EV_RX:            ("RX", ("frames", "crc", "gaps", "lost", "malformed")),
+    EV_ESTOP_STATE:   ("ESTOP_STATE", ("state", "prev", "cause")),
+    EV_LINK_SWITCH:   ("LINK_SWITCH", ("to", "from", "reason", "gap_ms")),
+    EV_WIPER:         ("WIPER", ("value",)),
+    EV_THR_DISABLE:   ("DISABLE", ()),
+    EV_CURVE:         ("CURVE", ("index",)),
+    EV_JOG:           ("JOG", ("dir",)),
+    EV_JOG_EXTEND:    ("JOG_EXTEND", ("dir",)),
+    EV_FAULT_RESET:   ("FAULT_RESET", ()),
+    EV_STEER_DISABLE: ("DISABLE", ()),
+    EV_STEER_ENABLE:  ("ENABLE", ()),
+    EV_JOG_TRAIN:     ("JOG_TRAIN", ("dir", "width_ms", "gap_ms")),
+    EV_BRAKE_MOVE:    ("MOVE", ("dir", "ms", "pos_permille")),
+    EV_BRAKE_SETTLE:  ("SETTLE", ("pos_permille",)),
+    EV_BRAKE_STOP:    ("STOP", ()),
+}
+
+
+class EventLog:
+    """Lock-free (GIL-atomic) ring of fixed-size event records."""
+
+    def __init__(self, capacity: int = 8192):
+        self.capacity = capacity
+        self._buf = bytearray(REC.size * capacity)   # stamp 0 = never written
+        self._next = itertools.count()         # next() is atomic under the GIL
+        self._tail = 0
+        self.dropped = 0
+        self.sinks = []                        # also get every drained batch
+        self._thread = None
+        self._stop = threading.Event()
+
+    # ------------------------------------------------------------------
+    # Hot path
+    # ------------------------------------------------------------------
+    def log(self, source: int, event: int, a=0, b=0, c=0, d=0, e=0, f=0) -> None:
+        n = next(self._next)
+        REC.pack_into(self._buf, (n % self.capacity) * REC.size,
+                      (n + 1) & _M32, time.monotonic(), source, event,
+                      a, b, c, d, e, f)
+
+    # ------------------------------------------------------------------
+    # Drainer
+    # ------------------------------------------------------------------
+    def drain(self) -> bytes:
+        """Return every completed record since the last call, oldest first."""
+        out = bytearray()
+        buf, cap, size = self._buf, self.capacity, REC.size
+        while True:
+            off = (self._tail % cap) * size
+            stamp = _STAMP.unpack_from(buf, off)[0]
+            ahead = (stamp - (self._tail + 1)) & _M32
+            if ahead == 0:
+                out += buf[off:off + size]
+                self._tail += 1
+            elif ahead < 0x80000000:
+                # writer lapped us: skip to the oldest record still in the ring
+                skip = ahead - cap + 1
+                self.dropped += skip
+                self._tail += skip
+            else:
+                return bytes(out)              # not written yet
+
+    def start(self, path: str, period: float = 0.2) -> None:
+        """Flush the ring to *path* every *period* seconds on a daemon thread."""
+        f = open(path, "wb")
+        f.write(MAGIC + struct.pack("<H", REC.size))
+
+        def run():
+            while not self._stop.wait(period):
+                data = self.drain()
+                f.write(data)
+                f.flush()
+                for sink in self.sinks:
+                    sink(data)
+            data = self.drain()
+            f.write(data)
+            f.close()
+            for sink in self.sinks:
+                sink(data)
+
+        self._thread = threading.Thread(target=run, name="eventlog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+
+# Process-wide log used by the driver modules
+LOG = EventLog()
+log = LOG.log
+
+
+# ---------------------------------------------------------------------------
+# Offline decoder
+# ---------------------------------------------------------------------------
+def decode(path: str):
+    """Yield (t, source_name, event_name, {field: value}) from a log file."""
+    with open(path, "rb") as f:
+        head = f.read(len(MAGIC) + 2)
+        if head[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path}: not an event log")
+        size = struct.unpack("<H", head[len(MAGIC):])[0]
+        while True:
+            rec = f.read(size)
+            if len(rec) < size:
+                return
+            _, t, src, ev, *vals = REC.unpack(rec[:REC.size])
+            name, fields = EVENTS.get(ev, (f"EV{ev}", ()))
+            yield t, SOURCES.get(src, f"SRC{src}"), name, dict(zip(fields, vals))
+
+
+def _bench(n: int = 200_000) -> float:
+    lg = EventLog()
+    t0 = time.perf_counter()
+    for i in range(n):
+        lg.log(SRC_THROTTLE, EV_WIPER, i & 0xFF)
+    return (time.perf_counter() - t0) / n
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) == 3 and sys.argv[1] == "decode":
+        t_first = None
+        for t, src, name, vals in decode(sys.argv[2]):
+            t_first = t if t_first is None else t_first
+            args = " ".join(f"{k}={v}" for k, v in vals.items())
+            print(f"{t - t_first:12.6f}  {src:<9s} {name:<12s} {args}")
+    elif len(sys.argv) == 2 and sys.argv[1] == "bench":
+        print(f"log(): {_bench() * 1e6:.2f} µs per record")
+    else:
+        print("usage: eventlog.py decode FILE | bench")
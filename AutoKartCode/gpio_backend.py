@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+gpio_backend.py – output lines for the drivers, several per call
+
+Each driver claims its pins as one group and drives them through it:
+
+    io = gpio_backend.default().claim("brake", dict(fwd=16, rev=17))
+    fwd = io.line("fwd")        # on() / off() / value / pin, like gpiozero
+    io.set(fwd=1, rev=0)        # both lines in one write
+
+Backends
+    gpiod      libgpiod ≥ 2 line requests: a group is one request, so
+               `set()` is a single ioctl and the lines change together
+    gpiozero   a DigitalOutputDevice per line (the original path; `set()`
+               writes the lines one after another)
+    mock       in memory: levels by BCM pin plus every edge as (t, pin,
+               level), for the simulator and bench runs without hardware
+
+`Line.value` and `set()` take logical levels (1 = active); a line listed in
+*active_low* is physically low when active.  `set_many()` spans groups: one
+write per group, in the order given.
+
+The process-wide backend comes from `use()`, else from $AUTOKART_GPIO
+(default gpiozero) – a spawned process such as the safety supervisor picks
+the same one up from the environment.
+
+    python3 gpio_backend.py bench [--backend mock,gpiozero,gpiod] [-n 20000]
+"""
+import os
+import threading
+import time
+from collections import namedtuple
+
+Edge = namedtuple("Edge", "t pin level")
+
+
+class LineBusy(RuntimeError):
+    """The line is already claimed (by this process)."""
+
+
+class Line:
+    """One output of a `LineGroup`; the gpiozero OutputDevice calls we use."""
+
+    __slots__ = ("group", "name", "number", "on", "off")
+
+    def __init__(self, group: "LineGroup", name: str, number: int):
+        self.group = group
+        self.name = name
+        self.number = number
+        self.on = lambda: group._write1(name, 1)     # bound once: per-edge cost
+        self.off = lambda: group._write1(name, 0)
+
+    @property
+    def value(self) -> int:
+        return self.group.levels[self.name]
+
+    @property
+    def pin(self) -> str:
+        return f"GPIO{self.number}"
+
+    @property
+    def closed(self) -> bool:
+        return self.group.closed
+
+    def close(self) -> None:
+        self.group.close()
+
+    def __repr__(self):
+        return f"<Line {self.group.owner}.{self.name} {self.pin}={self.value}>"
+
+
+class LineGroup:
+    """Lines claimed together; the unit `set()` writes at once."""
+
+    def __init__(self, owner: str, pins: dict, active_low=(), initial=None):
+        self.owner = owner
+        self.pins = dict(pins)
+        self.active_low = frozenset(active_low)
+        self.levels = {n: int(bool((initial or {}).get(n, 0))) for n in self.pins}
+        self.closed = False
+        self._lines = {n: Line(self, n, p) for n, p in self.pins.items()}
+
+    def line(self, name: str) -> Line:
+        return self._lines[name]
+
+    def lines(self) -> list:
+        return list(self._lines.values())
+
+    def set(self, **levels) -> None:
+        """Drive the named lines to their levels in one write."""
+        self._write({n: int(bool(v)) for n, v in levels.items()})
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self._release()
+
+    # backend side: logical levels in, keep self.levels current
+    def _write1(self, name: str, level: int) -> None:
+        raise NotImplementedError
+
+    def _write(self, levels: dict) -> None:
+        raise NotImplementedError
+
+    def _release(self) -> None:
+        raise NotImplementedError
+
+
+def set_many(pairs) -> None:
+    """[(line, level), …] across groups: one `set()` per group, first-seen order."""
+    by_group = {}
+    for line, level in pairs:
+        by_group.setdefault(line.group, {})[line.name] = int(bool(level))
+    for group, levels in by_group.items():
+        group._write(levels)
+
+
+# ---------------------------------------------------------------------------
+# gpiozero
+# ---------------------------------------------------------------------------
+class _GpiozeroGroup(LineGroup):
+    def __init__(self, owner, pins, active_low=(), initial=None):
+        from gpiozero import DigitalOutputDevice
+        super().__init__(owner, pins, active_low, initial)
+        self.devices = {}
+        try:
+            for n, p in self.pins.items():
+                self.devices[n] = DigitalOutputDevice(p, active_high=n not in self.active_low,
+                                                      initial_value=bool(self.levels[n]))
+        except Exception:
+            self._release()
+            raise
+
+    def _write1(self, name, level):
+        if level:
+            self.devices[name].on()
+        else:
+            self.devices[name].off()
+        self.levels[name] = level
+
+    def _write(self, levels):
+        for n, v in levels.items():
+            self._write1(n, v)
+
+    def _release(self):
+        for dev in self.devices.values():
+            dev.close()
+
+
+class GpiozeroBackend:
+    name = "gpiozero"
+
+    def claim(self, owner: str, pins: dict, active_low=(), initial=None) -> LineGroup:
+        return _GpiozeroGroup(owner, pins, active_low, initial)
+
+
+# ---------------------------------------------------------------------------
+# libgpiod
+# ---------------------------------------------------------------------------
+class _GpiodGroup(LineGroup):
+    def __init__(self, backend, owner, pins, active_low=(), initial=None):
+        import gpiod
+        from gpiod.line import Direction, Value
+        super().__init__(owner, pins, active_low, initial)
+        self._v = (Value.INACTIVE, Value.ACTIVE)
+        self._offset = dict(self.pins)
+        config = {p: gpiod.LineSettings(direction=Direction.OUTPUT,
+                                        active_low=n in self.active_low,
+                                        output_value=self._v[self.levels[n]])
+                  for n, p in self.pins.items()}
+        self.request = gpiod.request_lines(backend.chip, consumer=f"autokart-{owner}",
+                                           config=config)
+
+    def _write1(self, name, level):
+        self.request.set_value(self._offset[name], self._v[level])
+        self.levels[name] = level
+
+    def _write(self, levels):
+        v, off = self._v, self._offset
+        self.request.set_values({off[n]: v[x] for n, x in levels.items()})
+        self.levels.update(levels)
+
+    def _release(self):
+        self.request.release()
+
+
+class GpiodBackend:
+    name = "gpiod"
+    LABEL = "pinctrl-rp1"          # the Pi 5's 40-pin header
+
+    def __init__(self, chip: str = None):
+        self.chip = chip or os.environ.get("AUTOKART_GPIOCHIP") or self.find_chip()
+
+    @classmethod
+    def find_chip(cls) -> str:
+        """The header's gpiochip: gpiochip0 on current Pi 5 kernels, 4 on older."""
+        import gpiod
+        paths = sorted(f"/dev/{d}" for d in os.listdir("/dev") if d.startswith("gpiochip"))
+        for path in paths:
+            with gpiod.Chip(path) as chip:
+                if chip.get_info().label == cls.LABEL:
+                    return path
+        if not paths:
+            raise FileNotFoundError("no /dev/gpiochip*")
+        return paths[0]
+
+    def claim(self, owner: str, pins: dict, active_low=(), initial=None) -> LineGroup:
+        return _GpiodGroup(self, owner, pins, active_low, initial)
+
+
+# ---------------------------------------------------------------------------
+# In-memory
+# ---------------------------------------------------------------------------
+class _MockGroup(LineGroup):
+    def __init__(self, backend, owner, pins, active_low=(), initial=None):
+        super().__init__(owner, pins, active_low, initial)
+        self._backend = backend
+        backend._claim(self)
+
+    def _write1(self, name, level):
+        self.levels[name] = level
+        self._backend._drive(((self.pins[name], level ^ (name in self.active_low)),))
+
+    def _write(self, levels):
+        self.levels.update(levels)
+        pins, low = self.pins, self.active_low
+        self._backend._drive([(pins[n], v ^ (n in low)) for n, v in levels.items()])
+
+    def _release(self):
+        self._backend._release(self)
+
+
+class MockBackend:
+    """
+    Physical levels by BCM pin and every edge, time-stamped with
+    time.monotonic(); a multi-line write records its edges with one stamp
+    and under one lock, so listeners see them together.
+    """
+
+    name = "mock"
+
+    def __init__(self, listeners=()):
+        self.edges = []
+        self.listeners = list(listeners)
+        self.writes = 0
+        self._levels = {}
+        self._owner = {}
+        self._lock = threading.Lock()
+
+    def claim(self, owner: str, pins: dict, active_low=(), initial=None) -> LineGroup:
+        return _MockGroup(self, owner, pins, active_low, initial)
+
+    def level(self, pin: int) -> int:
+        return self._levels.get(pin, 0)
+
+    def owner(self, pin: int):
+        return self._owner.get(pin)
+
+    def _claim(self, group):
+        with self._lock:
+            for n, p in group.pins.items():
+                if p in self._owner:
+                    raise LineBusy(f"GPIO{p} already claimed by {self._owner[p]}")
+            for n, p in group.pins.items():
+                self._owner[p] = group.owner
+        self._drive([(p, group.levels[n] ^ (n in group.active_low))
+                     for n, p in group.pins.items()])
+
+    def _release(self, group):
+        with self._lock:
+            for p in group.pins.values():
+                self._owner.pop(p, None)
+
+    def _drive(self, pairs):
+        changed = []
+        with self._lock:
+            self.writes += 1
+            t = time.monotonic()
+            for pin, level in pairs:
+                if self._levels.get(pin, 0) != level:
+                    self._levels[pin] = level
+                    changed.append(Edge(t, pin, level))
+            self.edges.extend(changed)
+        for e in changed:
+            for fn in self.listeners:
+                fn(e)
+
+
+# ---------------------------------------------------------------------------
+# Process-wide selection
+# ---------------------------------------------------------------------------
+BACKENDS = dict(gpiozero=GpiozeroBackend, gpiod=GpiodBackend, mock=MockBackend)
+
+_backend = None
+_lock = threading.Lock()
+
+
+def use(backend=None):
+    """Select the backend: an instance, a name, or None for $AUTOKART_GPIO."""
+    global _backend
+    if backend is None or isinstance(backend, str):
+        name = backend or os.environ.get("AUTOKART_GPIO", "gpiozero")
+        if name not in BACKENDS:
+            raise ValueError(f"unknown GPIO backend {name!r} (one of {', '.join(BACKENDS)})")
+        backend = BACKENDS[name]()
+    with _lock:
+        _backend = backend
+    return backend
+
+
+def default():
+    """The process-wide backend (built on first use)."""
+    with _lock:
+        if _backend is not None:
+            return _backend
+    return use()
+
+
+# ---------------------------------------------------------------------------
+# Microbenchmark
+# ---------------------------------------------------------------------------
+def _bench(names, n: int = 20000) -> None:
+    """
+    Per-edge and four-line transition cost of each backend, against the
+    gpiozero way of doing a transition: one call per line.
+    """
+    pins = dict(enable=19, fault=12, jneg=26, jpos=22)
+    us = 1e6
+    print(f"{n} operations each; a transition drives steering's four lines "
+          f"(jneg, jpos, fault, enable)")
+    print(f"  {'backend':24s} {'edge µs':>9s} {'4× per-line µs':>15s} {'set() µs':>9s} "
+          f"{'edges apart µs':>15s}")
+    for name in names:
+        try:
+            if name == "gpiozero" and not os.environ.get("GPIOZERO_PIN_FACTORY"):
+                import warnings
+                from gpiozero import Device
+                try:
+                    with warnings.catch_warnings():
+                        warnings.simplefilter("ignore")
+                        Device.ensure_pin_factory()
+                except Exception:                 # not on a Pi: gpiozero's own mock
+                    from gpiozero.pins.mock import MockFactory
+                    Device.pin_factory = MockFactory()
+            backend = BACKENDS[name]()
+            io = backend.claim("bench", pins)
+        except Exception as e:
+            print(f"  {name:24s} unavailable: {type(e).__name__}: {e}")
+            continue
+        label = name
+        if name == "gpiozero":
+            from gpiozero import Device
+            label += f" ({type(Device.pin_factory).__name__})"
+        line = io.line("jneg")
+        on, off = line.on, line.off
+        t = time.perf_counter()
+        for _ in range(n // 2):
+            on()
+            off()
+        edge = (time.perf_counter() - t) / n
+
+        a = [io.line(k) for k in ("jneg", "jpos", "fault", "enable")]
+        t = time.perf_counter()
+        for i in range(n // 2):
+            a[0].off(); a[1].on(); a[2].on(); a[3].on()       # noqa: E702
+            a[0].on(); a[1].off(); a[2].off(); a[3].off()     # noqa: E702
+        seq = (time.perf_counter() - t) / n
+
+        t = time.perf_counter()
+        for i in range(n // 2):
+            io.set(jneg=0, jpos=1, fault=1, enable=1)
+            io.set(jneg=1, jpos=0, fault=0, enable=0)
+        batch = (time.perf_counter() - t) / n
+
+        # how far apart the edges of one transition land (mock: exact)
+        spread = "—"
+        if isinstance(backend, MockBackend):
+            backend.edges.clear()
+            io.set(jneg=0, jpos=0, fault=0, enable=0)
+            backend.edges.clear()
+            a[0].on(); a[1].on(); a[2].on(); a[3].on()        # noqa: E702
+            per_line = backend.edges[-1].t - backend.edges[0].t
+            io.set(jneg=0, jpos=0, fault=0, enable=0)
+            backend.edges.clear()
+            io.set(jneg=1, jpos=1, fault=1, enable=1)
+            spread = f"{per_line * us:.2f} → {(backend.edges[-1].t - backend.edges[0].t) * us:.2f}"
+        io.close()
+        print(f"  {label:24s} {edge * us:9.2f} {seq * us:15.2f} {batch * us:9.2f} {spread:>15s}")
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="GPIO output backends")
+    ap.add_argument("cmd", choices=("bench",))
+    ap.add_argument("--backend", default="mock,gpiozero,gpiod",
+                    help="comma-separated backends to compare")
+    ap.add_argument("-n", type=int, default=20000)
+    args = ap.parse_args()
+    _bench(args.backend.split(","), args.n)
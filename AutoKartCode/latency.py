@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+latency.py – per-packet latency tracing from UART bytes to actuator writes
+
+Every published packet is traced under its snapshot sequence number.  The
+listener reports the read / parse / convert / publish timestamps, each worker
+reports when it picked a packet up, and the driver classes report the moment
+they touch the hardware:
+
+    read ─▶ parse ─▶ convert ─▶ publish ─▶ pickup:<sink> ─▶ write:<sink>
+
+Autonomy commands (command_link.py) are traced from their send timestamp:
+
+    send ─▶ pickup:<sink> ─▶ write:<sink>       reported as cmd→write:<sink>
+
+Stage-to-stage deltas go into log-scale histograms (four buckets per octave,
+1 µs … ~60 s) so percentiles are available at any time without keeping the
+samples.  Tracing is off unless `TRACER.enabled` is set; every call site
+checks that flag first, so a disabled tracer costs one attribute load.
+
+Query a running controller over its Unix socket:
+
+    python3 latency.py query /tmp/autokart-latency.sock
+"""
+import bisect
+import json
+import os
+import socket
+import threading
+import time
+
+_EDGES = [2 ** (i / 4) * 1e-6 for i in range(4 * 26)]   # seconds
+_RING = 256
+
+
+class Histogram:
+    __slots__ = ("counts", "n", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(_EDGES) + 1)
+        self.n = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, dt: float) -> None:
+        self.counts[bisect.bisect_right(_EDGES, dt)] += 1
+        self.n += 1
+        self.total += dt
+        if self.min is None or dt < self.min:
+            self.min = dt
+        if self.max is None or dt > self.max:
+            self.max = dt
+
+    def percentile(self, p: float) -> float:
+        """Upper edge of the bucket holding the *p*-th percentile (s)."""
+        want = p / 100.0 * self.n
+        run = 0
+        for i, c in enumerate(self.counts):
+            run += c
+            if run >= want and c:
+                return min(_EDGES[i], self.max) if i < len(_EDGES) else self.max
+        return self.max
+
+    def summary(self) -> dict:
+        if not self.n:
+            return dict(n=0)
+        us = 1e6
+        return dict(n=self.n, mean_us=self.total / self.n * us,
+                    min_us=self.min * us, p50_us=self.percentile(50) * us,
+                    p90_us=self.percentile(90) * us, p99_us=self.percentile(99) * us,
+                    max_us=self.max * us)
+
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self._hist = {}
+        self._seq = [-1] * _RING
+        self._t_read = [0.0] * _RING
+        self._t_pub = [0.0] * _RING
+        self._pickup = {}             # sink → (seq, t_pickup, t_sent) awaiting a write
+        self._picked = {}             # sink → last seq picked up
+        self._cmd_picked = {}         # sink → last command seq picked up
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Call sites (check `enabled` before calling)
+    # ------------------------------------------------------------------
+    def packet(self, seq: int, t_read: float, t_parse: float, t_conv: float, t_pub: float):
+        i = seq % _RING
+        self._seq[i] = seq
+        self._t_read[i] = t_read
+        self._t_pub[i] = t_pub
+        self._add("read→parse", t_parse - t_read)
+        self._add("parse→convert", t_conv - t_parse)
+        self._add("convert→publish", t_pub - t_conv)
+
+    def pickup(self, sink: str, seq: int) -> None:
+        now = time.monotonic()
+        i = seq % _RING
+        if self._seq[i] != seq or self._picked.get(sink) == seq:
+            return                    # untraced, aged out, or a keepalive re-read
+        self._picked[sink] = seq
+        self._pickup[sink] = (seq, now, None)
+        self._add(f"publish→pickup:{sink}", now - self._t_pub[i])
+
+    def command(self, sink: str, seq: int, t_sent: float) -> None:
+        """A worker acted on autonomy command *seq*, sent at *t_sent*."""
+        now = time.monotonic()
+        if self._cmd_picked.get(sink) == seq:
+            return
+        self._cmd_picked[sink] = seq
+        self._pickup[sink] = (None, now, t_sent)
+        self._add(f"send→pickup:{sink}", now - t_sent)
+
+    def write(self, sink: str) -> None:
+        now = time.monotonic()
+        picked = self._pickup.pop(sink, None)
+        if picked is None:
+            return                    # refresh / write not caused by a packet
+        seq, t_pickup, t_sent = picked
+        self._add(f"pickup→write:{sink}", now - t_pickup)
+        if t_sent is not None:
+            self._add(f"cmd→write:{sink}", now - t_sent)
+            return
+        i = seq % _RING
+        if self._seq[i] == seq:
+            self._add(f"read→write:{sink}", now - self._t_read[i])
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+    def report(self) -> dict:
+        with self._lock:
+            return {k: h.summary() for k, h in self._hist.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._hist.clear()
+
+    def format(self) -> str:
+        lines = [f"{'stage':30s} {'n':>7s} {'p50 µs':>9s} {'p90 µs':>9s} "
+                 f"{'p99 µs':>9s} {'max µs':>9s}"]
+        for k, s in self.report().items():
+            if s["n"]:
+                lines.append(f"{k:30s} {s['n']:7d} {s['p50_us']:9.0f} {s['p90_us']:9.0f} "
+                             f"{s['p99_us']:9.0f} {s['max_us']:9.0f}")
+        return "\n".join(lines)
+
+    def serve(self, path: str) -> None:
+        """Answer 'stats' / 'reset' over a Unix stream socket at *path*."""
+        if os.path.exists(path):
+            os.unlink(path)
+        srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        srv.bind(path)
+        srv.listen(2)
+
+        def run():
+            while True:
+                conn, _ = srv.accept()
+                with conn:
+                    cmd = conn.recv(64).strip()
+                    if cmd == b"reset":
+                        self.reset()
+                        conn.sendall(b"{}\n")
+                    else:
+                        conn.sendall(json.dumps(self.report()).encode() + b"\n")
+
+        threading.Thread(target=run, name="latency-sock", daemon=True).start()
+
+    def _add(self, key: str, dt: float) -> None:
+        h = self._hist.get(key)
+        if h is None:
+            with self._lock:
+                h = self._hist.setdefault(key, Histogram())
+        h.add(dt)
+
+
+TRACER = Tracer()
+
+
+def query(path: str, cmd: str = "stats") -> dict:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.connect(path)
+        s.sendall(cmd.encode())
+        data = b""
+        while not data.endswith(b"\n"):
+            chunk = s.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    return json.loads(data)
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) >= 3 and sys.argv[1] in ("query", "reset"):
+        report = query(sys.argv[2], "reset" if sys.argv[1] == "reset" else "stats")
+        for k, s in report.items():
+            if s.get("n"):
+                print(f"{k:30s} n={s['n']:<7d} p50={s['p50_us']:8.0f} µs  "
+                      f"p99={s['p99_us']:8.0f} µs  max={s['max_us']:8.0f} µs")
+    else:
+        print("usage: latency.py query|reset SOCKET")
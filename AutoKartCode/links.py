@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+links.py – redundant receiver links with freshness-based failover
+
+Each receiver (the UART on /dev/ttyAMA0, the wireless receiver on
+/dev/ttyACM0, …) is a `Link`: its own port, decoder and reader, and its
+own health –
+
+    rate    frames/s (EWMA over read batches)
+    errors  fraction of malformed / CRC-failed frames (EWMA)
+    age     time since its last good frame
+
+`LinkArbiter` publishes only from the active link.  The active link is
+the most preferred (first listed) healthy one: fresh within `stale` and
+below `max_errors`.  When it goes stale or corrupt the arbiter switches
+to the best healthy backup and immediately publishes that link's newest
+frame – `poll()` runs at the active link's stale deadline, so the switch
+happens within `stale` of its last frame even if the backup is slow.
+With `stale` under the watchdog's HOLD deadline the controller never
+sees the gap: no hold, no zero throttle, no e-stop.  A preferred link
+takes over again once it has stayed healthy for `failback` seconds.
+
+Every switch is logged (LINK_SWITCH event) and kept in `failovers` with
+the publish gap it caused; `gap_ms_max` covers the stale / corrupt ones –
+after losing every link ("resume") the gap is the outage, not the switch.
+
+    python3 links.py [--stale 0.3]      # two pty stand-in receivers, primary
+                                        # goes silent, then garbled, then back
+"""
+import threading
+import time
+from collections import deque, namedtuple
+
+from eventlog import log, SRC_MAIN, EV_LINK_SWITCH
+
+# why the arbiter switched
+REASON_STALE, REASON_CORRUPT, REASON_FAILBACK, REASON_RESUME = 1, 2, 3, 4
+REASONS = {REASON_STALE: "stale", REASON_CORRUPT: "corrupt", REASON_FAILBACK: "failback",
+           REASON_RESUME: "resume"}                # first back after every link was lost
+
+Failover = namedtuple("Failover", "t frm to reason gap")
+
+ALPHA = 0.2             # EWMA weight of one read batch
+
+
+class Link:
+    """One receiver: port, decoder, reader thread and health counters."""
+
+    def __init__(self, name: str, ser=None, dec=None, opener=None, recorder=None):
+        self.name = name
+        self.ser = ser
+        self.dec = dec
+        self.opener = opener               # () → (ser, dec), to (re)open the port
+        self.recorder = recorder
+        self._stop = threading.Event()
+
+        # health
+        self.t_last = None                 # read time of the newest good frame
+        self.t_ok = None                   # healthy without a break since
+        self.rate = 0.0
+        self.errors = 0.0
+        self._frames = 0
+        self._bad = 0
+
+        # statistics
+        self.frames = 0
+        self.bad = 0
+        self.reopens = 0
+        self.down = ser is None
+        if dec is not None:
+            self._sync()
+
+    def feed(self, data: bytes, t: float) -> int:
+        """Decode one read; returns the number of new good frames."""
+        if self.recorder is not None and data:
+            self.recorder.write(data, t)
+        if data:
+            self.dec.feed(data)
+        s = self.dec.stats()
+        frames, bad = s["frames"], s["malformed"] + s.get("crc_errors", 0)
+        new, new_bad = frames - self._frames, bad - self._bad
+        self._frames, self._bad = frames, bad
+        if new or new_bad:
+            self.errors += ALPHA * (new_bad / (new + new_bad) - self.errors)
+            self.frames += new
+            self.bad += new_bad
+        if new:
+            if self.t_last is not None and t > self.t_last:
+                self.rate += ALPHA * (new / (t - self.t_last) - self.rate)
+            self.t_last = t
+        return new
+
+    def _sync(self) -> None:
+        """Take over a decoder that already has frames (boot, baud scan)."""
+        s = self.dec.stats()
+        self._frames, self._bad = s["frames"], s["malformed"] + s.get("crc_errors", 0)
+        if self._frames:
+            self.t_last = self.t_ok = time.monotonic()
+
+    def age(self, now: float) -> float:
+        return float("inf") if self.t_last is None else now - self.t_last
+
+    def healthy(self, now: float, stale: float, max_errors: float) -> bool:
+        return self.age(now) < stale and self.errors <= max_errors
+
+    def stats(self, now: float = None) -> dict:
+        now = time.monotonic() if now is None else now
+        age = self.age(now)
+        return dict(name=self.name, frames=self.frames, bad=self.bad,
+                    rate=self.rate, errors=self.errors,
+                    age_ms=None if age == float("inf") else age * 1e3,
+                    down=self.down, reopens=self.reopens)
+
+    # ------------------------------------------------------------------
+    def run(self, arbiter: "LinkArbiter") -> None:
+        """Reader thread: block for a byte, then take everything waiting."""
+        while not self._stop.is_set():
+            if self.ser is None and not self._reopen():
+                continue
+            try:
+                data = self.ser.read(self.ser.in_waiting or 1)
+            except (OSError, TypeError):   # unplugged (a closed pyserial port: TypeError)
+                if self._stop.is_set():
+                    return
+                self.lost()
+                continue
+            arbiter.receive(self, data, time.monotonic())
+
+    def start(self, arbiter: "LinkArbiter") -> None:
+        threading.Thread(target=self.run, args=(arbiter,), name=f"link-{self.name}",
+                         daemon=True).start()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self.ser is not None:
+            self.ser.close()
+
+    def lost(self) -> None:
+        print(f"[Link] {self.name} lost")
+        try:
+            self.ser.close()
+        except OSError:
+            pass
+        self.ser, self.down = None, True
+
+    def _reopen(self) -> bool:
+        if self.opener is None:
+            self._stop.wait(1.0)
+            return False
+        try:
+            self.ser, self.dec = self.opener()
+        except Exception:                  # serial.SerialException, BootError, …
+            self._stop.wait(1.0)
+            return False
+        self._sync()
+        self.reopens += 1
+        self.down = False
+        print(f"[Link] {self.name} open")
+        return True
+
+
+class LinkArbiter:
+    """Publishes from the best healthy link; see the module doc."""
+
+    def __init__(self, links, publish, stale: float = 0.3, max_errors: float = 0.2,
+                 failback: float = 1.0, on_switch=None):
+        self.links = list(links)
+        self.publish = publish             # (decoder, t_read) → None
+        self.stale = stale
+        self.max_errors = max_errors
+        self.failback = failback
+        self.on_switch = on_switch         # (link) → None
+        self.active = self.links[0]
+        self._lock = threading.Lock()      # one publisher at a time
+        self._t_pub = None
+        self._stop = threading.Event()
+
+        # statistics
+        self.failovers = deque(maxlen=64)
+
+    # ------------------------------------------------------------------
+    def receive(self, link: Link, data: bytes, t: float) -> None:
+        """A link's reader hands over one read."""
+        with self._lock:
+            prev = link.t_last
+            new = link.feed(data, t)
+            bad = link.errors > self.max_errors
+            if bad or (new and prev is not None and t - prev >= self.stale):
+                link.t_ok = None if bad else t     # broken: start the clock again
+            elif new and link.t_ok is None:
+                link.t_ok = t
+            if not new:
+                return
+            if link is not self.active:
+                reason = self._takeover(link, t)
+                if reason is None:
+                    return
+                if prev is None or t - prev >= self.stale:
+                    reason = REASON_RESUME     # nothing was healthy a moment ago
+                self._switch(link, reason, t)
+            self._t_pub = t
+            self.publish(link.dec, t)
+
+    def poll(self) -> float:
+        """Switch away from a stale or corrupt active link now, if another
+        is healthy; returns when to poll next (monotonic)."""
+        now = time.monotonic()
+        with self._lock:
+            act = self.active
+            if not act.healthy(now, self.stale, self.max_errors):
+                best = self._best(now)
+                if best is not None and best is not act and best.t_last > (act.t_last or 0):
+                    reason = REASON_CORRUPT if act.age(now) < self.stale else REASON_STALE
+                    self._switch(best, reason, now)
+                    self._t_pub = best.t_last
+                    self.publish(best.dec, best.t_last)
+                    act = best
+            t_last = act.t_last
+        if t_last is None or now - t_last >= self.stale:
+            return now + self.stale / 4
+        return t_last + self.stale
+
+    def start(self) -> None:
+        for link in self.links:
+            link.start(self)
+        threading.Thread(target=self._run, name="link-arbiter", daemon=True).start()
+
+    def close(self) -> None:
+        self._stop.set()
+        for link in self.links:
+            link.close()
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        gaps = [f.gap for f in self.failovers
+                if f.gap is not None and f.reason in (REASON_STALE, REASON_CORRUPT)]
+        return dict(active=self.active.name, links=[l.stats(now) for l in self.links],
+                    failovers=len(self.failovers),
+                    gap_ms_max=max(gaps) * 1e3 if gaps else None,
+                    history=[(round(f.t, 3), f.frm, f.to, REASONS[f.reason],
+                              None if f.gap is None else round(f.gap * 1e3, 1))
+                             for f in self.failovers])
+
+    # ------------------------------------------------------------------
+    def _run(self):
+        while not self._stop.is_set():
+            self._stop.wait(max(0.0, self.poll() - time.monotonic()))
+
+    def _best(self, now: float):
+        for link in self.links:            # in order of preference
+            if link.healthy(now, self.stale, self.max_errors):
+                return link
+        return None
+
+    def _takeover(self, link: Link, t: float):
+        """Why *link* should replace the active link, or None."""
+        act = self.active
+        if not link.healthy(t, self.stale, self.max_errors):
+            return None
+        if not act.healthy(t, self.stale, self.max_errors):
+            return REASON_CORRUPT if act.age(t) < self.stale else REASON_STALE
+        if (self.links.index(link) < self.links.index(act) and link.t_ok is not None
+                and t - link.t_ok >= self.failback):
+            return REASON_FAILBACK
+        return None
+
+    def _switch(self, link: Link, reason: int, t: float) -> None:
+        prev, self.active = self.active, link
+        t_new = link.t_last if link.t_last is not None else t
+        gap = None if self._t_pub is None else max(0.0, t_new - self._t_pub)
+        self.failovers.append(Failover(t, prev.name, link.name, reason, gap))
+        log(SRC_MAIN, EV_LINK_SWITCH, self.links.index(link), self.links.index(prev),
+            reason, int((gap or 0) * 1e3))
+        print(f"[Link] {prev.name} → {link.name} ({REASONS[reason]}"
+              + (f", {gap * 1e3:.0f} ms gap)" if gap is not None else ")"))
+        if self.on_switch is not None:
+            self.on_switch(link)
+
+
+# ---------------------------------------------------------------------------
+# Stand-alone: two pty stand-in receivers
+# ---------------------------------------------------------------------------
+if __name__ == "__main__":
+    import argparse
+    import os
+    import tty
+    from packets import make_decoder
+
+    ap = argparse.ArgumentParser(description="Failover between two pty receivers")
+    ap.add_argument("--stale", type=float, default=0.3)
+    ap.add_argument("--period", type=float, default=0.02, help="frame period (s)")
+    args = ap.parse_args()
+
+    class PtyPort:
+        """Enough of serial.Serial on a pty slave for a Link."""
+
+        def __init__(self, fd):
+            self.fd = fd
+            self.in_waiting = 0
+
+        def read(self, n):
+            return os.read(self.fd, 4096)
+
+        def close(self):
+            os.close(self.fd)
+
+    def pty_link(name):
+        master, slave = os.openpty()
+        tty.setraw(slave)
+        return master, Link(name, PtyPort(slave), make_decoder("csv"))
+
+    # primary: fine, silent, fine, garbled, fine; the backup never stops
+    def plan(t):
+        if 1.0 <= t < 2.0:
+            return None
+        return "garbled" if 3.0 <= t < 4.0 else "ok"
+
+    published = []
+    m_a, a = pty_link("primary")
+    m_b, b = pty_link("backup")
+    arb = LinkArbiter([a, b], lambda dec, t: published.append((t, dec is a.dec)),
+                      stale=args.stale)
+    os.write(m_a, b"992,992,1809,1809,1809,1809\n")     # the primary is up first
+    time.sleep(0.05)
+    arb.start()
+    t0 = time.monotonic()
+    line = b"1400,992,1809,1809,1809,1809\n"
+    while (t := time.monotonic() - t0) < 6.0:
+        mode = plan(t)
+        if mode == "ok":
+            os.write(m_a, line)
+        elif mode == "garbled":
+            os.write(m_a, b"14\xff0,99x,1809,,1809\n" if int(t * 50) % 3 else line)
+        os.write(m_b, line)
+        time.sleep(args.period)
+    time.sleep(0.1)
+    arb.close()
+    gaps = [t2 - t1 for (t1, _), (t2, _) in zip(published, published[1:])]
+    print(f"{len(published)} frames published, longest gap {max(gaps) * 1e3:.0f} ms "
+          f"(stale bound {args.stale * 1e3:.0f} ms)")
+    for t, frm, to, why, gap in arb.stats()["history"]:
+        print(f"  {t - t0:6.2f} s  {frm} → {to}  {why:8s} gap {gap} ms")
@@ -3,13 +3,50 @@
 main.py
 =======
 
- * Reads comma-separated packets from /dev/ttyAMA0 (1200 baud).
- * Maps the six raw numbers exactly as you specified.
- * Spawns threads for throttle, steering, brake and a safety / mode supervisor.
+ * Reads packets from /dev/ttyAMA0 – binary CRC frames or the old
+   comma-separated lines, baud rate and format detected automatically.
+ * Maps the raw numbers exactly as you specified (the default channel-map
+   profile – pass --channel-map for another receiver layout), after a
+   conditioning stage (conditioning.py): steering deadband and brake
+   hysteresis against receiver noise, the mode switch median-filtered,
+   the e-stops untouched; --condition off maps the raw numbers directly.
+ * The throttle position goes through a response curve (curves.py: linear,
+   expo, S-curve, a capped pit curve or a point list, each a lookup table),
+   switchable while driving from a receiver channel or `curves.py select`;
+   --throttle-slew ramps a rising wiper in the output stage (off by
+   default; e.g. 510 takes it from idle to full in 0.5 s, so a curve swap
+   mid-throttle never steps it).
+ * With --link PORT[,BAUD[,FORMAT]] (e.g. the wireless receiver on
+   /dev/ttyACM0) every receiver has its own reader and decoder and the
+   freshest healthy one is published (links.py); a stale or corrupt
+   primary fails over within --link-stale, inside the watchdog's HOLD
+   deadline, so the kart keeps driving instead of stopping.
+ * In autonomous mode (mode channel = 172) the workers follow setpoints
+   from the autonomy stack instead (command_link.py).
+ * Steering either jogs a fixed 200 ms per direction command, or – with
+   --steering proportional – turns the stick's deflection into a jog
+   train whose width and rate follow it (Steering.set_effort).
+ * Brings the hardware up in parallel and self-tests it first (boot.py);
+   GPIO-24 is not enabled unless every test passed.
+ * Spawns threads for throttle, steering, brake and a safety / mode supervisor
+   (or, with --runtime asyncio, runs them all on one event loop – see
+   aio_runtime.py).
  * If either e-stop goes active the supervisor:
       – disables throttle and steering,
       – applies the brake,
-      – drops the enable-pin on GPIO-24.
+      – drops the enable-pin on GPIO-24,
+   once, on entry (estop.py's latched state machine), re-asserting them
+   only every ESTOP_REASSERT; the drive comes back after the cause has
+   stayed clear for ESTOP_CLEAR_HOLD.
+   With --supervisor process the e-stop decision and GPIO-24 move into a
+   separate, higher-priority process (safety_proc.py), which latches and
+   holds the clear the same way; the supervisor thread then only follows
+   what it posts back.
+ * --telemetry DIR records every published packet, wiper write, steering
+   pulse, brake move and e-stop transition as column files off the
+   control path; `telemetry.py query DIR` summarises a run afterwards.
+ * GPIO goes through gpio_backend.py – gpiozero by default, --gpio gpiod
+   for libgpiod line requests (multi-line transitions in one write).
 
 Hardware pins used
 ------------------
@@ -34,171 +71,599 @@ The three helper modules must expose classes:
 Each of them must implement at minimum:
 
     .set(value)        # Throttle 0-255
-    .set_dir(value)    # Steering  -1/0/+1     (blocks internally for 1 ms pulse)
+    .set_dir(value)    # Steering  -1/0/+1     (returns at once, pulses on a timer)
+    .set_effort(value) # Steering  -1.0 … +1.0 (proportional mode)
     .apply() / .release()   # Brake
     .disable() / .enable()  # For safety
 
 Feel free to adapt the names – just change the calls below.
 """
 
-import serial, threading, time
-from gpiozero import DigitalOutputDevice
-from throttle import Throttle
-from steering import Steering
-from brake import Brake
+import argparse, json, os, sys, threading, time
+# the drivers (gpiozero, spidev), pyserial and multiprocessing are imported
+# where they are used, so bring_up() can load them in parallel
+from packets import (PacketDecoder, BaudScanner, make_decoder,  # noqa: F401
+                     parse_packet, convert_packet)
+from snapshot import VersionedState
+from channel_map import ChannelMap, PACKET_OUTPUTS
+from conditioning import Conditioner, DEFAULT_CONFIG as CONDITIONING
+from notify import ChangeNotifier
+from eventlog import (LOG, log, SRC_MAIN, EV_RAW, EV_MAPPED, EV_ESTOP, EV_ESTOP_CLEAR,
+                      EV_RX)
+from latency import TRACER
+from capture import Capture, CaptureWriter, ReplayPort
+from watchdog import LinkWatchdog, ZERO, FAILSAFE
+from command_link import CommandListener, SOCKET as CMD_SOCKET
+from curves import CurveSet, CurveListener, SOCKET as CURVE_SOCKET
+from links import Link, LinkArbiter
+from boot import (Boot, BootError, wiper_test, gpio_test, outputs, first_packet)
+from estop import EstopMachine, CAUSE_SWITCH, CAUSE_LINK, CAUSE_SUPERVISOR, CAUSES
+import gpio_backend
 
 
 # ---------------------------------------------------------------------------
-# Mapping helpers (exactly the same maths you used previously)
+# Global shared state
 # ---------------------------------------------------------------------------
-def parse_packet(raw: str):
-    """Return list[int] of six values or None if malformed."""
-    try:
-        vals = [int(x) for x in raw.split(",")]
-        return vals if len(vals) == 6 else None
-    except ValueError:
-        return None
+# Raw channels → the mapped command the workers index by position
+MAPPED = PACKET_OUTPUTS + ("steer_effort",)
+channel_map = ChannelMap.default(MAPPED)
+# Filters, deadbands and hysteresis in front of the map (None = raw mapping)
+conditioner = None
 
 
-def convert_packet(vals):
-    """Return mapped list[int] according to the rules in the brief."""
-    t_raw, steer_raw, brake_raw, ea_raw, eb_raw, mode_raw = vals
+class Shared(VersionedState):
+    """Receiver state; `read()` returns an immutable (seq, t_rx, raw, mapped)."""
 
-    # throttle 1809-992  →  0-255  (reversed)
-    offset = max(0, min(817, 1809 - t_raw))
-    throttle = int(((817 - offset) / 817) * 255)
+    def __init__(self):
+        # sane defaults
+        raw = [992, 992, 1809, 1809, 1809, 1809]
+        super().__init__(raw, channel_map(raw))
 
-    # steering              >992:1, ==992:0, <992:-1
-    steering = 1 if steer_raw > 992 else -1 if steer_raw < 992 else 0
 
-    # brake                 >992→0  else 1
-    brake = 0 if brake_raw > 992 else 1
+state = Shared()
 
-    # e-stop A/B            <1809→1  else 0
-    estop_a = 1 if ea_raw < 1809 else 0
-    estop_b = 1 if eb_raw < 1809 else 0
+# An event other threads can watch
+estop_event = threading.Event()
 
-    # mode                  172→1 (auto)  else 0 (remote)
-    mode = 1 if mode_raw == 172 else 0
+# Wakes the actuator workers when their mapped channels change
+changes = ChangeNotifier()
 
-    return [throttle, steering, brake, estop_a, estop_b, mode]
+STEER_REPEAT = 0.05     # re-issue a held steering direction this often
+STEER_MODE = "jog"      # or "proportional" (deflection → jog train)
+UART_BAUD = "auto"      # or fixed, e.g. 1200 for the old CSV transmitters
+RX_FORMAT = "auto"      # "csv", "binary" or "auto"
+THROTTLE_REFRESH = 0.5  # output stage re-sends the wiper value this often
+THROTTLE_SLEW = None    # wiper counts/s a rising throttle may ramp at (None = step)
+ESTOP_CLEAR_HOLD = 0.25 # e-stop cause must stay gone this long before re-enable
+ESTOP_REASSERT = 0.5    # re-assert the latched outputs this often
 
 
-# ---------------------------------------------------------------------------
-# Global shared state
-# ---------------------------------------------------------------------------
-class Shared:
-    def __init__(self):
-        self.lock = threading.Lock()
-        # sane defaults
-        self.raw = [992, 992, 1809, 1809, 1809, 1809]
-        self.mapped = convert_packet(self.raw)
+# Escalates hold → zero throttle → brake + enable low when packets stop
+watchdog = LinkWatchdog(state, on_change=changes.wake)
 
+# The listener's decoder once the link is up – its counters are the link quality
+receiver = None
 
-state = Shared()
+# Redundant receivers (links.py, --link): the arbiter publishes the best one
+links = None
+LINK_STALE = 0.3        # fail over when the active receiver is silent this long
 
-# An event other threads can watch
-estop_event = threading.Event()
+# The supervisor process and its shared memory (--supervisor process)
+supervisor_link = None
+
+# Startup phases and self-test results (boot.py)
+boot = None
+
+# The supervisor's e-stop state machine (estop.py), built on its first pass
+estop_sm = None
+_posted_estop = False   # --supervisor process: its last post was ESTOP
+
+# Throttle response curves (curves.py); `curves.table` is swapped, never locked
+curves = CurveSet()
+curve_link = None
+
+# Column-file run recording (telemetry.py, --telemetry)
+telemetry = None
+
+# Autonomy setpoints (command_link.py), consumed while mode == 1
+commands = None
+_auto_steer = 0         # last steering direction taken from a command
+
+
+def estopped(mapped) -> bool:
+    """True while the workers must leave the actuators alone."""
+    return (estop_event.is_set() or bool(mapped[3] or mapped[4])
+            or watchdog.level >= ZERO)
 
 
 # ---------------------------------------------------------------------------
 # Worker threads
 # ---------------------------------------------------------------------------
-def uart_listener(port="/dev/ttyAMA0"):
-    ser = serial.Serial(port, 1200, timeout=1)
+def open_receiver(port, baud=UART_BAUD, fmt=RX_FORMAT, timeout=0.0):
+    """
+    Open the receiver port and return (serial, decoder).  With baud "auto"
+    the candidate rates are tried in turn until frames decode (for at most
+    *timeout* seconds, 0 = for ever).
+    """
+    import serial
+    if baud != "auto":
+        return (serial.Serial(port, int(baud), timeout=0.1),
+                make_decoder(fmt, channels=channel_map.channels))
+    scan = BaudScanner(fmt=fmt, channels=channel_map.channels)
+    ser = serial.Serial(port, scan.baud, timeout=0.1)
+    t_give_up = time.monotonic() + timeout
+    while not timeout or time.monotonic() < t_give_up:
+        ser.baudrate = scan.baud
+        ser.reset_input_buffer()
+        t_end = time.monotonic() + scan.window
+        while time.monotonic() < t_end:
+            if scan.feed(ser.read(ser.in_waiting or 1)):
+                print(f"[Receiver] {scan.decoder.format} frames at {scan.baud} baud")
+                return ser, scan.decoder
+        scan.next()
+    ser.close()
+    raise BootError(f"no receiver frames at any baud within {timeout:g} s")
+
+
+def uart_listener(port="/dev/ttyAMA0", ser=None, recorder=None,
+                  baud=UART_BAUD, fmt=RX_FORMAT, dec=None):
+    """
+    *ser* overrides opening *port* (e.g. a capture.ReplayPort, or the port
+    bring_up() opened together with its decoder *dec*); every read is also
+    appended to *recorder* (a capture.CaptureWriter) if given.
+    """
+    global receiver
+    if ser is None:
+        ser, dec = open_receiver(port, baud, fmt)
+        if dec.count:                      # frames that completed the scan
+            publish(dec, time.monotonic())
+        if recorder is not None:
+            recorder.set_baud(ser.baudrate)
+    elif dec is None:
+        dec = make_decoder(fmt, channels=channel_map.channels)
+    receiver = dec
     while True:
-        line = ser.readline().decode(errors="replace").strip()
-        pkt = parse_packet(line)
-        if pkt:
-            with state.lock:
-                state.raw = pkt
-                state.mapped = convert_packet(pkt)
+        # block for the first byte, then take everything already waiting
+        data = ser.read(ser.in_waiting or 1)
+        receive(dec, data, time.monotonic(), recorder)
+
+
+def link_spec(text):
+    """--link PORT[,BAUD[,FORMAT]] → (port, baud, fmt)."""
+    port, baud, fmt = (text.split(",") + ["auto", "auto"])[:3]
+    if fmt not in ("auto", "csv", "binary") or not (baud == "auto" or baud.isdigit()):
+        raise argparse.ArgumentTypeError(f"{text!r}: PORT[,BAUD|auto[,csv|binary|auto]]")
+    return port, baud, fmt
+
+
+def link_switched(link):
+    global receiver
+    receiver = link.dec
+
+
+def receive(dec, data, t_read, recorder=None):
+    """Decode one read's worth of bytes and publish the newest packet."""
+    if recorder is not None and data:
+        recorder.write(data, t_read)
+    if data and dec.feed(data):
+        publish(dec, t_read)
+
+
+def publish(dec, t_read):
+    """Publish the newest frame of *dec*'s last batch."""
+    t_parse = time.monotonic()
+    pkt = dec.latest()             # only the newest frame matters
+    mapped = channel_map(pkt) if conditioner is None else conditioner(pkt)
+    t_conv = time.monotonic()
+    if supervisor_link is not None:     # the e-stop path first
+        supervisor_link.publish(pkt, mapped, t_read)
+    seq = state.publish(pkt, mapped, t_read)
+    changes.update(mapped, t_read)
+    if telemetry is not None:
+        telemetry.packet(t_read, seq, pkt, mapped)
+    if curves.channel is not None and curves.follow(pkt[curves.channel]):
+        changes.wake((0,))             # same stick, new curve
+    if TRACER.enabled:
+        TRACER.packet(seq, t_read, t_parse, t_conv, time.monotonic())
+
+
+def supervise(actuators):
+    """
+    One pass of the safety supervisor: work out whether an e-stop cause is
+    present and step the state machine, which acts only on transitions –
+    entering drops enable-pin GPIO-24, zeroes throttle, disables steering
+    pulses and applies the brake; the drive comes back once the cause has
+    stayed away for ESTOP_CLEAR_HOLD.
+    """
+    global estop_sm
+    if supervisor_link is not None:
+        return follow(actuators)
+    if estop_sm is None:
+        estop_sm = estop_machine(actuators)
+    ea, eb = state.read().mapped[3:5]
+    estop_sm.step(CAUSE_SWITCH if ea or eb else
+                  CAUSE_LINK if watchdog.level >= FAILSAFE else None)
 
 
-def safety_supervisor(actuators):
+def follow(actuators):
     """
-    * Drops enable-pin GPIO-24 when e-stop asserted.
-    * Applies brake, zeroes throttle, disables steering pulses.
+    supervise() when the supervisor runs in its own process: it has already
+    dropped GPIO-24, this applies the rest of what it posted.  A supervisor
+    process that stops answering counts as an e-stop.
     """
-    drv_enable = actuators['throttle'].enable
+    global estop_sm, _posted_estop
+    from safety_proc import ESTOP
+    link = supervisor_link
+    if link.closed:                    # shutting down
+        return
+    if estop_sm is None:
+        estop_sm = estop_machine(actuators, own_enable=False)
+    for action, _ in link.commands():
+        _posted_estop = action == ESTOP
+    if not link.alive():
+        cause = CAUSE_SUPERVISOR
+    elif _posted_estop:
+        ea, eb = state.read().mapped[3:5]
+        cause = CAUSE_SWITCH if ea or eb else CAUSE_LINK
+    else:
+        cause = None
+    estop_sm.step(cause)
+
+
+def estop_machine(actuators, own_enable: bool = True) -> EstopMachine:
+    """
+    The supervisor's actions on *actuators*.  With *own_enable* False the
+    supervisor process owns GPIO-24: zero the wiper instead of disable(),
+    and release on its CLEAR, which it only posts after ESTOP_CLEAR_HOLD.
+    """
+    throttle, steering, brake = (actuators[k] for k in ("throttle", "steering", "brake"))
+    drv_enable = throttle.enable
 
-    while True:
-        with state.lock:
-            t, s, b, ea, eb, mode = state.mapped
-        estop_now = ea or eb
-        if estop_now:
-            if not estop_event.is_set():
-                print(">>>  E-STOP TRIGGERED  <<<")
-            estop_event.set()
+    def safe_outputs():
+        if own_enable:
+            throttle.disable()
+        else:
+            throttle.set_wiper(0)      # not disable(): the pin is theirs
+        steering.disable()
+        brake.apply()                  # no-op once applied / applying
+
+    def enter(cause):
+        if own_enable:
+            drv_enable.off()           # first: the one that matters
+        estop_event.set()
+        changes.wake()
+        safe_outputs()
+        log(SRC_MAIN, EV_ESTOP)
+        print(">>>  E-STOP TRIGGERED  <<<" if cause == CAUSE_SWITCH else
+              f">>>  {CAUSES[cause].upper()} – FAILSAFE  <<<")
+
+    def hold():
+        if own_enable:
             drv_enable.off()
-            actuators['throttle'].disable()
-            actuators['steering'].disable()
-            actuators['brake'].apply()
+        safe_outputs()
+
+    def release():
+        steering.enable()
+        if own_enable:
+            drv_enable.on()            # driver re-enable
+        estop_event.clear()
+        changes.wake()
+        log(SRC_MAIN, EV_ESTOP_CLEAR)
+        print("E-stop cleared – drive re-enabled")
+
+    return EstopMachine(enter, hold, release, keep=drv_enable.on if own_enable else None,
+                        clear_hold=ESTOP_CLEAR_HOLD if own_enable else 0.0,
+                        reassert=ESTOP_REASSERT)
+
+
+def drive_enable():
+    """Enable output for the Throttle: None (its own GPIO-24) or the
+    supervisor process's stand-in."""
+    return supervisor_link.enable if supervisor_link is not None else None
+
+
+def command_changed():
+    """A new autonomy command arrived, or the newest one went stale."""
+    if state.read().mapped[5]:
+        changes.wake((0, 1, 2))
+
+
+def autonomy(sink):
+    """The fresh autonomy command for *sink*'s worker, or None (→ stop)."""
+    cmd = commands.latest() if commands is not None else None
+    if cmd is not None and TRACER.enabled:
+        TRACER.command(sink, cmd.seq, cmd.t_sent)
+    return cmd
+
+
+def throttle_step(th):
+    snap = state.read()
+    if TRACER.enabled:
+        TRACER.pickup("throttle", snap.seq)
+    mapped = snap.mapped
+    throttle_val, mode = mapped[0], mapped[5]
+    if estopped(mapped):
+        pass                           # supervisor owns the outputs
+    elif mode == 0:                    # remote mode, through the active curve
+        th.set_wiper(curves.table[min(255, max(0, throttle_val))])
+    else:                              # autonomous: newest fresh command, else 0
+        cmd = autonomy("throttle")
+        th.set_wiper(cmd.throttle if cmd is not None else 0)
+
+
+def steering_step(st) -> bool:
+    """Returns True while a held stick (or command) keeps the steering jogging."""
+    global _auto_steer
+    snap = state.read()
+    if TRACER.enabled:
+        TRACER.pickup("steering", snap.seq)
+    mapped = snap.mapped
+    steer_dir, mode = mapped[1], mapped[5]
+    proportional = STEER_MODE == "proportional"
+    if estopped(mapped):
+        if proportional:
+            st.set_effort(0)           # a jog train would otherwise keep going
+        return False
+    if mode == 0:
+        if proportional:               # the train repeats itself on the timer
+            st.set_effort(mapped[6] / 1000)
+            return False
+        st.set_direction(steer_dir)
+        return steer_dir != 0
+    cmd = autonomy("steering")
+    steer_dir = cmd.steering if cmd is not None else 0
+    if proportional:
+        st.set_effort(steer_dir)
+        return False
+    # commands repeat at the publisher's rate: only a held direction is
+    # re-issued, a repeated centre would fire a fault reset every time
+    if steer_dir or steer_dir != _auto_steer:
+        st.set_direction(steer_dir)
+    _auto_steer = steer_dir
+    return steer_dir != 0
+
+
+def brake_step(br):
+    # apply()/release() start a motion and return; both are no-ops when the
+    # brake is already there, so the worker simply drives toward the command.
+    snap = state.read()
+    if TRACER.enabled:
+        TRACER.pickup("brake", snap.seq)
+    mapped = snap.mapped
+    if estopped(mapped):
+        pass                           # supervisor holds the brake on
+    elif mapped[2]:                    # the transmitter's brake always wins
+        br.apply()
+    elif mapped[5]:                    # autonomous: no fresh command → brake
+        cmd = autonomy("brake")
+        if cmd is None or cmd.brake:
+            br.apply()
         else:
-            if estop_event.is_set():
-                print("E-stop cleared – drive re-enabled")
-            estop_event.clear()
-            drv_enable.on()  # driver re-enable
+            br.release()
+    else:
+        br.release()
+
+
+# Channels each worker step reads
+THROTTLE_CHANNELS = (0, 3, 4, 5)
+STEERING_CHANNELS = (1, 3, 4, 5, 6)
+BRAKE_CHANNELS = (2, 3, 4, 5)
+
+
+def safety_supervisor(actuators):
+    while True:
+        supervise(actuators)
         time.sleep(0.01)
 
 
 def throttle_worker(th):
+    sub = changes.subscribe("throttle", THROTTLE_CHANNELS)
     while True:
-        if estop_event.is_set():
-            time.sleep(0.05)
-            continue
-        with state.lock:
-            throttle_val, *_ = state.mapped
-            mode = state.mapped[5]
-        if mode == 0:                      # remote mode only
-            th.set_wiper(throttle_val)
-        else:
-            th.set_wiper(0)  # autonomous: set this however you will later
-        time.sleep(0.02)
+        throttle_step(th)
+        sub.wait()
 
 
 def steering_worker(st):
+    sub = changes.subscribe("steering", STEERING_CHANNELS)
     while True:
-        if estop_event.is_set():
-            time.sleep(0.05)
-            continue
-        with state.lock:
-            steer_dir = state.mapped[1]
-            mode = state.mapped[5]
-        if mode == 0:
-            st.set_direction(steer_dir)
-        time.sleep(0.05)
+        # a held stick keeps jogging; centred waits for the next change
+        if steering_step(st):
+            sub.wait(STEER_REPEAT)
+        else:
+            sub.wait()
 
 
 def brake_worker(br):
-    last = 0
+    sub = changes.subscribe("brake", BRAKE_CHANNELS)
     while True:
-        with state.lock:
-            brake_cmd = state.mapped[2]
-        if brake_cmd != last:
-            if brake_cmd:
-                br.extend()
-            else:
-                br.retract()
-            last = brake_cmd
-        time.sleep(0.05)
+        brake_step(br)
+        sub.wait()
+
+
+def status(throttle, verbose=False):
+    """Once a second: log the current packet, optionally print the counters."""
+    snap = state.read()
+    log(SRC_MAIN, EV_RAW, *snap.raw[:6])
+    log(SRC_MAIN, EV_MAPPED, *snap.mapped[:6])
+    rx = receiver.stats() if receiver is not None else None
+    if rx is not None:
+        log(SRC_MAIN, EV_RX, rx["frames"], rx.get("crc_errors", 0),
+            rx.get("seq_gaps", 0), rx.get("lost", 0), rx["malformed"])
+    if verbose:
+        print(f"RAW     : {list(snap.raw)}   (seq {snap.seq})")
+        print(f"MAPPED  : {list(snap.mapped)}")
+        for s in changes.stats():
+            if s["latency_ms_max"] is not None:
+                print(f"WAKE    : {s['name']:8s} {s['wakeups_per_s']:5.1f}/s  "
+                      f"latency max {s['latency_ms_max']:.2f} ms")
+        if commands is not None:
+            c = commands.stats()
+            print(f"CMD     : {c['received']} received, {c['stale']} stale, "
+                  f"{c['expired']} expiries, {'live' if c['live'] else 'none live'}")
+        if conditioner is not None:
+            c = conditioner.stats()
+            noise = " ".join(f"{ch['noise']:.1f}" for ch in c["channels"])
+            print(f"COND    : {c['suppressed']} commands suppressed, "
+                  f"noise σ [{noise}] counts")
+        spi = throttle.stats()
+        print(f"SPI     : {spi['written']} written / {spi['requested']} requested "
+              f"({spi['saved']} saved, {spi.get('slew_limited', 0)} slew-limited)")
+        print(f"CURVE   : {curves.active}  ({curves.swaps} swaps)")
+        wd = watchdog.stats()
+        print(f"LINK    : {wd['level']}  {wd['trips']} trips, "
+              f"worst reaction {wd['reaction_ms_max']} ms")
+        if links is not None:
+            ls = links.stats()
+            print("LINKS   : " + "  ".join(
+                f"{l['name']}{'*' if l['name'] == ls['active'] else ''} "
+                f"{l['rate']:.1f}/s {l['errors']:.0%} err "
+                + (f"{l['age_ms']:.0f} ms" if l['age_ms'] is not None else "silent")
+                for l in ls["links"])
+                + f"  ({ls['failovers']} switches, max gap {ls['gap_ms_max']} ms)")
+        if rx is not None:
+            print(f"RX      : {receiver.format} {rx['frames']} frames, "
+                  f"{rx.get('crc_errors', 0)} CRC errors, {rx.get('seq_gaps', 0)} gaps "
+                  f"({rx.get('lost', 0)} lost), {rx['malformed']} malformed")
 
 
 # ---------------------------------------------------------------------------
 # Launch
 # ---------------------------------------------------------------------------
-def main():
-    # Instantiate your classes
-    throttle = Throttle()   # enable pin reused by supervisor
-    steering = Steering()
-    brake = Brake()
+def bring_up(args, boot, recorder=None, output=None, timer=None):
+    """
+    Build the throttle, steering and brake drivers and open the receiver
+    in parallel, then self-test them.  Returns (actuators, ser, dec) – ser
+    and dec are None if the receiver was skipped – or raises SystemExit
+    with everything closed again and GPIO-24 never raised.
 
-    actuators = dict(throttle=throttle,
-                     steering=steering,
-                     brake=brake)
+    *output* wraps the Throttle (default ThrottleOutput), *timer* makes the
+    PulseTimer for steering and brake (default: their own).
+    """
+    skip = set(filter(None, (args.boot_skip or "").split(",")))
+
+    def make_throttle():
+        from throttle import Throttle, ThrottleOutput
+        th = Throttle(enable=drive_enable())   # enable pin reused by supervisor
+        if "wiper" in skip:
+            boot.skip("wiper", "--boot-skip")
+        elif not boot.check("wiper", wiper_test, th):
+            th.close()
+            raise BootError("wiper self-test failed")
+        if output is not None:
+            return output(th)
+        return ThrottleOutput(th, refresh=THROTTLE_REFRESH, slew=THROTTLE_SLEW)
+
+    def make_steering():
+        from steering import Steering
+        return Steering(timer=timer() if timer else None)
+
+    def make_brake():
+        from brake import Brake
+        return Brake(timer=timer() if timer else None)
+
+    def open_port():
+        ser, dec = open_receiver(args.port, args.baud, args.format, args.boot_timeout)
+        try:
+            if not dec.count:
+                first_packet(ser, dec, receive, args.boot_timeout, recorder)
+        except BootError:
+            ser.close()
+            raise
+        if recorder is not None:
+            recorder.set_baud(ser.baudrate)
+        return ser, dec
+
+    def start_supervisor():
+        if not supervisor_link.start():
+            raise BootError("no heartbeat from the supervisor process")
+
+    def open_backup(port, baud, fmt):
+        try:
+            return open_receiver(port, baud, fmt, args.boot_timeout)
+        except (BootError, OSError) as e:      # a backup may turn up later
+            print(f"[Link] {port}: {e} – its reader keeps trying")
+            return None, None
+
+    tasks = dict(throttle=make_throttle, steering=make_steering, brake=make_brake)
+    backups = []
+    if args.replay:
+        boot.skip("receiver", "replay")
+    elif "receiver" in skip:
+        boot.skip("receiver", "--boot-skip")
+    else:
+        tasks["receiver"] = open_port
+        for i, spec in enumerate(args.link or ()):
+            backups.append((f"link{i + 1}", spec))
+            tasks[backups[-1][0]] = lambda spec=spec: open_backup(*spec)
+    if supervisor_link is not None:
+        tasks["supervisor"] = start_supervisor
+    built = boot.parallel(tasks)
+    built.pop("supervisor", None)
+    ser, dec = built.pop("receiver", None) or (None, None)
+    if ser is not None:
+        boot.note("receiver", f"{dec.format} at {ser.baudrate} baud")
+        publish(dec, time.monotonic())
+    if backups:                        # None: the phase failed, boot.ok says so below
+        build_links(args, ser, dec,
+                    [(spec, built.pop(name) or (None, None)) for name, spec in backups],
+                    recorder)
+    actuators = built
+
+    if all(actuators.values()):
+        if "gpio" in skip:
+            boot.skip("gpio", "--boot-skip")
+        else:
+            enable = actuators["throttle"].enable if supervisor_link is None else None
+            boot.check("gpio", gpio_test,
+                       {k: outputs(v) for k, v in actuators.items()}, enable)
+    if not boot.ok:
+        for act in actuators.values():
+            if act is not None:
+                act.close()
+        if ser is not None:
+            ser.close()
+        print(boot.report())
+        raise SystemExit("[Boot] self-test failed – drive not enabled")
+    return actuators, ser, dec
+
+
+def build_links(args, ser, dec, backups, recorder=None):
+    """The primary receiver and the --link ones under one arbiter."""
+    global links, receiver
+
+    def opener(port, baud, fmt):
+        return lambda: open_receiver(port, baud, fmt, 1.0)
+
+    primary = Link(args.port, ser, dec, opener(args.port, args.baud, args.format), recorder)
+    links = LinkArbiter(
+        [primary] + [Link(spec[0], s, d, opener(*spec)) for spec, (s, d) in backups],
+        publish, args.link_stale, args.link_max_errors, args.link_failback,
+        on_switch=link_switched)
+    receiver = dec
+
+
+def arm(boot):
+    """Every self-test passed: let the supervisor raise GPIO-24."""
+    boot.ready()
+    if supervisor_link is not None:
+        supervisor_link.arm()
+
+
+def run_threads(args, recorder=None):
+    """Thread-per-actuator runtime (the default)."""
+    actuators, ser, dec = bring_up(args, boot, recorder)
+    throttle, steering, brake = (actuators[k] for k in ("throttle", "steering", "brake"))
+
+    if args.replay:
+        ser = ReplayPort(Capture(args.replay), args.replay_speed)
+    watchdog.start(throttle, steering, brake)
+    commands.start()
+    if curve_link is not None:
+        curve_link.start()
+    arm(boot)
+    print(boot.report() if args.boot_report else boot.summary())
 
     threads = [
-        threading.Thread(target=uart_listener, daemon=True),
         threading.Thread(target=safety_supervisor,
                          args=(actuators,), daemon=True),
         threading.Thread(target=throttle_worker,
@@ -209,20 +674,185 @@ def main():
                          args=(brake,), daemon=True),
     ]
 
+    if links is not None:
+        links.start()                  # a reader per receiver and the arbiter
+    else:
+        threads.append(threading.Thread(
+            target=uart_listener,
+            args=(args.port, ser, recorder, args.baud, args.format, dec), daemon=True))
     for t in threads:
         t.start()
 
     # Keep the main thread alive
+    t_end = time.monotonic() + args.duration
+    while not args.duration or time.monotonic() < t_end:
+        status(throttle, args.verbose)
+        time.sleep(1)
+
+
+def main(argv=None):
+    global channel_map, conditioner, commands, STEER_MODE, supervisor_link, boot
+    global ESTOP_CLEAR_HOLD, ESTOP_REASSERT, THROTTLE_SLEW, curves, curve_link, telemetry
+    boot = Boot()
+    ap = argparse.ArgumentParser(description="Autonomous-kart drive controller")
+    ap.add_argument("--runtime", choices=("threads", "asyncio"), default="threads",
+                    help="thread per actuator, or everything on one asyncio loop")
+    ap.add_argument("--supervisor", choices=("thread", "process"), default="thread",
+                    help="run the e-stop supervisor as a thread, or as its own "
+                         "process owning GPIO-24 (under sim.py: --rate 1)")
+    ap.add_argument("--gpio", choices=tuple(gpio_backend.BACKENDS), default=None,
+                    help="GPIO backend (default: $AUTOKART_GPIO, else gpiozero)")
+    ap.add_argument("--log", default="autokart.evlog",
+                    help="binary event log file (decode with eventlog.py)")
+    ap.add_argument("--telemetry", metavar="DIR",
+                    help="record the run as column files (query with telemetry.py)")
+    ap.add_argument("--telemetry-segment", type=float, default=60.0, metavar="S",
+                    help="start a new telemetry segment this often")
+    ap.add_argument("--telemetry-keep", type=int, default=0, metavar="N",
+                    help="keep only the newest N segments (0 = all)")
+    ap.add_argument("--verbose", action="store_true",
+                    help="also print the 1 Hz RAW/MAPPED status to the console")
+    ap.add_argument("--trace", action="store_true",
+                    help="trace per-packet latency from UART read to actuator write")
+    ap.add_argument("--trace-socket", default="/tmp/autokart-latency.sock",
+                    help="Unix socket for 'latency.py query' while tracing")
+    ap.add_argument("--trace-dump", metavar="FILE",
+                    help="write the latency report as JSON on shutdown")
+    ap.add_argument("--port", default="/dev/ttyAMA0", help="receiver serial port")
+    ap.add_argument("--cmd-socket", default=CMD_SOCKET,
+                    help="Unix datagram socket for autonomy commands")
+    ap.add_argument("--cmd-max-age", type=float, default=0.2,
+                    help="drop autonomy commands older than this (s)")
+    ap.add_argument("--steering", choices=("jog", "proportional"), default=STEER_MODE,
+                    help="fixed jogs per direction, or jog width/rate following the stick")
+    ap.add_argument("--channel-map", metavar="FILE",
+                    help="channel-map profile (JSON, see channel_map.py)")
+    ap.add_argument("--condition", metavar="default|off|FILE", default="default",
+                    help="input conditioning in front of the channel map "
+                         "(JSON, see conditioning.py)")
+    ap.add_argument("--curve", default="linear",
+                    help="throttle response curve to start with (see curves.py)")
+    ap.add_argument("--curves", metavar="FILE",
+                    help="throttle curve definitions (JSON, see curves.py)")
+    ap.add_argument("--curve-channel", type=int, metavar="N",
+                    help="raw receiver channel whose switch position selects the curve")
+    ap.add_argument("--curve-socket", default=CURVE_SOCKET,
+                    help="Unix datagram socket for 'curves.py select NAME'")
+    ap.add_argument("--throttle-slew", type=float, default=0.0, metavar="COUNTS_PER_S",
+                    help="ramp a rising wiper at most this fast (0 = step)")
+    ap.add_argument("--link", type=link_spec, action="append", metavar="PORT[,BAUD[,FORMAT]]",
+                    help="another receiver to read alongside --port (repeatable), "
+                         "e.g. /dev/ttyACM0,115200")
+    ap.add_argument("--link-stale", type=float, default=LINK_STALE, metavar="S",
+                    help="fail over when the active receiver is silent this long")
+    ap.add_argument("--link-max-errors", type=float, default=0.2, metavar="FRACTION",
+                    help="fail over when this fraction of its frames are corrupt")
+    ap.add_argument("--link-failback", type=float, default=1.0, metavar="S",
+                    help="return to a preferred receiver after it is healthy this long")
+    ap.add_argument("--baud", default=UART_BAUD,
+                    help="receiver baud rate, or 'auto' to scan for it")
+    ap.add_argument("--format", choices=("auto", "csv", "binary"), default=RX_FORMAT,
+                    help="receiver frame format")
+    ap.add_argument("--duration", type=float, default=0.0,
+                    help="stop after this many seconds (0 = run until Ctrl-C)")
+    ap.add_argument("--record", metavar="FILE",
+                    help="capture everything read from the port (see capture.py)")
+    ap.add_argument("--replay", metavar="FILE",
+                    help="feed a capture into the listener instead of the port")
+    ap.add_argument("--replay-speed", type=float, default=1.0,
+                    help="replay speed multiplier (0 = as fast as possible)")
+    ap.add_argument("--boot-timeout", type=float, default=10.0,
+                    help="give up if the receiver sends nothing valid for this long "
+                         "at startup (0 = wait for ever)")
+    ap.add_argument("--boot-skip", metavar="TESTS", default="",
+                    help="comma-separated self-tests to skip: wiper,gpio,receiver")
+    ap.add_argument("--boot-report", action="store_true",
+                    help="print the per-phase startup timing table")
+    ap.add_argument("--link-timeouts", metavar="HOLD,ZERO,BRAKE",
+                    default=",".join(map(str, watchdog.deadlines)),
+                    help="link-loss escalation deadlines in seconds")
+    ap.add_argument("--estop-clear-hold", type=float, default=ESTOP_CLEAR_HOLD,
+                    help="seconds the e-stop cause must stay gone before re-enabling")
+    ap.add_argument("--estop-reassert", type=float, default=ESTOP_REASSERT,
+                    help="re-assert the e-stop outputs this often while latched")
+    args = ap.parse_args(argv)
+    ESTOP_CLEAR_HOLD, ESTOP_REASSERT = args.estop_clear_hold, args.estop_reassert
+    STEER_MODE = args.steering
+    if args.gpio:
+        os.environ["AUTOKART_GPIO"] = args.gpio      # the supervisor process too
+        try:
+            gpio_backend.use(args.gpio)
+        except (ImportError, OSError) as e:
+            raise SystemExit(f"[GPIO] {args.gpio} backend unavailable: {e}")
+    if args.channel_map:
+        channel_map = ChannelMap.load(args.channel_map, MAPPED)
+    if args.condition != "off":
+        try:
+            conditioner = (Conditioner(channel_map.profile, CONDITIONING, MAPPED)
+                           if args.condition == "default" else
+                           Conditioner.load(args.condition, channel_map.profile, MAPPED))
+        except (OSError, ValueError, KeyError) as e:
+            raise SystemExit(f"[COND] {args.condition}: {e}")
     try:
-        while True:
-            with state.lock:
-                raw = state.raw
-                mapped = state.mapped
-            print(f"RAW     : {raw}")
-            print(f"MAPPED  : {mapped}")
-            time.sleep(1)
+        curves = (CurveSet.load(args.curves, args.curve, args.curve_channel) if args.curves
+                  else CurveSet(active=args.curve, channel=args.curve_channel))
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"[Curve] {e}")
+    if args.curve_channel is not None and not 0 <= args.curve_channel < channel_map.channels:
+        raise SystemExit(f"[Curve] --curve-channel {args.curve_channel}: the receiver "
+                         f"has channels 0-{channel_map.channels - 1}")
+    curve_link = CurveListener(curves, args.curve_socket, on_change=lambda: changes.wake((0,)))
+    THROTTLE_SLEW = args.throttle_slew or None
+    commands = CommandListener(args.cmd_socket, args.cmd_max_age, on_change=command_changed)
+    watchdog.deadlines = tuple(float(x) for x in args.link_timeouts.split(","))
+    if args.link and args.link_stale >= watchdog.deadlines[0]:
+        print(f"[Link] --link-stale {args.link_stale:g} s is not inside the "
+              f"{watchdog.deadlines[0]:g} s HOLD deadline: a failover will show as link loss")
+    LOG.start(args.log)
+    if args.telemetry:
+        from telemetry import Telemetry
+        telemetry = Telemetry(args.telemetry, channel_map.channels, MAPPED,
+                              args.telemetry_segment, args.telemetry_keep).start()
+    if args.trace or args.trace_dump:
+        TRACER.enabled = True
+        TRACER.serve(args.trace_socket)
+
+    if args.supervisor == "process":
+        from safety_proc import SupervisorLink
+        supervisor_link = SupervisorLink(deadline=watchdog.deadlines[2],  # started by bring_up()
+                                         clear_hold=ESTOP_CLEAR_HOLD, reassert=ESTOP_REASSERT)
+
+    recorder = (CaptureWriter(args.record, args.port,
+                              0 if args.baud == "auto" else int(args.baud))
+                if args.record else None)
+    boot.lap("setup")
+    try:
+        if args.runtime == "asyncio":
+            import aio_runtime
+            aio_runtime.run(sys.modules[__name__], args, recorder)
+        else:
+            run_threads(args, recorder)
     except KeyboardInterrupt:
         print("\nCtrl-C – shutting down…" )
+    finally:
+        if supervisor_link is not None:
+            supervisor_link.close()
+        curve_link.close()
+        if links is not None:
+            links.close()
+        LOG.stop()                     # its last batch still reaches telemetry
+        if telemetry is not None:
+            telemetry.close()
+            tel = telemetry.stats()
+            print(f"[Telemetry] {tel['packets']} packets, {tel['records']} events "
+                  f"in {tel['segments']} segments → {tel['dir']}")
+        if recorder is not None:
+            recorder.close()
+        if args.trace:
+            print(TRACER.format())
+        if args.trace_dump:
+            with open(args.trace_dump, "w") as f:
+                json.dump(TRACER.report(), f)
 
 
 if __name__ == "__main__":
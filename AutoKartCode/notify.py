@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+notify.py – per-channel change notification for the actuator workers
+
+The UART listener calls `ChangeNotifier.update()` with every mapped packet it
+publishes.  Each worker holds a `Subscription` for the mapped channels it
+cares about (throttle → 0, brake → 2, …) and blocks in `wait()` until one of
+those channels changes value, or until its keepalive period runs out.
+Nothing wakes up for packets that only repeat the previous values.
+A subscription created with a *callback* calls it on the notifying thread
+instead – that is how the single-loop runtime (aio_runtime.py) schedules
+its worker steps.
+
+Every subscription keeps wakeup counters and a window of packet-arrival →
+worker-wakeup latencies so the event path can be compared with the old
+fixed-interval polling loops:
+
+    python3 notify.py [seconds]
+"""
+import threading
+import time
+from collections import deque
+
+
+class Subscription:
+    """One worker's view of the notifier."""
+
+    def __init__(self, name: str, channels, keepalive: float = None, callback=None):
+        self.name = name
+        self.channels = frozenset(channels)
+        self.keepalive = keepalive
+        self.callback = callback
+        self._event = threading.Event()
+        self._t_change = None             # arrival time of the first unseen change
+
+        # statistics
+        self.created = time.monotonic()
+        self.wakeups = 0
+        self.timeouts = 0
+        self.latency = deque(maxlen=1024)
+
+    def wait(self, timeout: float = None) -> bool:
+        """
+        Block until a subscribed channel changes (returns True) or the
+        keepalive / *timeout* expires (returns False).  Read the state
+        *after* this returns – any change up to that point is included.
+        """
+        fired = self._event.wait(self.keepalive if timeout is None else timeout)
+        self.wakeups += 1
+        if fired:
+            self._event.clear()
+            t_change, self._t_change = self._t_change, None
+            if t_change is not None:
+                self.latency.append(time.monotonic() - t_change)
+        else:
+            self.timeouts += 1
+        return fired
+
+    def _fire(self, t_change: float) -> None:
+        if self.callback is not None:
+            self.wakeups += 1
+            self.callback()
+            return
+        if self._t_change is None:
+            self._t_change = t_change
+        self._event.set()
+
+    def stats(self) -> dict:
+        elapsed = time.monotonic() - self.created
+        lat = sorted(self.latency)
+        return dict(
+            name=self.name,
+            wakeups_per_s=self.wakeups / elapsed if elapsed else 0.0,
+            timeouts=self.timeouts,
+            latency_ms_p50=lat[len(lat) // 2] * 1e3 if lat else None,
+            latency_ms_max=lat[-1] * 1e3 if lat else None,
+        )
+
+
+class ChangeNotifier:
+    """Diffs successive mapped packets and wakes the matching subscribers."""
+
+    def __init__(self):
+        self._subs = []
+        self._last = None
+
+    def subscribe(self, name: str, channels, keepalive: float = None,
+                  callback=None) -> Subscription:
+        sub = Subscription(name, channels, keepalive, callback)
+        self._subs.append(sub)
+        return sub
+
+    def update(self, mapped, t_rx: float = None) -> None:
+        """Called by the listener after publishing *mapped*."""
+        last, self._last = self._last, mapped
+        if last is not None and last == mapped:
+            return
+        if t_rx is None:
+            t_rx = time.monotonic()
+        if last is None:
+            changed = range(len(mapped))
+        else:
+            changed = [i for i, (a, b) in enumerate(zip(last, mapped)) if a != b]
+        for sub in self._subs:
+            if not sub.channels.isdisjoint(changed):
+                sub._fire(t_rx)
+
+    def wake(self, channels=None) -> None:
+        """Wake subscribers of *channels* (all if None) without a change."""
+        t = time.monotonic()
+        for sub in self._subs:
+            if channels is None or not sub.channels.isdisjoint(channels):
+                sub._fire(t)
+
+    def stats(self) -> list:
+        return [sub.stats() for sub in self._subs]
+
+
+# ---------------------------------------------------------------------------
+# Stand-alone comparison: 20 ms polling loop vs change subscription
+# ---------------------------------------------------------------------------
+if __name__ == "__main__":
+    import random
+    import sys
+
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    rnd = random.Random(3)
+    stop = threading.Event()
+    notifier = ChangeNotifier()
+    current = [[0, 0, 0, 0, 0, 0], time.monotonic()]   # mapped, t_rx
+    poll = dict(wakeups=0, latency=[], seen=None)
+
+    def polling_worker():
+        while not stop.is_set():
+            mapped, t_rx = current
+            poll["wakeups"] += 1
+            if mapped[0] != poll["seen"]:
+                if poll["seen"] is not None:
+                    poll["latency"].append(time.monotonic() - t_rx)
+                poll["seen"] = mapped[0]
+            time.sleep(0.02)
+
+    sub = notifier.subscribe("throttle", (0,), keepalive=0.5)
+
+    def event_worker():
+        while not stop.is_set():
+            sub.wait()
+
+    workers = [threading.Thread(target=polling_worker),
+               threading.Thread(target=event_worker)]
+    for w in workers:
+        w.start()
+
+    # ~50 Hz link, throttle value changes on roughly one packet in five
+    t_end = time.monotonic() + seconds
+    thr = 0
+    while time.monotonic() < t_end:
+        if rnd.random() < 0.2:
+            thr = rnd.randint(0, 255)
+        mapped = [thr, 0, 0, 0, 0, 0]
+        t_rx = time.monotonic()
+        current[:] = [mapped, t_rx]
+        notifier.update(mapped, t_rx)
+        time.sleep(0.02)
+    stop.set()
+    notifier.wake()
+    for w in workers:
+        w.join()
+
+    lat = sorted(poll["latency"])
+    print(f"polling 20 ms : {poll['wakeups'] / seconds:6.1f} wakeups/s  "
+          f"latency p50 {lat[len(lat) // 2] * 1e3:5.2f} ms  max {lat[-1] * 1e3:5.2f} ms")
+    s = sub.stats()
+    print(f"subscription  : {s['wakeups_per_s']:6.1f} wakeups/s  "
+          f"latency p50 {s['latency_ms_p50']:5.2f} ms  max {s['latency_ms_max']:5.2f} ms")
@@ -0,0 +1,508 @@
+#!/usr/bin/env python3
+"""
+packets.py – receiver packet parsing, mapping and streaming decode
+
+Old transmitters send ASCII lines of six comma-separated channel values
+(~29 bytes – four packets a second at 1200 baud):
+
+    1809,992,1809,1809,1809,1809\n
+
+New ones send 16-byte binary frames, normally at 115200 baud:
+
+    u8   0xA5       sync
+    u8   seq        +1 per frame, wraps – gaps count lost frames
+    6 × u16 LE      channel values, same units as the CSV fields
+    u16 LE crc      CRC-16/CCITT (init 0xFFFF) over seq + channels
+
+`parse_packet()` / `convert_packet()` are the original one-line helpers.
+`PacketDecoder` is the streaming replacement used by `uart_listener`: it
+takes whatever bytes the port has, keeps them in one reusable buffer, splits
+out every complete line in a single pass and decodes the whole batch into a
+preallocated `array('i')`.  A line cut off at the end of a read is carried
+over to the next call instead of being thrown away.  A frame with a field
+outside 0-MAX_VALUE is dropped and counted as malformed, like one that does
+not parse.  `FrameDecoder` does the
+same for binary frames and counts CRC failures and sequence gaps;
+`make_decoder("auto")` picks whichever format the bytes turn out to be, and
+`BaudScanner` steps through the candidate baud rates until one decodes.
+
+Run stand-alone to benchmark the decoder against the readline path:
+
+    python3 packets.py [capture.bin]
+"""
+import operator
+import struct
+import time
+from array import array
+from binascii import crc_hqx
+
+CHANNELS = 6
+MAX_LINE = 128          # longer than this without a newline → garbage
+MAX_VALUE = 2047        # 11-bit channels; anything outside 0-2047 is corrupt
+
+_COMMAS = operator.methodcaller("count", b",")
+
+SYNC = 0xA5
+FRAME = struct.Struct("<BB6HH")           # 16 bytes
+BAUDS = (115200, 57600, 38400, 19200, 9600, 1200)
+
+
+# ---------------------------------------------------------------------------
+# Mapping helpers (exactly the same maths you used previously)
+# ---------------------------------------------------------------------------
+def parse_packet(raw: str):
+    """Return list[int] of six values or None if malformed."""
+    try:
+        vals = [int(x) for x in raw.split(",")]
+        return vals if len(vals) == 6 else None
+    except ValueError:
+        return None
+
+
+def convert_packet(vals):
+    """Return mapped list[int] according to the rules in the brief."""
+    t_raw, steer_raw, brake_raw, ea_raw, eb_raw, mode_raw = vals
+
+    # throttle 1809-992  →  0-255  (reversed)
+    offset = max(0, min(817, 1809 - t_raw))
+    throttle = int(((817 - offset) / 817) * 255)
+
+    # steering              >992:1, ==992:0, <992:-1
+    steering = 1 if steer_raw > 992 else -1 if steer_raw < 992 else 0
+
+    # brake                 >992→0  else 1
+    brake = 0 if brake_raw > 992 else 1
+
+    # e-stop A/B            <1809→1  else 0
+    estop_a = 1 if ea_raw < 1809 else 0
+    estop_b = 1 if eb_raw < 1809 else 0
+
+    # mode                  172→1 (auto)  else 0 (remote)
+    mode = 1 if mode_raw == 172 else 0
+
+    return [throttle, steering, brake, estop_a, estop_b, mode]
+
+
+# ---------------------------------------------------------------------------
+# Streaming decoder
+# ---------------------------------------------------------------------------
+class PacketDecoder:
+    """
+    Batch decoder for newline-terminated CSV frames.
+
+    After `feed()` returns *n*, frames ``0 … n-1`` of the batch are in
+    `self.frames` (row-major, `channels` values per frame) and `latest()`
+    returns the newest one.  If one read holds more than `max_frames`
+    complete frames only the newest `max_frames` are kept.
+    """
+
+    format = "csv"
+
+    def __init__(self, channels: int = CHANNELS, max_frames: int = 64):
+        self.channels = channels
+        self.max_frames = max_frames
+        self.frames = array("i", bytes(array("i").itemsize * channels * max_frames))
+        self.count = 0
+        self._buf = bytearray()
+
+        # statistics
+        self.total_frames = 0
+        self.malformed = 0
+        self.overrun = 0          # valid frames dropped because the batch was full
+        self.bytes_in = 0
+        self.decode_time = 0.0
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def feed(self, data) -> int:
+        """Add *data* to the buffer and decode every complete frame in it."""
+        t0 = time.perf_counter()
+        buf = self._buf
+        buf += data
+        self.bytes_in += len(data)
+
+        end = buf.rfind(b"\n")
+        if end < 0:
+            if len(buf) > MAX_LINE:
+                self.malformed += 1
+                del buf[:]
+            self.count = 0
+            self.decode_time += time.perf_counter() - t0
+            return 0
+
+        chunk = buf[:end]
+        del buf[:end + 1]
+
+        vals = self._decode_fast(chunk)
+        if vals is None:
+            vals = self._decode_slow(chunk)
+
+        ch = self.channels
+        n = len(vals) // ch
+        if n > self.max_frames:
+            self.overrun += n - self.max_frames
+            vals = vals[(n - self.max_frames) * ch:]
+            n = self.max_frames
+        self.frames[:n * ch] = vals
+        self.count = n
+        self.total_frames += n
+        self.decode_time += time.perf_counter() - t0
+        return n
+
+    def latest(self):
+        """Newest frame of the last batch as a tuple, or None."""
+        if not self.count:
+            return None
+        ch = self.channels
+        base = (self.count - 1) * ch
+        return tuple(self.frames[base:base + ch])
+
+    def frame(self, i: int):
+        """Frame *i* of the last batch as a tuple."""
+        ch = self.channels
+        return tuple(self.frames[i * ch:(i + 1) * ch])
+
+    def reset(self) -> None:
+        """Drop any partial frame held in the buffer."""
+        del self._buf[:]
+        self.count = 0
+
+    def throughput(self) -> float:
+        """Decoded frames per second of decode time (kept + overrun)."""
+        n = self.total_frames + self.overrun
+        return n / self.decode_time if self.decode_time else 0.0
+
+    def stats(self) -> dict:
+        return dict(frames=self.total_frames, malformed=self.malformed,
+                    overrun=self.overrun, bytes=self.bytes_in,
+                    decode_s=self.decode_time, fps=self.throughput())
+
+    # ------------------------------------------------------------------
+    # Internal helpers
+    # ------------------------------------------------------------------
+    def _decode_fast(self, chunk):
+        """Whole batch in one C-level pass; None if any line is malformed."""
+        # every line its own field count: a short line next to a long one
+        # would otherwise shift the channels of both
+        if set(map(_COMMAS, chunk.split(b"\n"))) != {self.channels - 1}:
+            return None
+        try:
+            vals = array("i", map(int, chunk.replace(b"\n", b",").split(b",")))
+        except (ValueError, OverflowError):   # OverflowError: fields run together
+            return None
+        if min(vals) < 0 or max(vals) > MAX_VALUE:
+            return None
+        return vals
+
+    def _decode_slow(self, chunk):
+        """Line-by-line fallback that skips and counts malformed frames."""
+        ch = self.channels
+        vals = array("i")
+        for line in chunk.split(b"\n"):
+            fields = line.split(b",")
+            if len(fields) != ch:
+                if line.strip():
+                    self.malformed += 1
+                continue
+            try:
+                vals.extend(map(int, fields))
+            except (ValueError, OverflowError):
+                # extend() may have appended a prefix before failing
+                del vals[len(vals) - len(vals) % ch:]
+                self.malformed += 1
+                continue
+            if min(vals[-ch:]) < 0 or max(vals[-ch:]) > MAX_VALUE:
+                del vals[-ch:]
+                self.malformed += 1
+        return vals
+
+
+# ---------------------------------------------------------------------------
+# Binary frames
+# ---------------------------------------------------------------------------
+def encode_frame(seq: int, vals) -> bytes:
+    """One binary frame (the transmitter side – used by sim.py)."""
+    body = FRAME.pack(SYNC, seq & 0xFF, *vals, 0)[1:-2]
+    return bytes((SYNC,)) + body + crc_hqx(body, 0xFFFF).to_bytes(2, "little")
+
+
+class FrameDecoder(PacketDecoder):
+    """
+    Batch decoder for binary frames, with the same interface as
+    `PacketDecoder`.  Hunts for the sync byte, checks the CRC and tracks the
+    sequence counter:
+
+    * `crc_errors` – a frame where one was expected failed its CRC,
+    * `seq_gaps` / `lost` – breaks in the sequence and frames missing,
+    * `malformed` – bytes skipped while hunting for sync, and frames with
+      a good CRC but a channel over MAX_VALUE (dropped).
+    """
+
+    format = "binary"
+
+    def __init__(self, channels: int = CHANNELS, max_frames: int = 64):
+        if channels != CHANNELS:
+            raise ValueError(f"binary frames carry {CHANNELS} channels")
+        super().__init__(channels, max_frames)
+        self.crc_errors = 0
+        self.seq_gaps = 0
+        self.lost = 0
+        self._seq = None
+        self._locked = False      # the buffer starts where a good frame ended
+
+    def feed(self, data) -> int:
+        t0 = time.perf_counter()
+        buf = self._buf
+        buf += data
+        self.bytes_in += len(data)
+
+        size, unpack = FRAME.size, FRAME.unpack_from
+        vals = array("i")
+        i, end = 0, len(buf)
+        while end - i >= size:
+            if buf[i] != SYNC:
+                j = buf.find(SYNC, i)
+                if j < 0:
+                    self.malformed += end - i
+                    i = end
+                    break
+                self.malformed += j - i
+                self._locked = False
+                i = j
+                continue
+            f = unpack(buf, i)
+            if crc_hqx(buf[i + 1:i + size - 2], 0xFFFF) != f[-1]:
+                if self._locked:
+                    self.crc_errors += 1
+                self._locked = False
+                self.malformed += 1
+                i += 1
+                continue
+            seq = f[1]
+            if self._seq is not None and seq != (self._seq + 1) & 0xFF:
+                self.seq_gaps += 1
+                self.lost += (seq - self._seq - 1) & 0xFF
+            self._seq = seq
+            self._locked = True
+            i += size
+            if max(f[2:-1]) > MAX_VALUE:
+                self.malformed += 1
+                continue
+            vals.extend(f[2:-1])
+        del buf[:i]
+
+        ch = self.channels
+        n = len(vals) // ch
+        if n > self.max_frames:
+            self.overrun += n - self.max_frames
+            vals = vals[(n - self.max_frames) * ch:]
+            n = self.max_frames
+        self.frames[:n * ch] = vals
+        self.count = n
+        self.total_frames += n
+        self.decode_time += time.perf_counter() - t0
+        return n
+
+    def reset(self) -> None:
+        super().reset()
+        self._seq = None
+        self._locked = False
+
+    def stats(self) -> dict:
+        s = super().stats()
+        s.update(crc_errors=self.crc_errors, seq_gaps=self.seq_gaps, lost=self.lost)
+        return s
+
+
+class AutoDecoder:
+    """
+    Holds the first bytes until they identify the format, then hands them
+    and everything after to a `PacketDecoder` or `FrameDecoder`.
+    """
+
+    def __init__(self, channels: int = CHANNELS, max_frames: int = 64):
+        self._args = (channels, max_frames)
+        self._dec = None
+        self._buf = bytearray()
+
+    @property
+    def format(self):
+        return self._dec.format if self._dec else None
+
+    @property
+    def count(self) -> int:
+        return self._dec.count if self._dec else 0
+
+    @property
+    def total_frames(self) -> int:
+        return self._dec.total_frames if self._dec else 0
+
+    def feed(self, data) -> int:
+        if self._dec is not None:
+            return self._dec.feed(data)
+        self._buf += data
+        # binary frames always carry CHANNELS values
+        classes = (FrameDecoder, PacketDecoder) if self._args[0] == CHANNELS else (PacketDecoder,)
+        for cls in classes:
+            dec = cls(*self._args)
+            if dec.feed(self._buf) and dec.total_frames >= 2:
+                self._dec = dec
+                del self._buf[:]
+                return dec.count
+        if len(self._buf) > 4 * MAX_LINE:
+            del self._buf[:len(self._buf) - MAX_LINE]
+        return 0
+
+    def __getattr__(self, name):
+        # only reached for names AutoDecoder itself lacks: defer to the
+        # format decoder once there is one
+        dec = self.__dict__.get("_dec")
+        if dec is None:
+            raise AttributeError(name)
+        return getattr(dec, name)
+
+    def stats(self) -> dict:
+        if self._dec is None:
+            return dict(frames=0, malformed=0, overrun=0, bytes=len(self._buf),
+                        decode_s=0.0, fps=0.0)
+        return self._dec.stats()
+
+    def reset(self) -> None:
+        if self._dec is not None:
+            self._dec.reset()
+        del self._buf[:]
+
+
+def make_decoder(fmt: str = "auto", **kw):
+    """Decoder for "csv", "binary" or "auto" (detect from the stream)."""
+    return dict(csv=PacketDecoder, binary=FrameDecoder, auto=AutoDecoder)[fmt](**kw)
+
+
+class BaudScanner:
+    """
+    Finds the receiver's baud rate: the caller sets the port to `baud`,
+    feeds what it reads for `window` seconds, and calls `next()` if `feed()`
+    has not returned True by then.  Once locked, `decoder` is ready to use.
+    """
+
+    def __init__(self, bauds=BAUDS, fmt: str = "auto", frames: int = 2,
+                 channels: int = CHANNELS):
+        self.bauds = tuple(bauds)
+        self.fmt = fmt
+        self.frames = frames
+        self.channels = channels
+        self._i = 0
+        self.decoder = make_decoder(fmt, channels=channels)
+
+    @property
+    def baud(self) -> int:
+        return self.bauds[self._i]
+
+    @property
+    def window(self) -> float:
+        """Long enough for a few of the longest CSV lines at this baud."""
+        return max(0.05, 4 * 32 * 10 / self.baud)
+
+    def feed(self, data) -> bool:
+        if data:
+            self.decoder.feed(data)
+        return self.decoder.total_frames >= self.frames
+
+    def next(self) -> int:
+        self._i = (self._i + 1) % len(self.bauds)
+        self.decoder = make_decoder(self.fmt, channels=self.channels)
+        return self.baud
+
+
+# ---------------------------------------------------------------------------
+# Stand-alone benchmark: readline path vs batched decoder
+# ---------------------------------------------------------------------------
+def _synthetic_stream(n: int = 20000) -> bytes:
+    """Receiver-like byte stream with the odd corrupted line."""
+    import random
+    rnd = random.Random(1)
+    out = []
+    for i in range(n):
+        if i % 500 == 499:
+            out.append(b"18\xff9,99x,1809\n")
+            continue
+        vals = (rnd.randint(992, 1809), rnd.randint(172, 1811), 1809,
+                1809, 1809, rnd.choice((172, 992, 1809)))
+        out.append(",".join(map(str, vals)).encode() + b"\n")
+    return b"".join(out)
+
+
+def _synthetic_frames(n: int = 20000) -> bytes:
+    """Binary equivalent of `_synthetic_stream`, with corrupted and dropped frames."""
+    import random
+    rnd = random.Random(1)
+    out = []
+    for i in range(n):
+        vals = (rnd.randint(992, 1809), rnd.randint(172, 1811), 1809,
+                1809, 1809, rnd.choice((172, 992, 1809)))
+        f = encode_frame(i, vals)
+        if i % 500 == 499:
+            f = f[:5] + b"\xff" + f[6:]          # CRC failure
+        elif i % 700 == 699:
+            continue                             # lost on the air
+        out.append(f)
+    return b"".join(out)
+
+
+def _bench_readline(stream: bytes):
+    import io
+    src = io.BytesIO(stream)
+    n = bad = 0
+    t0 = time.perf_counter()
+    while True:
+        raw = src.readline()
+        if not raw:
+            break
+        pkt = parse_packet(raw.decode(errors="replace").strip())
+        if pkt:
+            convert_packet(pkt)
+            n += 1
+        else:
+            bad += 1
+    return n, bad, time.perf_counter() - t0
+
+
+def _bench_decoder(stream: bytes, read_size: int = 256, cls=PacketDecoder):
+    dec = cls()
+    t0 = time.perf_counter()
+    for i in range(0, len(stream), read_size):
+        if dec.feed(stream[i:i + read_size]):
+            convert_packet(dec.latest())
+    return dec, time.perf_counter() - t0
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], "rb") as f:
+            data = f.read()
+    else:
+        data = _synthetic_stream()
+    print(f"Stream: {len(data)} bytes")
+
+    n, bad, dt = _bench_readline(data)
+    print(f"readline/parse/convert : {n} frames, {bad} bad, "
+          f"{dt * 1e3:.1f} ms ({n / dt:,.0f} frames/s)")
+
+    for size in (32, 256, 4096):
+        dec, dt = _bench_decoder(data, size)
+        s = dec.stats()
+        print(f"decoder (read {size:4d} B) : {s['frames']} frames, "
+              f"{s['malformed']} bad, {s['overrun']} overrun, "
+              f"{dt * 1e3:.1f} ms total, decode {s['fps']:,.0f} frames/s")
+
+    frames = _synthetic_frames()
+    print(f"\nBinary stream: {len(frames)} bytes "
+          f"({len(frames) / len(data):.0%} of the CSV stream)")
+    for size in (32, 256, 4096):
+        dec, dt = _bench_decoder(frames, size, FrameDecoder)
+        s = dec.stats()
+        print(f"frames  (read {size:4d} B) : {s['frames']} frames, "
+              f"{s['crc_errors']} CRC, {s['seq_gaps']} gaps / {s['lost']} lost, "
+              f"{dt * 1e3:.1f} ms total, decode {s['fps']:,.0f} frames/s")
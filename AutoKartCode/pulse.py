@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+pulse.py – non-blocking output pulses on a single timer thread
+
+`PulseTimer.start(key, on, off, width)` calls `on()` straight away and hands
+the matching `off()` to a background thread that runs it at the deadline, so
+the caller never sleeps.  Pulses are identified by *key*:
+
+ * starting a pulse on a key that is already active ends the old one first,
+ * `extend(key, width)` pushes the deadline of an active pulse out,
+ * `cancel(key)` / `cancel_all()` end pulses early (running their `off()`).
+
+An optional `then()` runs on the timer thread after a pulse completes
+normally (not when cancelled) – used to chain the steering fault-reset after
+a jog.  The achieved width of every completed pulse is compared with the
+requested width and kept for `accuracy()`.
+"""
+import threading
+import time
+from collections import deque
+
+
+class _Pulse:
+    __slots__ = ("t_on", "deadline", "off", "then")
+
+    def __init__(self, t_on, deadline, off, then):
+        self.t_on = t_on
+        self.deadline = deadline
+        self.off = off
+        self.then = then
+
+
+class PulseTimer:
+    def __init__(self, name: str = "pulse"):
+        self._cv = threading.Condition(threading.RLock())
+        self._active = {}
+        self._closed = False
+        self._errors = deque(maxlen=1024)   # achieved − requested width (s)
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def start(self, key, on, off, width: float, then=None) -> None:
+        """Run *on* now and *off* after *width* seconds."""
+        with self._cv:
+            old = self._active.pop(key, None)
+            if old is not None:
+                old.off()
+            on()
+            now = time.monotonic()
+            self._active[key] = _Pulse(now, now + width, off, then)
+            self._cv.notify()
+
+    def extend(self, key, width: float) -> bool:
+        """Move an active pulse's deadline to *width* from now."""
+        with self._cv:
+            p = self._active.get(key)
+            if p is None:
+                return False
+            p.deadline = time.monotonic() + width
+            self._cv.notify()
+            return True
+
+    def cancel(self, key) -> bool:
+        """End pulse *key* now (its `off()` runs, `then()` does not)."""
+        with self._cv:
+            p = self._active.pop(key, None)
+            if p is None:
+                return False
+            p.off()
+            self._cv.notify()
+            return True
+
+    def cancel_all(self) -> None:
+        with self._cv:
+            while self._active:
+                _, p = self._active.popitem()
+                p.off()
+            self._cv.notify()
+
+    def active(self, key) -> bool:
+        return key in self._active
+
+    def accuracy(self) -> dict:
+        """Achieved-vs-requested pulse width over the recent window (µs)."""
+        errs = list(self._errors)
+        if not errs:
+            return dict(pulses=0, mean_us=None, max_us=None)
+        return dict(pulses=len(errs),
+                    mean_us=sum(errs) / len(errs) * 1e6,
+                    max_us=max(errs, key=abs) * 1e6)
+
+    def close(self) -> None:
+        with self._cv:
+            self._closed = True
+            self._cv.notify()
+        self.cancel_all()
+        self._thread.join(timeout=1.0)
+
+    # ------------------------------------------------------------------
+    # Timer thread
+    # ------------------------------------------------------------------
+    def _run(self):
+        with self._cv:
+            while not self._closed:
+                now = time.monotonic()
+                due = [k for k, p in self._active.items() if p.deadline <= now]
+                for key in due:
+                    p = self._active.get(key)
+                    if p is None or p.deadline > now:
+                        continue            # replaced by an earlier then()
+                    del self._active[key]
+                    p.off()
+                    self._errors.append(time.monotonic() - p.deadline)
+                    if p.then is not None:
+                        p.then()
+                if self._active:
+                    nxt = min(p.deadline for p in self._active.values())
+                    self._cv.wait(max(0.0, nxt - time.monotonic()))
+                else:
+                    self._cv.wait()
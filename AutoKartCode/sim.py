@@ -0,0 +1,671 @@
+#!/usr/bin/env python3
+"""
+sim.py – run the full controller on a plain Linux box
+
+Replaces the hardware underneath main.py and runs it against a scripted
+transmitter, faster than real time:
+
+ * `SimFactory`   – gpiozero mock pin factory; every output edge is recorded
+                    as (sim time, BCM pin, level) and fed to the models below
+                    (--gpio mock: gpio_backend's `MockBackend` instead, which
+                    records the same edges without gpiozero underneath).
+ * `FakeSpiDev`   – drop-in for `spidev.SpiDev` that decodes MCP4162 commands
+                    and keeps the wiper register.
+ * `Transmitter`  – writes receiver packets (CSV lines or binary frames) into
+                    a pty whose slave end is handed to `uart_listener` as the
+                    serial port, paced at the line's baud rate.
+ * --backup      – a second `Transmitter` on its own pty, passed to main.py
+                    as --link: the primary drops out and sends garbage
+                    while the backup carries on (failover, no e-stop).
+ * `SteeringModel` / `BrakeModel` – integrate jog-pin and brake-pin time into
+                    a steering angle and a brake stroke.
+ * `Operator`     – closed-loop driver for --steer-track: holds the stick
+                    in proportion to the error between a target steering
+                    angle and the model's, like a driver holding a line.
+ * `Autopilot`    – stand-in autonomy stack (--autonomy): scripted setpoints
+                    over the command link while the mode switch says auto.
+ * `SimClock`     – scales time.monotonic / time.sleep / threading waits by
+                    *rate*, so a 20 s scenario can run in 2 s.
+
+The clock and the `spidev` replacement are installed *before* the controller
+modules are imported.  Compute time is not scaled, so at rate N any latency
+made of real work is inflated N× in sim time – use --rate 1 for latency
+numbers and higher rates for behaviour / e-stop regression runs.
+
+    python3 sim.py [--rate 10] [--baud 1200] [--tx-format csv|binary] [--gpio mock]
+                   [--autonomy | --steer-track] [--noise COUNTS] [--backup] [--json FILE]
+                   [main.py options…]
+
+Steering modes compare on the same closed loop (it defaults to 115200 baud
+binary frames – a 1200-baud CSV packet takes 250 ms, too slow to steer by):
+
+    python3 sim.py --steer-track --steering jog
+    python3 sim.py --steer-track --steering proportional
+
+Receiver noise against the conditioning stage (steer_jogs, brake_moves and
+the commands it suppressed):
+
+    python3 sim.py --noise 8
+    python3 sim.py --noise 8 --condition off
+
+Options sim.py does not know are passed on to main.py, e.g.
+`--runtime asyncio --trace`.
+"""
+import bisect
+import math
+import os
+import random
+import selectors
+import sys
+import threading
+import time
+import types
+from collections import namedtuple
+
+from packets import encode_frame
+from command_link import CommandSender
+
+Edge = namedtuple("Edge", "t pin level")
+
+# BCM pins as wired in main.py
+PIN_ENABLE, PIN_CS = 24, 27
+PIN_BRAKE_EXT, PIN_BRAKE_RET = 16, 17
+PIN_JOG_NEG, PIN_JOG_POS = 26, 22
+PIN_STEER_EN, PIN_FAULT = 19, 12
+
+
+# ---------------------------------------------------------------------------
+# Time
+# ---------------------------------------------------------------------------
+class SimClock:
+    """Scale the process's notion of time by *rate* (call install() once)."""
+
+    def __init__(self, rate: float = 1.0):
+        self.rate = rate
+        self._real_monotonic = time.monotonic
+        self._real_sleep = time.sleep
+        self._t0 = self._real_monotonic()
+
+    def monotonic(self) -> float:
+        return self._t0 + (self._real_monotonic() - self._t0) * self.rate
+
+    def sleep(self, seconds: float) -> None:
+        self._real_sleep(max(0.0, seconds) / self.rate)
+
+    def install(self) -> None:
+        rate = self.rate
+        orig_wait = threading.Condition.wait
+        orig_select = selectors.DefaultSelector.select
+
+        def wait(cond, timeout=None):
+            return orig_wait(cond, None if timeout is None else timeout / rate)
+
+        def select(sel, timeout=None):            # asyncio's loop timeouts
+            return orig_select(sel, None if timeout is None else timeout / rate)
+
+        time.monotonic = self.monotonic
+        time.sleep = self.sleep
+        threading._time = self.monotonic          # used by Condition.wait_for
+        threading.Condition.wait = wait
+        selectors.DefaultSelector.select = select
+
+
+# ---------------------------------------------------------------------------
+# GPIO
+# ---------------------------------------------------------------------------
+def make_factory(listeners=()):
+    """Build a gpiozero MockFactory whose pins report every output edge."""
+    from gpiozero.pins.mock import MockFactory, MockPin
+
+    class SimPin(MockPin):
+        def _change_state(self, value):
+            changed = super()._change_state(value)
+            if changed:
+                self._factory.edge(self._number, value)
+            return changed
+
+    class SimFactory(MockFactory):
+        def __init__(self):
+            super().__init__(pin_class=SimPin)
+            self.edges = []
+            self.listeners = list(listeners)
+            self._lock = threading.Lock()
+
+        def edge(self, pin: int, level: bool):
+            e = Edge(time.monotonic(), pin, int(level))
+            with self._lock:
+                self.edges.append(e)
+            for fn in self.listeners:
+                fn(e)
+
+        def level(self, pin: int) -> int:
+            return int(self.pin(pin).state)
+
+    return SimFactory()
+
+
+# ---------------------------------------------------------------------------
+# SPI – MCP4162
+# ---------------------------------------------------------------------------
+class FakeSpiDev:
+    """Enough of spidev.SpiDev for an MCP4162 on one chip select."""
+
+    instances = []
+
+    def __init__(self):
+        self.mode = 0
+        self.max_speed_hz = 0
+        self.wiper = 0x80                 # power-on reset value
+        self.writes = []                  # (sim time, value)
+        self.transfers = 0
+        FakeSpiDev.instances.append(self)
+
+    def open(self, bus: int, device: int) -> None:
+        self.bus, self.device = bus, device
+
+    def close(self) -> None:
+        pass
+
+    def xfer2(self, data):
+        self.transfers += 1
+        cmd = data[0]
+        addr, op = cmd >> 4, (cmd >> 2) & 0b11
+        resp = [0xFF] * len(data)
+        if addr != 0:
+            resp[0] = 0xFD                # CMDERR: only wiper 0 is modelled
+        elif op == 0b00 and len(data) >= 2:      # write
+            self.wiper = min(256, ((cmd & 0b11) << 8) | data[1])
+            self.writes.append((time.monotonic(), self.wiper))
+        elif op == 0b11 and len(data) >= 2:      # read
+            resp = [0xFE | (self.wiper >> 8), self.wiper & 0xFF]
+        elif op == 0b01:                         # increment
+            self.wiper = min(256, self.wiper + 1)
+        elif op == 0b10:                         # decrement
+            self.wiper = max(0, self.wiper - 1)
+        return resp
+
+    # spidev also offers xfer/writebytes; the driver only needs xfer2
+    xfer = xfer2
+
+
+def install_spidev() -> None:
+    mod = types.ModuleType("spidev")
+    mod.SpiDev = FakeSpiDev
+    sys.modules["spidev"] = mod
+
+
+# ---------------------------------------------------------------------------
+# Physical models
+# ---------------------------------------------------------------------------
+class _Integrator:
+    """Position driven by a (+) and a (−) pin at a fixed rate."""
+
+    def __init__(self, pos_pin, neg_pin, rate, lo, hi, pos=0.0):
+        self.pins = {pos_pin: +1, neg_pin: -1}
+        self.level = {pos_pin: 0, neg_pin: 0}
+        self.rate, self.lo, self.hi = rate, lo, hi
+        self.pos = pos
+        self._t = time.monotonic()
+        self.trace = [(self._t, pos)]
+        self._lock = threading.Lock()     # edges and position() race otherwise
+
+    def _drive(self):
+        return sum(d for p, d in self.pins.items() if self.level[p])
+
+    def advance(self, now):
+        self.pos = max(self.lo, min(self.hi, self.pos + self._drive() * self.rate * (now - self._t)))
+        self._t = now
+
+    def on_edge(self, e: Edge):
+        if e.pin in self.pins:
+            with self._lock:
+                self.advance(e.t)
+                self.level[e.pin] = e.level
+                self.trace.append((e.t, self.pos))
+
+    def position(self):
+        with self._lock:
+            self.advance(time.monotonic())
+            return self.pos
+
+    def at(self, t):
+        """Position at sim time *t* (linear between the recorded edges)."""
+        i = bisect.bisect_right(self.trace, (t, math.inf))
+        if i == 0:
+            return self.trace[0][1]
+        t0, p0 = self.trace[i - 1]
+        if i == len(self.trace):
+            drive = self._drive()
+        else:
+            t1, p1 = self.trace[i]
+            drive = 0 if t1 == t0 else (p1 - p0) / (t1 - t0) / self.rate
+        return max(self.lo, min(self.hi, p0 + drive * self.rate * (t - t0)))
+
+
+class SteeringModel(_Integrator):
+    """Steering angle in degrees, + = left (Jog-NEG)."""
+
+    def __init__(self, deg_per_s=60.0, limit=30.0):
+        super().__init__(PIN_JOG_NEG, PIN_JOG_POS, deg_per_s, -limit, limit)
+
+
+class BrakeModel(_Integrator):
+    """Brake stroke 0 (released) … 1 (applied)."""
+
+    def __init__(self, stroke_s=5.0):
+        super().__init__(PIN_BRAKE_EXT, PIN_BRAKE_RET, 1.0 / stroke_s, 0.0, 1.0)
+
+
+# ---------------------------------------------------------------------------
+# Receiver
+# ---------------------------------------------------------------------------
+NEUTRAL = (992, 992, 1809, 1809, 1809, 1809)
+
+
+def default_script():
+    """(duration s, raw channels or None for silence) steps exercising every
+    actuator, the e-stop and link loss."""
+    return [
+        (1.0, NEUTRAL),
+        (2.0, (1400, 992, 1809, 1809, 1809, 1809)),    # half throttle
+        (1.0, (1400, 1500, 1809, 1809, 1809, 1809)),   # steer left
+        (1.0, (1400, 992, 1809, 1809, 1809, 1809)),
+        (1.0, (1400, 500, 1809, 1809, 1809, 1809)),    # steer right
+        (1.0, (992, 992, 172, 1809, 1809, 1809)),      # brake
+        (6.0, (992, 992, 1809, 1809, 1809, 1809)),     # release
+        (1.0, (1600, 992, 1809, 1809, 1809, 1809)),
+        (2.0, (1600, 992, 1809, 172, 1809, 1809)),     # e-stop A under throttle
+        (2.0, (992, 992, 1809, 1809, 1809, 1809)),     # clear
+        (1.0, (1400, 992, 1809, 1809, 1809, 1809)),
+        (2.0, None),                                   # receiver goes silent
+        (1.0, NEUTRAL),
+    ]
+
+
+class Garbled(tuple):
+    """A script step whose packets arrive corrupted (bad CSV / bad CRC)."""
+
+
+def failover_script(script):
+    """*script* for a primary receiver that drops out for 1 s in the half-
+    throttle step and sends garbage for 2 s while the brake is released;
+    step lengths are unchanged, so a backup running *script* stays in step."""
+    out = []
+    for i, (d, raw) in enumerate(script):
+        if i == 1:
+            out += [(0.5, raw), (1.0, None), (d - 1.5, raw)]
+        elif i == 6:
+            out += [(2.0, raw), (2.0, Garbled(raw)), (d - 4.0, raw)]
+        else:
+            out.append((d, raw))
+    return out
+
+
+class SendLog(list):
+    """(sim time, payload) in send order, with the report's lookups."""
+
+    def first_sent(self, pred, after=0.0):
+        for t, raw in self:
+            if t >= after and pred(raw):
+                return t
+        return None
+
+    def last_before_gap(self, gap: float):
+        """Send time of the last packet followed by at least *gap* s of silence."""
+        for (t, _), (t_next, _) in zip(self, self[1:]):
+            if t_next - t >= gap:
+                return t
+        return None
+
+
+class Transmitter:
+    """Writes packets into a pty at the pace a real UART would."""
+
+    def __init__(self, script, baud: int = 1200, fmt: str = "csv", period: float = 0.0,
+                 noise: float = 0.0):
+        self.script = script
+        self.baud = baud
+        self.fmt = fmt
+        self.period = period              # frame period, if longer than the line time
+        self.noise = noise                # receiver jitter σ on the stick channels
+        self._rnd = random.Random(7)
+        self.master, slave = os.openpty()
+        self.port = os.ttyname(slave)
+        self._slave = slave
+        self.sent = SendLog()             # (sim time fully sent, raw tuple)
+        self.done = threading.Event()
+
+    def run(self):
+        for duration, step in self.script:
+            t_end = time.monotonic() + duration
+            if step is None:
+                time.sleep(duration)
+                continue
+            raw = step
+            while time.monotonic() < t_end:
+                if callable(step):             # closed loop: channels per packet
+                    raw = step()
+                out = self._jitter(raw) if self.noise else raw
+                if self.fmt == "binary":
+                    line = encode_frame(len(self.sent), out)
+                    if isinstance(step, Garbled):
+                        line = line[:-1] + bytes([line[-1] ^ 0xFF])
+                else:
+                    line = (",".join(map(str, out)) + "\n").encode()
+                    if isinstance(step, Garbled):
+                        line = line.replace(b",", b";", 2)
+                time.sleep(max(self.period, len(line) * 10 / self.baud))   # 8N1 = 10 bits/byte
+                os.write(self.master, line)
+                self.sent.append((time.monotonic(), raw))    # what the stick said
+        self.done.set()
+
+    def _jitter(self, raw):
+        """Gaussian noise on throttle, steering and brake; switches stay clean."""
+        g = self._rnd.gauss
+        return tuple(min(2047, max(0, round(v + g(0, self.noise)))) if c < 3 else v
+                     for c, v in enumerate(raw))
+
+    def start(self):
+        threading.Thread(target=self.run, name="sim-tx", daemon=True).start()
+
+
+class Operator:
+    """
+    Steers toward `target(t)` by looking at the steering model: stick
+    deflection = *gain* × angle error (µs per degree), as a driver would.
+    """
+
+    def __init__(self, model: "SteeringModel", gain: float = 820 / 8.0):
+        self.model = model
+        self.gain = gain
+        self.t0 = None
+
+    @staticmethod
+    def target(t: float) -> float:
+        """Target steering angle (deg) *t* s into the run: two holds, a weave."""
+        if t < 3.0:
+            return 12.0
+        if t < 6.0:
+            return -8.0
+        return 10.0 * math.sin(2 * math.pi * (t - 6.0) / 3.0)
+
+    def __call__(self):
+        now = time.monotonic()
+        if self.t0 is None:
+            self.t0 = now
+        err = self.target(now - self.t0) - self.model.position()
+        stick = max(172, min(1811, round(992 + self.gain * err)))
+        return (992, stick, 1809, 1809, 1809, 1809)
+
+    def errors(self, t_end: float, dt: float = 0.005):
+        """Target − model angle, sampled every *dt* s from t0 to *t_end*."""
+        n = int((t_end - self.t0) / dt)
+        return [self.target(i * dt) - self.model.at(self.t0 + i * dt) for i in range(n)]
+
+
+def steer_track_script(operator: Operator, seconds: float = 12.0):
+    return [(0.5, NEUTRAL), (seconds, operator), (0.5, NEUTRAL)]
+
+
+AUTO = (992, 992, 1809, 1809, 1809, 172)       # RC neutral, mode switch on auto
+
+
+def autopilot_script():
+    """(duration s, (throttle, steering, brake) or None for silence) steps."""
+    return [
+        (1.0, (0, 0, 1)),
+        (2.0, (150, 0, 0)),
+        (1.0, (150, 1, 0)),                    # steer left
+        (1.0, (150, 0, 0)),
+        (1.0, None),                           # autonomy stack stalls
+        (2.0, (0, 0, 1)),
+    ]
+
+
+class Autopilot:
+    """Sends scripted commands over the command link at *rate* Hz."""
+
+    def __init__(self, script, path: str, rate: float = 50.0):
+        self.script = script
+        self.path = path
+        self.rate = rate
+        self.sent = SendLog()             # (sim time, (throttle, steering, brake))
+
+    def run(self):
+        tx = CommandSender(self.path)
+        for duration, cmd in self.script:
+            t_end = time.monotonic() + duration
+            if cmd is None:
+                time.sleep(duration)
+                continue
+            while time.monotonic() < t_end:
+                self.sent.append((tx.send(*cmd), cmd))
+                time.sleep(1.0 / self.rate)
+        tx.close()
+
+    def start(self):
+        threading.Thread(target=self.run, name="sim-autopilot", daemon=True).start()
+
+
+# ---------------------------------------------------------------------------
+# Scenario runner
+# ---------------------------------------------------------------------------
+class Simulation:
+    def __init__(self, rate: float = 10.0, baud: int = 1200, script=None,
+                 fmt: str = "csv", autonomy: bool = False, steer_track: bool = False,
+                 gpio: str = "gpiozero", noise: float = 0.0, backup: bool = False):
+        self.clock = SimClock(rate)
+        self.clock.install()
+        install_spidev()
+        self.steering = SteeringModel()
+        self.brake = BrakeModel()
+        import gpio_backend
+        listeners = [self.steering.on_edge, self.brake.on_edge]
+        # a --supervisor process gets a mock of its own through the environment
+        os.environ["AUTOKART_GPIO"] = gpio
+        if gpio == "mock":
+            self.factory = gpio_backend.use(gpio_backend.MockBackend(listeners))
+        else:
+            os.environ.setdefault("GPIOZERO_PIN_FACTORY", "mock")
+            self.factory = make_factory(listeners)
+            from gpiozero import Device
+            Device.pin_factory = self.factory
+            gpio_backend.use("gpiozero")
+        self.autopilot = None
+        self.operator = None
+        if steer_track:
+            self.operator = Operator(self.steering)
+            script = script or steer_track_script(self.operator)
+        if autonomy:
+            self.autopilot = Autopilot(autopilot_script(),
+                                       f"/tmp/autokart-sim-cmd-{os.getpid()}.sock")
+            script = script or [(sum(d for d, _ in self.autopilot.script) + 0.5, AUTO)]
+        script = script or default_script()
+        self.backup = None
+        if backup:
+            self.backup = Transmitter(script, baud, fmt, period=0.02 if steer_track else 0.0,
+                                      noise=noise)
+            script = failover_script(script)
+        self.tx = Transmitter(script, baud, fmt,
+                              period=0.02 if steer_track else 0.0,   # RC frame rate
+                              noise=noise)
+        self.log_path = None
+
+    def run(self, log_path: str = "/tmp/autokart-sim.evlog", extra=()):
+        import main as controller
+        self.controller = controller
+        self.log_path = log_path
+        self.tx.start()
+        duration = sum(d for d, _ in self.tx.script) + 0.5
+        if "--baud" not in extra:              # keep the baud scan out of the latencies
+            extra = ["--baud", str(self.tx.baud), *extra]
+        if self.backup is not None:
+            self.backup.start()
+            extra = ["--link", f"{self.backup.port},{self.backup.baud},{self.backup.fmt}",
+                     *extra]
+        if self.autopilot is not None:
+            extra = ["--cmd-socket", self.autopilot.path, *extra]
+            threading.Timer(0.3 / self.clock.rate, self.autopilot.start).start()
+        t = threading.Thread(target=controller.main,
+                             args=(["--port", self.tx.port, "--log", log_path,
+                                    "--duration", str(duration), *extra],),
+                             daemon=True)
+        t.start()
+        self.tx.done.wait()
+        t.join(timeout=5.0)
+        return self.report()
+
+    # ------------------------------------------------------------------
+    def first_edge(self, pin, level, after):
+        for e in self.factory.edges:
+            if e.t >= after and e.pin == pin and e.level == level:
+                return e.t
+        return None
+
+    def _escalations(self):
+        """Watchdog level rises (HOLD / ZERO / FAILSAFE) in the event log."""
+        import eventlog
+        try:
+            return sum(1 for _, _, name, v in eventlog.decode(self.log_path)
+                       if name == "LINK" and v["level"] > v["prev"])
+        except (OSError, ValueError):
+            return None
+
+    def _latency(self, t_cmd, t_act):
+        if t_cmd is None or t_act is None:
+            return None
+        return (t_act - t_cmd) * 1e3
+
+    def _published(self) -> SendLog:
+        """What the controller acted on: with --backup, each transmitter's
+        packets while its link was the active one."""
+        if self.backup is None:
+            return self.tx.sent
+        arb = self.controller.links
+        by_port = {self.tx.port: self.tx.sent, self.backup.port: self.backup.sent}
+        spans = [(0.0, arb.links[0].name)] + [(f.t, f.to) for f in arb.failovers]
+        spans.append((float("inf"), None))
+        return SendLog(p for (t0, name), (t1, _) in zip(spans, spans[1:])
+                       for p in by_port[name] if t0 <= p[0] < t1)
+
+    def report(self) -> dict:
+        tx, spi = self._published(), FakeSpiDev.instances[-1]
+        t_thr = tx.first_sent(lambda r: r[0] != 992)
+        t_wiper = next((t for t, v in spi.writes if t_thr and t >= t_thr and v), None)
+        t_left = tx.first_sent(lambda r: r[1] > 992)
+        t_brk = tx.first_sent(lambda r: r[2] <= 992)
+        t_estop = tx.first_sent(lambda r: r[3] < 1809 or r[4] < 1809)
+        t_clear = tx.first_sent(lambda r: r[3] >= 1809, after=t_estop or 0)
+        t_silent = tx.last_before_gap(1.0)
+        link_deadline = self.controller.watchdog.deadlines[2]
+        rep = dict(
+            packets=len(self.tx.sent),
+            edges=len(self.factory.edges),
+            gpio_writes=getattr(self.factory, "writes", None),   # --gpio mock: incl. no-ops
+            spi_transfers=spi.transfers,
+            wiper_final=spi.wiper,
+            throttle_ms=self._latency(t_thr, t_wiper),
+            steering_ms=self._latency(t_left, self.first_edge(PIN_JOG_NEG, 1, t_left or 0)),
+            brake_ms=self._latency(t_brk, self.first_edge(PIN_BRAKE_EXT, 1, t_brk or 0)),
+            estop_enable_low_ms=self._latency(t_estop, self.first_edge(PIN_ENABLE, 0, t_estop or 0)),
+            estop_wiper_zero_ms=self._latency(
+                t_estop, next((t for t, v in spi.writes if t_estop and t >= t_estop and v == 0), None)),
+            estop_brake_ms=self._latency(t_estop, self.first_edge(PIN_BRAKE_EXT, 1, t_estop or 0)),
+            reenable_ms=self._latency(t_clear, self.first_edge(PIN_ENABLE, 1, t_clear or 0)),
+            linkloss_enable_low_ms=self._latency(
+                t_silent and t_silent + link_deadline,
+                self.first_edge(PIN_ENABLE, 0, t_silent or 0)),
+            steer_jogs=sum(e.level == 1 and e.pin in (PIN_JOG_NEG, PIN_JOG_POS)
+                           for e in self.factory.edges),
+            brake_moves=sum(e.level == 1 and e.pin in (PIN_BRAKE_EXT, PIN_BRAKE_RET)
+                            for e in self.factory.edges),
+            suppressed=(self.controller.conditioner.suppressed
+                        if self.controller.conditioner is not None else None),
+            watchdog_escalations=self._escalations(),
+            steering_deg_final=self.steering.position(),
+            brake_stroke_final=self.brake.position(),
+        )
+        if self.backup is not None:
+            arb = self.controller.links.stats()
+            rep.update(
+                failovers=arb["failovers"],
+                failover_gap_ms_max=arb["gap_ms_max"],
+                link_switches=" ".join(f"{h[3]}→{h[2]}"
+                                       for h in arb["history"]),
+            )
+        ap = self.autopilot
+        if ap is not None:
+            t_go = ap.sent.first_sent(lambda c: c[0] == 150)
+            t_left = ap.sent.first_sent(lambda c: c[1] == 1)
+            t_gap = ap.sent.last_before_gap(0.5)
+            t_stale = t_gap and t_gap + self.controller.commands.max_age
+            rep.update(
+                commands=len(ap.sent),
+                cmd_throttle_ms=self._latency(
+                    t_go, next((t for t, v in spi.writes if t_go and t >= t_go and v == 150), None)),
+                cmd_steering_ms=self._latency(t_left, self.first_edge(PIN_JOG_NEG, 1, t_left or 0)),
+                cmd_stale_wiper_zero_ms=self._latency(
+                    t_stale, next((t for t, v in spi.writes if t_gap and t >= t_gap and v == 0), None)),
+                cmd_stale_brake_ms=self._latency(
+                    t_stale, self.first_edge(PIN_BRAKE_EXT, 1, t_gap or 0)),
+            )
+        op = self.operator
+        if op is not None and op.t0 is not None:
+            t_end = op.t0 + self.tx.script[1][0]
+            errs = op.errors(t_end)
+            jogs = [e for e in self.factory.edges if e.level == 1 and op.t0 <= e.t < t_end
+                    and e.pin in (PIN_JOG_NEG, PIN_JOG_POS)]
+            reversals = sum(a.pin != b.pin for a, b in zip(jogs, jogs[1:]))
+            settled = [abs(e) for e in errs[int(1.0 / 0.005):int(3.0 / 0.005)]]
+            weave = errs[int(7.0 / 0.005):]
+            rep.update(
+                steer_rms_err_deg=math.sqrt(sum(e * e for e in errs) / len(errs)),
+                steer_hold_err_deg=max(settled),          # 1-3 s: holding 12°
+                steer_weave_rms_deg=math.sqrt(sum(e * e for e in weave) / len(weave)),
+                steer_jogs_per_s=len(jogs) / (t_end - op.t0),
+                steer_reversals=reversals,
+            )
+        return rep
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Run main.py against simulated hardware")
+    ap.add_argument("--rate", type=float, default=10.0, help="sim seconds per real second")
+    ap.add_argument("--baud", type=int,
+                    help="transmitter baud (default 1200, 115200 with --steer-track)")
+    ap.add_argument("--tx-format", choices=("csv", "binary"),
+                    help="what the simulated transmitter sends "
+                         "(default csv, binary with --steer-track)")
+    ap.add_argument("--autonomy", action="store_true",
+                    help="mode switch on auto, setpoints from a stand-in autopilot")
+    ap.add_argument("--steer-track", action="store_true",
+                    help="closed-loop steering-tracking scenario (try --steering …)")
+    ap.add_argument("--gpio", choices=("gpiozero", "mock"), default="gpiozero",
+                    help="GPIO path under the drivers: gpiozero's mock pins, or "
+                         "gpio_backend's in-memory backend")
+    ap.add_argument("--backup", action="store_true",
+                    help="second receiver on its own pty (--link); the primary "
+                         "drops out and sends garbage")
+    ap.add_argument("--noise", type=float, default=0.0, metavar="COUNTS",
+                    help="receiver jitter σ on the stick channels (compare "
+                         "with --condition off)")
+    ap.add_argument("--json", metavar="FILE", help="also write the report as JSON")
+    args, extra = ap.parse_known_args()
+    if args.baud is None:
+        args.baud = 115200 if args.steer_track else 1200
+    if args.tx_format is None:
+        args.tx_format = "binary" if args.steer_track else "csv"
+
+    sim = Simulation(rate=args.rate, baud=args.baud, fmt=args.tx_format,
+                     autonomy=args.autonomy, steer_track=args.steer_track, gpio=args.gpio,
+                     noise=args.noise, backup=args.backup)
+    t0 = sim.clock._real_monotonic()
+    rep = sim.run(extra=extra)
+    if args.json:
+        import json
+        with open(args.json, "w") as f:
+            json.dump(rep, f)
+    print(f"\n[Sim] {sim.clock._real_monotonic() - t0:.1f} s real at {args.rate:g}x")
+    for k, v in rep.items():
+        print(f"  {k:22s} {'—' if v is None else round(v, 2) if isinstance(v, float) else v}")
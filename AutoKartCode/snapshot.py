@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+snapshot.py – versioned, lock-free receiver state
+
+`VersionedState` replaces the `threading.Lock` + two attributes that every
+thread in main.py used to take.  It is a two-slot seqlock specialised for
+CPython:
+
+ * The writer builds a new immutable `Snapshot` (seq, monotonic receive time,
+   raw tuple, mapped tuple), stores it in the slot the readers are *not*
+   looking at, then bumps the sequence number.
+ * Readers load the sequence number and then the matching slot.  Because a
+   snapshot is an immutable tuple it can never be seen half-written; a reader
+   that is lapped by the writer between the two loads simply gets a newer
+   snapshot.  Readers never block and never retry.
+ * `changed(since)` is a single integer compare, so a worker can tell whether
+   anything arrived since its last read without touching the data.
+
+Several writers are serialised by a private lock that readers never take.
+
+Run stand-alone for a contention benchmark against the old global lock:
+
+    python3 snapshot.py [readers] [seconds]
+"""
+import threading
+import time
+from collections import namedtuple
+
+Snapshot = namedtuple("Snapshot", "seq t_rx raw mapped")
+
+
+class VersionedState:
+    """Double-buffered `Snapshot` holder with a sequence number."""
+
+    def __init__(self, raw, mapped):
+        first = Snapshot(0, time.monotonic(), tuple(raw), tuple(mapped))
+        self._slots = [first, first]
+        self._seq = 0
+        self._wlock = threading.Lock()      # writers only
+
+    # ------------------------------------------------------------------
+    # Writer side
+    # ------------------------------------------------------------------
+    def publish(self, raw, mapped, t_rx: float = None) -> int:
+        """Publish a new snapshot and return its sequence number."""
+        if t_rx is None:
+            t_rx = time.monotonic()
+        with self._wlock:
+            seq = self._seq + 1
+            self._slots[seq & 1] = Snapshot(seq, t_rx, tuple(raw), tuple(mapped))
+            self._seq = seq                 # make it visible last
+        return seq
+
+    # ------------------------------------------------------------------
+    # Reader side
+    # ------------------------------------------------------------------
+    def read(self) -> Snapshot:
+        """Latest consistent snapshot (never blocks)."""
+        return self._slots[self._seq & 1]
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    def changed(self, since: int) -> bool:
+        """True if anything was published after sequence *since*."""
+        return self._seq != since
+
+
+# ---------------------------------------------------------------------------
+# Stand-alone contention benchmark
+# ---------------------------------------------------------------------------
+class _LockedState:
+    """The original main.Shared access pattern."""
+
+    def __init__(self, raw, mapped):
+        self.lock = threading.Lock()
+        self.raw = list(raw)
+        self.mapped = list(mapped)
+
+    def publish(self, raw, mapped):
+        with self.lock:
+            self.raw = list(raw)
+            self.mapped = list(mapped)
+
+    def read(self):
+        with self.lock:
+            return self.raw, self.mapped
+
+
+def _bench(state, readers: int, seconds: float):
+    stop = threading.Event()
+    reads = [0] * readers
+    writes = [0]
+    worst_publish = [0.0]
+
+    def reader(i):
+        n = 0
+        rd = state.read
+        while not stop.is_set():
+            for _ in range(100):
+                rd()
+            n += 100
+        reads[i] = n
+
+    def writer():
+        raw = [992, 992, 1809, 1809, 1809, 1809]
+        mapped = [255, 0, 0, 0, 0, 0]
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            state.publish(raw, mapped)
+            worst_publish[0] = max(worst_publish[0], time.perf_counter() - t0)
+            writes[0] += 1
+            time.sleep(0.001)               # ~1 kHz, far above the real link
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads.append(threading.Thread(target=writer))
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return sum(reads) / seconds, writes[0] / seconds, worst_publish[0]
+
+
+if __name__ == "__main__":
+    import sys
+    readers = int(sys.argv[1]) if len(sys.argv) > 1 else 6
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+    raw = [992, 992, 1809, 1809, 1809, 1809]
+    mapped = [255, 0, 0, 0, 0, 0]
+
+    print(f"{readers} reader threads, 1 writer, {seconds:.1f} s each")
+    for name, st in (("threading.Lock ", _LockedState(raw, mapped)),
+                     ("VersionedState ", VersionedState(raw, mapped))):
+        rps, wps, worst = _bench(st, readers, seconds)
+        print(f"{name}: {rps:12,.0f} reads/s  {wps:6,.0f} publishes/s  "
+              f"worst publish {worst * 1e6:8.1f} µs")
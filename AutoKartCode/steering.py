@@ -13,9 +13,35 @@ Direction mapping used by `set_direction()`:
     +1  →  left   (Jog-NEG)
      0  →  stop   (no jog pins active)
     –1  →  right  (Jog-POS)
+
+`set_direction()` never sleeps: jog and fault-reset pulses run on a
+`PulseTimer`.  Repeating the active direction extends the jog, a new
+direction ends it and starts the other one, and `disable()` aborts
+everything and holds both jog pins low until `enable()`.
+
+`set_effort()` is the proportional alternative: an effort of −1 … +1
+(+ = left, e.g. the stick's deflection from centre) becomes a train of
+jog pulses whose width *and* duty grow with the effort – a small
+deflection gives short, sparse jogs, a full one gives long jogs with only
+the fault-reset gap between them.  The train runs on the same timer, so
+the caller still never blocks; a new effort takes effect at once if it
+is stronger or changes direction, otherwise with the next pulse.
+
+The four lines are claimed as one `gpio_backend` group: the fault reset
+goes out in the same write that holds both jog pins low, and disable()
+drops both jog pins in a single write.
 """
+import threading
 from time import sleep
-from gpiozero import DigitalOutputDevice
+import gpio_backend
+from pulse import PulseTimer
+from eventlog import (log, SRC_STEERING, EV_JOG, EV_JOG_EXTEND, EV_FAULT_RESET,
+                      EV_STEER_DISABLE, EV_STEER_ENABLE, EV_JOG_TRAIN)
+from latency import TRACER
+
+
+def _nothing():
+    pass
 
 
 class Steering:
@@ -25,18 +51,37 @@ class Steering:
     JOG_PULSE = 0.20        # length of jog command
     FAULT_PULSE = 0.001     # 1 ms reset pulse
 
+    # --- proportional mode (set_effort) -----------------------------------
+    DEADBAND = 0.04         # |effort| at or below this is centre
+    MIN_JOG = 0.02          # jog width just outside the deadband …
+                            # … growing linearly to JOG_PULSE at full effort
+    MAX_DUTY = 0.9          # jog time / train period at full effort
+    MIN_GAP = 0.005         # room for the fault reset between jogs
+    MAX_GAP = 1.0           # sparsest train (5 × JOG_PULSE), just outside the deadband
+
     def __init__(
         self,
         enable_pin: int = 19,
         fault_pin: int = 12,
         jog_neg_pin: int = 26,
         jog_pos_pin: int = 22,
+        timer: PulseTimer = None,
+        backend=None,
     ):
-        # Outputs
-        self._enable = DigitalOutputDevice(enable_pin, active_high=True, initial_value=False)
-        self._fault  = DigitalOutputDevice(fault_pin,  active_high=True, initial_value=False)
-        self._jneg   = DigitalOutputDevice(jog_neg_pin, active_high=True, initial_value=False)
-        self._jpos   = DigitalOutputDevice(jog_pos_pin, active_high=True, initial_value=False)
+        # Outputs – one group, so multi-line transitions are one write
+        self._io = (backend or gpio_backend.default()).claim(
+            "steering", dict(enable=enable_pin, fault=fault_pin,
+                             jneg=jog_neg_pin, jpos=jog_pos_pin))
+        self._enable = self._io.line("enable")
+        self._fault  = self._io.line("fault")
+        self._jneg   = self._io.line("jneg")
+        self._jpos   = self._io.line("jpos")
+
+        self._timer = timer or PulseTimer("steering-pulse")
+        self._dir = 0            # direction of the jog currently running
+        self._train = None       # (direction, width, gap) while set_effort() jogs
+        self._enabled = True
+        self._lock = threading.Lock()   # commands vs disable(); taken before the timer's
 
         # Latch the drive ON immediately
         self._enable.on()
@@ -53,44 +98,102 @@ class Steering:
         """
         if direction not in (-1, 0, 1):
             raise ValueError("direction must be -1, 0 or 1")
+        with self._lock:            # against disable() on the supervisor thread
+            if not self._enabled:
+                return
 
-        # ensure both jog pins low first
-        self._jneg.off()
-        self._jpos.off()
-
-        if direction == 1:       # left
-            print("[Steering] Jog LEFT")
-            self._jneg.on()
-            sleep(self.JOG_PULSE)
-            self._jneg.off()
-
-        elif direction == -1:    # right
-            print("[Steering] Jog RIGHT")
-            self._jpos.on()
-            sleep(self.JOG_PULSE)
-            self._jpos.off()
-        else:
-            print("[Steering] Centre / stop")
-
-        # always issue a brief fault-reset pulse
-        self._pulse_fault_reset()
+            if TRACER.enabled:
+                TRACER.write("steering")
+            self._stop_train()
+            if direction and direction == self._dir and self._timer.extend("jog", self.JOG_PULSE):
+                log(SRC_STEERING, EV_JOG_EXTEND, direction)
+                return                               # same way – just keep going
+
+            # ends any jog still running (both jog pins low) before the new one
+            self._timer.cancel("jog")
+            self._dir = direction
+            if direction:
+                log(SRC_STEERING, EV_JOG, direction)
+
+            if direction == 1:       # left
+                self._timer.start("jog", self._jneg.on, self._jneg.off,
+                                  self.JOG_PULSE, then=self._jog_done)
+            elif direction == -1:    # right
+                self._timer.start("jog", self._jpos.on, self._jpos.off,
+                                  self.JOG_PULSE, then=self._jog_done)
+            else:
+                self._pulse_fault_reset()
+
+    def set_effort(self, effort: float):
+        """
+        Proportional steering: effort −1 … +1 (+ = left) sets the jog width
+        and repetition rate; inside ±DEADBAND the train stops.
+        """
+        with self._lock:            # against disable() on the supervisor thread
+            if not self._enabled:
+                return
+            train = self.train_for(effort)
+            old = self._train
+            if train == old:
+                return
+            if TRACER.enabled:
+                TRACER.write("steering")
+            self._train = train
+            if train is None:
+                log(SRC_STEERING, EV_JOG_TRAIN, 0, 0, 0)
+                self._timer.cancel("gap")
+                if self._timer.cancel("jog"):
+                    self._dir = 0
+                    self._pulse_fault_reset()
+                return
+            log(SRC_STEERING, EV_JOG_TRAIN, train[0], round(train[1] * 1e3),
+                round(train[2] * 1e3))
+            if old is None or train[0] != old[0]:
+                self._timer.cancel("gap")
+                self._train_pulse()                  # new direction: jog now
+            elif train[1] > old[1] and self._timer.cancel("gap"):
+                self._train_pulse()                  # stronger: don't sit out the gap
+
+    @classmethod
+    def train_for(cls, effort: float):
+        """(direction, jog width s, gap s) for *effort*, or None inside the deadband."""
+        mag = abs(effort)
+        if mag <= cls.DEADBAND:
+            return None
+        x = min(1.0, (mag - cls.DEADBAND) / (1.0 - cls.DEADBAND))
+        width = cls.MIN_JOG + (cls.JOG_PULSE - cls.MIN_JOG) * x
+        duty = cls.MAX_DUTY * x
+        gap = min(cls.MAX_GAP, max(cls.MIN_GAP, width / duty - width))
+        return (1 if effort > 0 else -1), width, gap
+
+    def pulse_accuracy(self) -> dict:
+        """Achieved-vs-requested jog/fault pulse widths (see PulseTimer)."""
+        return self._timer.accuracy()
 
     def close(self):
         """Release GPIOs cleanly."""
-        self._enable.off()
-        self._fault.off()
-        self._jneg.off()
-        self._jpos.off()
-
-        for dev in (self._enable, self._fault, self._jneg, self._jpos):
-            dev.close()
+        self._timer.close()
+        self._io.set(enable=0, fault=0, jneg=0, jpos=0)
+        self._io.close()
         print("[Steering] GPIOs released")
     
     def disable(self):
-        print("[Steering] Disable (no-op)")
+        """Abort pending pulses and hold both jog pins low.  No command that
+        was already under way can start a pulse after this returns."""
+        with self._lock:
+            was, self._enabled = self._enabled, False   # first: timer callbacks check it
+            self._train = None
+            self._timer.cancel_all()
+            self._io.set(jneg=0, jpos=0)
+            self._dir = 0
+            if was:
+                log(SRC_STEERING, EV_STEER_DISABLE)
 
     def enable(self):
-        print("[Steering] Enable (no-op)")
+        with self._lock:
+            if not self._enabled:
+                self._enabled = True
+                log(SRC_STEERING, EV_STEER_ENABLE)
 
 
     # Support with-statement usage
@@ -105,10 +208,41 @@ class Steering:
     # ------------------------------------------------------------------ #
     def _pulse_fault_reset(self):
         """1 ms high-pulse on the fault-reset line (LIO2)."""
-        self._fault.on()
-        sleep(self.FAULT_PULSE)
-        self._fault.off()
-        print("[Steering] Fault-reset pulse")
+        log(SRC_STEERING, EV_FAULT_RESET)
+        self._timer.start("fault", self._reset_on, self._fault.off, self.FAULT_PULSE)
+
+    def _reset_on(self):
+        """Fault reset high with both jog pins low, in one write."""
+        self._io.set(jneg=0, jpos=0, fault=1)
+
+    def _jog_done(self):
+        """Timer thread: a jog ran its full length."""
+        self._dir = 0
+        self._pulse_fault_reset()
+
+    def _stop_train(self):
+        if self._train is not None:
+            self._train = None
+            self._timer.cancel("gap")
+
+    def _train_pulse(self):
+        """Start the next jog of the set_effort() train (timer thread or caller)."""
+        train = self._train
+        if train is None or not self._enabled:
+            return
+        direction, width, _ = train
+        self._dir = direction
+        log(SRC_STEERING, EV_JOG, direction)
+        pin = self._jneg if direction == 1 else self._jpos
+        self._timer.start("jog", pin.on, pin.off, width, then=self._train_gap)
+
+    def _train_gap(self):
+        """Timer thread: a train jog ended – fault reset, then wait out the gap."""
+        self._dir = 0
+        self._pulse_fault_reset()
+        train = self._train
+        if train is not None:
+            self._timer.start("gap", _nothing, _nothing, train[2], then=self._train_pulse)
 
 
 # ---------------------------------------------------------------------- #
@@ -122,5 +256,15 @@ if __name__ == "__main__":
             steer.set_direction(-1)      # right
             sleep(1)
             steer.set_direction(0)       # centre
+            sleep(0.1)
+            for effort in (0.1, 0.5, 1.0, -0.3):
+                d, width, gap = steer.train_for(effort)
+                print(f"[Steering] effort {effort:+.1f}: {width * 1e3:.0f} ms jogs "
+                      f"every {(width + gap) * 1e3:.0f} ms")
+                steer.set_effort(effort)
+                sleep(1)
+            steer.set_effort(0)
+            sleep(0.1)
+            print(f"[Steering] Pulse accuracy: {steer.pulse_accuracy()}")
     except KeyboardInterrupt:
         pass
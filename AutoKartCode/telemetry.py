@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+telemetry.py – columnar run recording and an offline query tool
+
+`Telemetry` records a run as column files: every published packet, raw
+and mapped, and every wiper write, steering pulse, brake move and e-stop
+transition.  main.publish hands over the newest frame of each read, as
+the workers see it; older frames that arrived in the same read are
+coalesced away and not recorded.  The control loops only append to
+in-memory queues:
+
+ * packets    `packet()` from main.publish – one deque append
+ * actuators  taken from the event log: the eventlog drainer hands its
+              records to `feed()`, so the drivers need no second hook
+
+A writer thread turns the queues into columns every `period` and appends
+them to the current segment; a new segment starts every `segment` seconds
+and, with `keep`, the oldest go once there are more.  Values outside a
+column's type are clamped; a packet of the wrong length is dropped and
+counted, and a failing flush is counted and retried – the writer never
+dies with the run still going.
+
+    RUN/index.json                   streams, columns, segments (rows, t0, t1)
+    RUN/000001/packet.t.d            one file per column: raw array(typecode)
+    RUN/000001/packet.throttle.h     bytes, machine order (the Pi and a laptop
+    RUN/000001/wiper.value.i         are both little-endian)
+    …
+
+Streams and their columns (besides t, monotonic s, and the event code):
+
+    packet   seq, raw0…rawN, one per mapped output (throttle, steering, …)
+    wiper    value
+    steer    dir, width_ms, gap_ms        JOG, JOG_EXTEND, JOG_TRAIN, …
+    brake    dir, ms, pos_permille        MOVE, SETTLE, STOP
+    estop    state, prev, cause           estop.py transitions
+
+Queries memory-map the column files and bisect the sorted `t` column, so a
+time window reads only its own rows:
+
+    python3 telemetry.py query DIR [--from S] [--to S] [--json]
+    python3 telemetry.py bench
+
+DIR is a run directory or the --telemetry directory (newest run).
+"""
+import bisect
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+from array import array
+from collections import Counter, deque
+
+import eventlog
+from eventlog import (REC, EVENTS, EV_WIPER, EV_JOG, EV_JOG_EXTEND, EV_FAULT_RESET,
+                      EV_STEER_DISABLE, EV_STEER_ENABLE, EV_JOG_TRAIN, EV_BRAKE_MOVE,
+                      EV_BRAKE_SETTLE, EV_BRAKE_STOP, EV_ESTOP_STATE)
+
+VERSION = 1
+
+# event-log stream → (event codes, columns taken from the record by field name)
+EVENT_STREAMS = {
+    "wiper": ((EV_WIPER,), ("value",)),
+    "steer": ((EV_JOG, EV_JOG_EXTEND, EV_FAULT_RESET, EV_STEER_DISABLE, EV_STEER_ENABLE,
+               EV_JOG_TRAIN), ("dir", "width_ms", "gap_ms")),
+    "brake": ((EV_BRAKE_MOVE, EV_BRAKE_SETTLE, EV_BRAKE_STOP), ("dir", "ms", "pos_permille")),
+    "estop": ((EV_ESTOP_STATE,), ("state", "prev", "cause")),
+}
+_BY_EVENT = {ev: name for name, (evs, _) in EVENT_STREAMS.items() for ev in evs}
+
+
+class _Stream:
+    """Column buffers of one stream; flushed to the segment's files."""
+
+    def __init__(self, name: str, columns: dict):
+        self.name = name
+        self.columns = columns                     # column → typecode
+        self.buf = {c: array(tc) for c, tc in columns.items()}
+        self.rows = 0                              # in the current segment
+
+    def flush(self, seg_dir: str) -> int:
+        n = len(self.buf["t"])
+        if n:
+            for c, a in self.buf.items():
+                with open(os.path.join(seg_dir, f"{self.name}.{c}.{a.typecode}"), "ab") as f:
+                    a.tofile(f)
+                del a[:]
+            self.rows += n
+        return n
+
+
+class Telemetry:
+    def __init__(self, root: str, raw: int = 6, mapped=(), segment: float = 60.0,
+                 keep: int = 0, period: float = 0.5):
+        self.dir = os.path.join(root, time.strftime("%Y%m%d-%H%M%S"))
+        os.makedirs(self.dir, exist_ok=True)
+        self.segment = segment
+        self.keep = keep
+        self.period = period
+        cols = dict(t="d", seq="I", **{f"raw{i}": "H" for i in range(raw)},
+                    **{m: "h" for m in mapped})
+        self.streams = {"packet": _Stream("packet", cols)}
+        for name, (_, fields) in EVENT_STREAMS.items():
+            self.streams[name] = _Stream(name, dict(t="d", event="B",
+                                                    **{f: "i" for f in fields}))
+        self._raw, self._mapped = raw, tuple(mapped)
+        self._packets = deque()
+        self._records = deque()
+        self._segments = []                        # index entries, oldest first
+        self._seg_dir = None
+        self._t_roll = None
+        self.index = dict(version=VERSION, wall0=time.time(), mono0=time.monotonic(),
+                          streams={n: s.columns for n, s in self.streams.items()},
+                          segments=self._segments)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="telemetry", daemon=True)
+
+        # statistics
+        self.packets = 0
+        self.records = 0
+        self.dropped = 0                           # packets of the wrong shape
+        self.errors = 0                            # flushes that raised
+        self.flush_s = deque(maxlen=64)
+
+    # ------------------------------------------------------------------
+    # Producers
+    # ------------------------------------------------------------------
+    def packet(self, t: float, seq: int, raw, mapped) -> None:
+        """Hot path (the listener): queue one published packet."""
+        self._packets.append((t, seq, raw, mapped))
+
+    def feed(self, data: bytes) -> None:
+        """Event-log sink: completed records from the drainer thread."""
+        if data:
+            self._records.append(data)
+
+    # ------------------------------------------------------------------
+    def start(self) -> "Telemetry":
+        eventlog.LOG.sinks.append(self.feed)
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        if self.feed in eventlog.LOG.sinks:
+            eventlog.LOG.sinks.remove(self.feed)
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=5.0)
+
+    def stats(self) -> dict:
+        fl = sorted(self.flush_s)
+        return dict(dir=self.dir, packets=self.packets, records=self.records,
+                    dropped=self.dropped, errors=self.errors, segments=len(self._segments),
+                    flush_ms_max=fl[-1] * 1e3 if fl else None)
+
+    # ------------------------------------------------------------------
+    # Writer thread
+    # ------------------------------------------------------------------
+    def _run(self):
+        while not self._stop.wait(self.period):
+            self._safe_flush()
+        self._safe_flush()
+
+    def _safe_flush(self) -> None:
+        try:
+            self._flush()
+        except Exception as e:                     # OSError (disk full), …
+            self.errors += 1
+            if self.errors == 1:
+                print(f"[Telemetry] flush failed, still recording: {e!r}")
+
+    def _flush(self) -> None:
+        t0 = time.monotonic()
+        self._collect()
+        t_first = min((s.buf["t"][0] for s in self.streams.values() if s.buf["t"]),
+                      default=None)
+        if t_first is None:
+            return
+        if self._seg_dir is None or t_first >= self._t_roll:
+            self._roll(t_first)
+        seg = self._segments[-1]
+        for s in self.streams.values():
+            if s.buf["t"]:
+                seg["t1"] = max(seg["t1"], s.buf["t"][-1])
+                s.flush(self._seg_dir)
+                seg["rows"][s.name] = s.rows
+        self._write_index()
+        self.flush_s.append(time.monotonic() - t0)
+
+    def _collect(self) -> None:
+        p = self.streams["packet"].buf
+        cols = [p["t"], p["seq"]] + [p[f"raw{i}"] for i in range(self._raw)] \
+            + [p[m] for m in self._mapped]
+        nraw, nmap = self._raw, len(self._mapped)
+        q = self._packets
+        while q:
+            t, seq, raw, mapped = q.popleft()
+            if len(raw) < nraw or len(mapped) < nmap:
+                self.dropped += 1                  # would put the columns out of step
+                continue
+            row = (t, seq & 0xFFFFFFFF, *(min(0xFFFF, max(0, v)) for v in raw[:nraw]),
+                   *(min(0x7FFF, max(-0x8000, v)) for v in mapped[:nmap]))
+            for col, v in zip(cols, row):
+                col.append(v)
+            self.packets += 1
+        q, size = self._records, REC.size
+        while q:
+            data = q.popleft()
+            for off in range(0, len(data) - size + 1, size):
+                _, t, _src, ev, *vals = REC.unpack_from(data, off)
+                name = _BY_EVENT.get(ev)
+                if name is None:
+                    continue
+                s = self.streams[name]
+                got = dict(zip(EVENTS[ev][1], vals))
+                s.buf["t"].append(t)
+                s.buf["event"].append(ev)
+                for f in EVENT_STREAMS[name][1]:
+                    s.buf[f].append(got.get(f, 0))
+                self.records += 1
+
+    def _roll(self, t: float) -> None:
+        name = f"{len(self._segments) + 1:06d}" if not self._segments \
+            else f"{int(self._segments[-1]['name']) + 1:06d}"
+        self._seg_dir = os.path.join(self.dir, name)
+        os.makedirs(self._seg_dir, exist_ok=True)
+        self._t_roll = t + self.segment
+        for s in self.streams.values():
+            s.rows = 0
+        self._segments.append(dict(name=name, t0=t, t1=t, rows={}))
+        while self.keep and len(self._segments) > self.keep:
+            old = self._segments.pop(0)
+            shutil.rmtree(os.path.join(self.dir, old["name"]), ignore_errors=True)
+
+    def _write_index(self) -> None:
+        tmp = os.path.join(self.dir, "index.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.index, f)
+        os.replace(tmp, os.path.join(self.dir, "index.json"))
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+class Run:
+    """A recorded run, read through memory maps."""
+
+    def __init__(self, path: str):
+        if not os.path.exists(os.path.join(path, "index.json")):
+            runs = sorted(d for d in os.listdir(path)
+                          if os.path.exists(os.path.join(path, d, "index.json")))
+            if not runs:
+                raise FileNotFoundError(f"{path}: no telemetry run")
+            path = os.path.join(path, runs[-1])
+        self.dir = path
+        with open(os.path.join(path, "index.json")) as f:
+            self.index = json.load(f)
+        self.mono0 = self.index["mono0"]
+        self._maps = []
+
+    def columns(self, stream: str, names, t_from: float = None, t_to: float = None):
+        """Yield, per segment, a memoryview of each of *names* (plus t)
+        limited to rows with t_from <= t - start < t_to."""
+        tcs = self.index["streams"][stream]
+        lo = -float("inf") if t_from is None else self.mono0 + t_from
+        hi = float("inf") if t_to is None else self.mono0 + t_to
+        for seg in self.index["segments"]:
+            rows = seg["rows"].get(stream, 0)
+            if not rows or seg["t1"] < lo or seg["t0"] >= hi:
+                continue
+            d = os.path.join(self.dir, seg["name"])
+            t = self._map(d, stream, "t", tcs["t"], rows)
+            a, b = bisect.bisect_left(t, lo), bisect.bisect_left(t, hi)
+            if a < b:
+                yield {c: self._map(d, stream, c, tcs[c], rows)[a:b] for c in ("t", *names)}
+
+    def _map(self, d: str, stream: str, col: str, tc: str, rows: int) -> memoryview:
+        with open(os.path.join(d, f"{stream}.{col}.{tc}"), "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mm)
+        return memoryview(mm).cast(tc)[:rows]      # rows the index vouches for
+
+    def close(self) -> None:
+        for mm in self._maps:
+            try:
+                mm.close()
+            except BufferError:                    # a view still alive; GC has it
+                pass
+        self._maps = []
+
+
+def summarize(run: Run, t_from: float = None, t_to: float = None) -> dict:
+    """Throttle histogram, steering command rate and e-stop count for a window."""
+    packets = 0
+    span = [None, None]
+    changes = 0
+    last = None
+    for cols in run.columns("packet", ("steering",), t_from, t_to):
+        t, steer = cols["t"], cols["steering"]
+        packets += len(t)
+        span[0] = t[0] if span[0] is None else span[0]
+        span[1] = t[-1]
+        for s in steer:                            # one pass over the mapped view
+            if s != last:
+                changes += last is not None and s != 0
+                last = s
+    hist = Counter()
+    writes = 0
+    for cols in run.columns("wiper", ("value",), t_from, t_to):
+        writes += len(cols["value"])
+        hist.update(v // 16 for v in cols["value"])
+    pulses = Counter()
+    for cols in run.columns("steer", ("event",), t_from, t_to):
+        pulses.update(EVENTS[e][0] for e in cols["event"])
+    trips = 0
+    for cols in run.columns("estop", ("state", "prev"), t_from, t_to):
+        trips += sum(1 for s, p in zip(cols["state"], cols["prev"]) if s == 1 and p == 0)
+    secs = (span[1] - span[0]) if packets > 1 else 0.0
+    return dict(
+        window_s=[None if span[0] is None else round(span[0] - run.mono0, 3),
+                  None if span[1] is None else round(span[1] - run.mono0, 3)],
+        packets=packets,
+        packet_rate=packets / secs if secs else None,
+        wiper_writes=writes,
+        throttle_hist={f"{b * 16}-{b * 16 + 15}": n for b, n in sorted(hist.items())},
+        steering_commands=changes,
+        steering_cmd_rate=changes / secs if secs else None,
+        steering_pulses=dict(pulses),
+        estop_trips=trips,
+    )
+
+
+def _bench(n: int = 100_000) -> None:
+    import tempfile
+    with tempfile.TemporaryDirectory() as root:
+        tel = Telemetry(root, mapped=("throttle", "steering", "brake", "estop_a",
+                                      "estop_b", "mode", "steer_effort"))
+        raw, mapped = (1400, 992, 1809, 1809, 1809, 1809), [150, 0, 0, 0, 0, 0, 0]
+        t0 = time.perf_counter()
+        for i in range(n):
+            tel.packet(time.monotonic(), i, raw, mapped)
+        t_hot = (time.perf_counter() - t0) / n
+        t0 = time.perf_counter()
+        tel._flush()
+        t_flush = (time.perf_counter() - t0) / n
+        run = Run(tel.dir)
+        t0 = time.perf_counter()
+        s = summarize(run)
+        t_query = (time.perf_counter() - t0) / n
+        run.close()
+        size = sum(os.path.getsize(os.path.join(dp, f))
+                   for dp, _, fs in os.walk(tel.dir) for f in fs)
+    print(f"packet()   : {t_hot * 1e9:6.0f} ns per packet (control loop side)")
+    print(f"writer     : {t_flush * 1e9:6.0f} ns per packet (background thread)")
+    print(f"summarize  : {t_query * 1e9:6.0f} ns per packet ({s['packets']} packets)")
+    print(f"on disk    : {size / n:6.1f} bytes per packet")
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Query recorded telemetry")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    q = sub.add_parser("query", help="summaries of a run")
+    q.add_argument("dir", help="run directory, or the --telemetry directory (newest run)")
+    q.add_argument("--from", dest="t_from", type=float, help="seconds after the start")
+    q.add_argument("--to", dest="t_to", type=float, help="seconds after the start")
+    q.add_argument("--json", action="store_true", help="print JSON")
+    sub.add_parser("bench", help="recording and query cost")
+    args = ap.parse_args()
+    if args.cmd == "bench":
+        _bench()
+    else:
+        run = Run(args.dir)
+        s = summarize(run, args.t_from, args.t_to)
+        if args.json:
+            print(json.dumps(s, indent=1))
+        else:
+            print(f"[Telemetry] {run.dir}  {len(run.index['segments'])} segments")
+            w0, w1 = s["window_s"]
+            print(f"window    : {w0} – {w1} s, {s['packets']} packets"
+                  + (f" ({s['packet_rate']:.1f}/s)" if s["packet_rate"] else ""))
+            print(f"throttle  : {s['wiper_writes']} wiper writes")
+            top = max(s["throttle_hist"].values(), default=0)
+            for b, n in s["throttle_hist"].items():
+                print(f"  {b:>8s} {n:7d} {'#' * (40 * n // top if top else 0)}")
+            rate = s["steering_cmd_rate"]
+            print(f"steering  : {s['steering_commands']} commands"
+                  + (f" ({rate:.2f}/s)" if rate is not None else "")
+                  + f", pulses {s['steering_pulses']}")
+            print(f"e-stop    : {s['estop_trips']} trips")
+        run.close()
@@ -0,0 +1,25 @@
+"""
+Shared fixtures for the hardware-free regression tests:
+
+    python3 -m pytest AutoKartCode/tests
+
+The controller modules are flat scripts, so their directory goes on the
+path; SPI is sim.py's `FakeSpiDev` and GPIO the in-memory `MockBackend`,
+as in benchmarks.py.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def backend():
+    """A fresh `gpio_backend.MockBackend`, with SPI faked before the drivers load."""
+    import gpio_backend
+    import sim
+    if "throttle" not in sys.modules:
+        sim.install_spidev()
+    return gpio_backend.MockBackend()
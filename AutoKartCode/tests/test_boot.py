@@ -0,0 +1,23 @@
+import time
+
+from boot import Boot
+
+
+def test_summary_counts_power_on_from_the_boot_origin():
+    boot = Boot()
+    boot.t_boot = boot.t0 - 30.0                         # powered on 30 s before the process
+    boot.t_ready = boot.t0 + 0.25
+    assert boot.summary().endswith("250 ms after process start, 30.2 s after power-on")
+
+
+def test_summary_omits_power_on_without_an_origin():
+    boot = Boot()
+    boot.t_boot = None
+    boot.ready()
+    assert "power-on" not in boot.summary()
+
+
+def test_boot_origin_precedes_process_start():
+    boot = Boot()
+    if boot.t_boot is not None:
+        assert boot.t_boot <= boot.t0 <= time.monotonic()
@@ -0,0 +1,55 @@
+import time
+
+import pytest
+
+from brake import EXTENDED, EXTENDING, RETRACTED, RETRACTING, Brake
+
+FWD, REV = 16, 17
+STROKE = 0.2                     # s, full stroke for the tests
+
+
+@pytest.fixture
+def brake(backend):
+    br = Brake(backend=backend)
+    br.EXTEND_STROKE = br.RETRACT_STROKE = STROKE
+    yield br
+    br.close()
+
+
+def edges(backend, pin):
+    return [e.level for e in backend.edges if e.pin == pin]
+
+
+def test_apply_and_release_are_idempotent(backend, brake):
+    brake.release()                                  # already retracted
+    assert brake.state == RETRACTED and edges(backend, REV) == []
+
+    brake.apply()
+    t0 = brake._motion.t0
+    time.sleep(0.02)
+    brake.apply()                                    # already applying
+    assert brake.state == EXTENDING and brake._motion.t0 == t0
+    assert edges(backend, FWD) == [1]
+
+    assert brake.wait(2 * STROKE)
+    assert brake.state == EXTENDED and brake.position == 1.0
+    brake.apply()                                    # already applied
+    assert brake.state == EXTENDED and edges(backend, FWD) == [1, 0]
+
+
+def test_interrupted_apply_reverses_from_where_it_got(backend, brake):
+    brake.apply()
+    time.sleep(STROKE / 2)
+    brake.release()
+    assert brake.state == RETRACTING
+    assert backend.level(FWD) == 0 and backend.level(REV) == 1
+    assert 0.3 < brake._motion.pos0 < 0.7            # settled mid-stroke, not at an end
+
+    assert brake.wait(2 * STROKE)
+    assert brake.state == RETRACTED and brake.position == 0.0
+    assert backend.level(FWD) == backend.level(REV) == 0
+    # the lines were never driven together
+    on = set()
+    for e in backend.edges:
+        (on.add if e.level else on.discard)(e.pin)
+        assert on != {FWD, REV}
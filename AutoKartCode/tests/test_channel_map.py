@@ -0,0 +1,89 @@
+import copy
+import random
+
+import pytest
+
+from channel_map import DEFAULT_PROFILE, PACKET_OUTPUTS, ChannelMap
+from conditioning import Conditioner
+from packets import convert_packet
+
+NEUTRAL = [992, 992, 1809, 1809, 1809, 1809]
+
+
+@pytest.fixture(scope="module")
+def cmap():
+    return ChannelMap.default(PACKET_OUTPUTS)
+
+
+def test_default_matches_convert_packet_per_channel(cmap):
+    for ch in range(6):
+        for x in range(-50, 2100):
+            v = list(NEUTRAL)
+            v[ch] = x
+            assert cmap(v) == convert_packet(v), (ch, x)
+
+
+def test_default_matches_convert_packet_random(cmap):
+    rnd = random.Random(2)
+    for _ in range(20_000):
+        v = [rnd.randint(0, 2047) for _ in range(6)]
+        assert cmap(v) == convert_packet(v), v
+
+
+def test_map_batch(cmap):
+    frames = NEUTRAL + [1400, 500, 992, 172, 1809, 172]
+    assert cmap.map_batch(frames, 2) == [convert_packet(NEUTRAL),
+                                         convert_packet(frames[6:])]
+
+
+@pytest.mark.parametrize("change, message", [
+    (lambda o: o[0].update({"in": [992, 992]}), "input range"),
+    (lambda o: o[1].update({"transform": "spline"}), "unknown transform"),
+    (lambda o: o[2].update({"source": 9}), "out of range"),
+])
+def test_bad_profiles(change, message):
+    profile = copy.deepcopy(DEFAULT_PROFILE)
+    change(profile["outputs"])
+    with pytest.raises(ValueError, match=message):
+        ChannelMap(profile)
+
+
+def test_conditioner_leaves_estop_channels_alone():
+    cond = Conditioner(order=PACKET_OUTPUTS)
+    for _ in range(5):
+        cond(NEUTRAL)
+    assert cond([992, 992, 1809, 172, 1809, 1809])[3] == 1      # no filter delay
+
+
+def settled(cond=None):
+    cond = cond or Conditioner(order=PACKET_OUTPUTS)
+    for _ in range(5):
+        cond(NEUTRAL)
+    return cond
+
+
+def test_conditioner_rejects_a_single_frame_spike():
+    cond = settled()
+    assert cond([1809, 992, 1809, 1809, 1809, 1809])[0] == 0    # lone full throttle
+    assert cond(NEUTRAL)[0] == 0
+    assert cond.rejected[0] == 1
+
+
+def test_conditioner_tracks_a_fast_sweep():
+    cond = settled()
+    out = [cond([992 + 250 * i, 992, 1809, 1809, 1809, 1809])[0] for i in range(1, 4)]
+    assert out[0] == 0                                          # first frame confirmed
+    assert out[1:] == [ChannelMap.default(PACKET_OUTPUTS)([992 + 250 * i] + NEUTRAL[1:])[0]
+                       for i in (2, 3)]
+    assert cond.rejected[0] == 1
+
+
+def test_conditioner_passes_brake_apply_at_once_and_confirms_release():
+    cond = settled()
+    applied = [992, 992, 172, 1809, 1809, 1809]
+    assert cond(applied)[2] == 1                                # no frame of delay
+    assert cond(applied)[2] == 1
+    assert cond(NEUTRAL)[2] == 1                                # lone release: held
+    assert cond(applied)[2] == 1
+    assert cond(NEUTRAL)[2] == 1
+    assert cond(NEUTRAL)[2] == 0                                # confirmed
@@ -0,0 +1,61 @@
+import os
+import time
+
+import pytest
+
+from command_link import CommandListener, encode
+
+MAX_AGE = 0.05
+
+
+@pytest.fixture
+def link():
+    changes = []
+    rx = CommandListener(f"/tmp/autokart-cmd-test-{os.getpid()}.sock", max_age=MAX_AGE,
+                         on_change=lambda: changes.append(rx.latest()))
+    yield rx, changes
+    rx.close()
+
+
+def send(rx, seq, throttle, t_sent=None):
+    rx._accept(encode(seq, throttle, 0, 0, t_sent), time.monotonic())
+
+
+def test_command_expires_once(link):
+    rx, changes = link
+    send(rx, 1, 100)
+    assert rx.latest().throttle == 100
+    time.sleep(max(0.0, rx.expiry() - time.monotonic()))
+    rx.check()
+    rx.check()                                           # reported once
+    assert rx.latest() is None and rx.expired == 1
+    assert changes == [None] and rx.expiry() is None
+
+
+def test_command_already_stale_on_arrival_is_dropped(link):
+    rx, _ = link
+    send(rx, 1, 100, t_sent=time.monotonic() - 2 * MAX_AGE)
+    assert rx.latest() is None and rx.stale == 1 and rx.expiry() is None
+
+
+def test_restarted_publisher_is_taken_once_the_old_command_expires(link):
+    rx, _ = link
+    send(rx, 500, 100)
+    send(rx, 1, 40)                                      # restart while 500 is fresh
+    assert rx.latest().seq == 500 and rx.out_of_order == 1
+    time.sleep(1.2 * MAX_AGE)
+    send(rx, 1, 40)
+    assert rx.latest().seq == 1 and rx.latest().throttle == 40
+
+
+def test_drain_reads_the_socket_and_reports_changes(link):
+    import socket
+    rx, changes = link
+    tx = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    for seq in (1, 2, 3):
+        tx.sendto(encode(seq, seq * 10, 0, 0), rx.path)
+    tx.sendto(b"junk", rx.path)
+    tx.close()
+    rx.drain()
+    assert rx.received == 3 and rx.malformed == 1
+    assert len(changes) == 1 and changes[0].seq == 3
@@ -0,0 +1,63 @@
+import time
+
+import pytest
+
+from links import REASON_FAILBACK, REASON_STALE, Link, LinkArbiter
+from packets import FrameDecoder, encode_frame
+
+NEUTRAL = (992, 992, 1809, 1809, 1809, 1809)
+STALE, FAILBACK, PERIOD = 0.3, 1.0, 0.02
+
+
+@pytest.fixture
+def arb():
+    links = [Link("uart", dec=FrameDecoder()), Link("radio", dec=FrameDecoder())]
+    arb = LinkArbiter(links, lambda dec, t: None, stale=STALE, failback=FAILBACK)
+    arb.t0 = time.monotonic()
+    arb.seq = 0
+    return arb
+
+
+def feed(arb, names, t_from, t_to):
+    """Both named links deliver a frame every PERIOD over [t_from, t_to) s."""
+    n = 0
+    while t_from + n * PERIOD < t_to - 1e-9:
+        t = arb.t0 + t_from + n * PERIOD
+        for link in arb.links:
+            if link.name in names:
+                arb.seq += 1
+                arb.receive(link, encode_frame(arb.seq, NEUTRAL), t)
+        n += 1
+
+
+def test_fails_over_when_stale_and_back_only_after_failback(arb):
+    feed(arb, ("uart", "radio"), 0.0, 0.5)
+    assert arb.active.name == "uart"
+    feed(arb, ("radio",), 0.5, 0.5 + STALE - PERIOD)            # uart quiet, not stale yet
+    assert arb.active.name == "uart"
+    feed(arb, ("radio",), 0.5 + STALE - PERIOD, 1.0)
+    assert arb.active.name == "radio"
+    assert arb.failovers[-1].reason == REASON_STALE
+
+    feed(arb, ("uart", "radio"), 1.0, 1.0 + FAILBACK - PERIOD)  # back, but not for long enough
+    assert arb.active.name == "radio"
+    feed(arb, ("uart", "radio"), 1.0 + FAILBACK - PERIOD, 1.0 + FAILBACK + 2 * PERIOD)
+    assert arb.active.name == "uart"
+    assert [f.reason for f in arb.failovers] == [REASON_STALE, REASON_FAILBACK]
+
+
+def test_flapping_primary_restarts_the_failback_clock(arb):
+    feed(arb, ("uart", "radio"), 0.0, 0.2)
+    feed(arb, ("radio",), 0.2, 0.8)                             # uart lost → radio
+    assert arb.active.name == "radio"
+    feed(arb, ("uart", "radio"), 0.8, 1.5)                      # uart back 0.7 s …
+    feed(arb, ("radio",), 1.5, 1.5 + STALE + PERIOD)            # … drops out again …
+    feed(arb, ("uart", "radio"), 1.5 + STALE + PERIOD, 2.6)     # … back 0.76 s: not enough
+    assert arb.active.name == "radio" and len(arb.failovers) == 1
+    feed(arb, ("uart", "radio"), 2.6, 3.0)
+    assert arb.active.name == "uart" and arb.failovers[-1].reason == REASON_FAILBACK
+
+
+def test_healthy_backup_does_not_take_over_a_healthy_primary(arb):
+    feed(arb, ("uart", "radio"), 0.0, 2 * FAILBACK)
+    assert arb.active.name == "uart" and not arb.failovers
@@ -0,0 +1,91 @@
+from packets import (MAX_VALUE, AutoDecoder, FrameDecoder, PacketDecoder, convert_packet,
+                     encode_frame, parse_packet)
+
+NEUTRAL = (992, 992, 1809, 1809, 1809, 1809)
+
+
+def csv(*frames):
+    return b"".join(b",".join(b"%d" % v for v in f) + b"\n" for f in frames)
+
+
+def test_parse_packet():
+    assert parse_packet("1809,992,1809,1809,1809,1809") == [1809, 992, 1809, 1809, 1809, 1809]
+    assert parse_packet("1809,992,1809") is None
+    assert parse_packet("1809,x,1809,1809,1809,1809") is None
+
+
+def test_convert_packet():
+    assert convert_packet([1809, 992, 1809, 1809, 1809, 1809]) == [255, 0, 0, 0, 0, 0]
+    assert convert_packet([992, 1500, 172, 172, 1809, 172]) == [0, 1, 1, 1, 0, 1]
+    assert convert_packet([1400, 500, 992, 1809, 1000, 992]) == [127, -1, 1, 0, 1, 0]
+
+
+def test_csv_batch_and_partial_line():
+    dec = PacketDecoder()
+    data = csv(NEUTRAL, (1400, 992, 1809, 1809, 1809, 1809), (1809, 1000, 172, 1809, 1809, 172))
+    assert dec.feed(data[:-7]) == 2
+    assert dec.latest() == (1400, 992, 1809, 1809, 1809, 1809)
+    assert dec.feed(data[-7:]) == 1
+    assert dec.latest() == (1809, 1000, 172, 1809, 1809, 172)
+    assert dec.stats()["frames"] == 3 and dec.malformed == 0
+
+
+def test_csv_malformed_lines_are_counted_and_skipped():
+    dec = PacketDecoder()
+    bad = [b"992,992,1809\n",                          # too few fields
+           b"992,x,1809,1809,1809,1809\n",             # not a number
+           b"992,992,180918091809,1809\n",             # commas lost: huge field
+           b"992,992,-5,1809,1809,1809\n",             # below 0
+           b"992,992,%d,1809,1809,1809\n" % (MAX_VALUE + 1)]
+    assert dec.feed(b"".join(bad) + csv(NEUTRAL)) == 1
+    assert dec.latest() == NEUTRAL
+    assert dec.malformed == len(bad)
+
+
+def test_csv_overlong_garbage():
+    dec = PacketDecoder()
+    assert dec.feed(b"9" * 200) == 0
+    assert dec.malformed == 1
+    assert dec.feed(csv(NEUTRAL)) == 1
+
+
+def test_binary_frames():
+    dec = FrameDecoder()
+    frames = [encode_frame(i, (992 + i, 992, 1809, 1809, 1809, 1809)) for i in range(5)]
+    assert dec.feed(b"".join(frames)) == 5
+    assert dec.latest()[0] == 996
+    assert dec.seq_gaps == 0 and dec.crc_errors == 0
+
+
+def test_binary_crc_and_sequence_gap():
+    dec = FrameDecoder()
+    good = encode_frame(1, NEUTRAL)
+    corrupt = bytearray(encode_frame(2, NEUTRAL))
+    corrupt[5] ^= 0xFF
+    assert dec.feed(good + bytes(corrupt) + encode_frame(3, NEUTRAL)) == 2
+    assert dec.crc_errors == 1
+    assert dec.seq_gaps == 1 and dec.lost == 1
+
+
+def test_binary_out_of_range_frame_dropped():
+    dec = FrameDecoder()
+    data = (encode_frame(1, NEUTRAL) + encode_frame(2, (992, 992, 4000, 1809, 1809, 1809))
+            + encode_frame(3, NEUTRAL))
+    assert dec.feed(data) == 2
+    assert dec.malformed == 1 and dec.seq_gaps == 0
+
+
+def test_auto_detects_either_format():
+    dec = AutoDecoder()
+    assert dec.feed(csv(NEUTRAL, NEUTRAL)) == 2
+    assert dec.format == "csv"
+    dec = AutoDecoder()
+    assert dec.feed(encode_frame(1, NEUTRAL) + encode_frame(2, NEUTRAL)) == 2
+    assert dec.format == "binary"
+
+
+def test_csv_short_and_long_line_do_not_realign():
+    dec = PacketDecoder()
+    assert dec.feed(b"1,2,3,4,5\n6,7,8,9,10,11,12\n") == 0
+    assert dec.malformed == 2
+    assert dec.feed(csv(NEUTRAL)) == 1 and dec.latest() == NEUTRAL
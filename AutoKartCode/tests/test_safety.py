@@ -0,0 +1,215 @@
+import time
+
+import pytest
+
+from estop import CAUSE_LINK, CAUSE_SWITCH, ESTOPPED, RECOVERING, RUN, EstopMachine
+from snapshot import VersionedState
+from watchdog import FAILSAFE, HOLD, OK, ZERO, LinkWatchdog
+
+ENABLE, BRAKE_FWD, JOG_NEG, JOG_POS = 24, 16, 26, 22
+NEUTRAL = ((992, 992, 1809, 1809, 1809, 1809), (0, 0, 0, 0, 0, 0))
+
+
+# ---------------------------------------------------------------------------
+# Link watchdog on mock GPIO
+# ---------------------------------------------------------------------------
+@pytest.fixture
+def actuators(backend):
+    from brake import Brake
+    from steering import Steering
+    from throttle import Throttle
+    th = Throttle(backend=backend)
+    st = Steering(backend=backend)
+    br = Brake(backend=backend)
+    th.enable_output(True)
+    yield th, st, br
+    for dev in (br, st, th):
+        dev.close()
+
+
+def received(state, age):
+    state.publish(*NEUTRAL, t_rx=time.monotonic() - age)
+
+
+def test_watchdog_escalates_and_recovers(backend, actuators):
+    state = VersionedState(*NEUTRAL)
+    wd = LinkWatchdog(state, hold=0.35, zero=0.6, brake=1.0)
+    wd.start(*actuators, thread=False)
+
+    received(state, 0.0)
+    wd.poll()
+    assert wd.level == OK and backend.level(ENABLE) == 1
+
+    received(state, 0.4)
+    wd.poll()
+    assert wd.level == HOLD and backend.level(ENABLE) == 1
+
+    received(state, 0.7)
+    wd.poll()
+    assert wd.level == ZERO and backend.level(ENABLE) == 1
+
+    actuators[1].set_direction(1)                        # mid-jog when it trips
+    assert backend.level(JOG_NEG) or backend.level(JOG_POS)
+    received(state, 1.1)
+    wd.poll()
+    assert wd.level == FAILSAFE
+    assert backend.level(ENABLE) == 0
+    assert backend.level(BRAKE_FWD) == 1                 # brake extending
+    assert backend.level(JOG_NEG) == backend.level(JOG_POS) == 0
+    assert wd.trips == 1 and len(wd.reaction) == 1
+
+    received(state, 0.0)
+    wd.poll()
+    assert wd.level == OK and wd.trips == 1
+
+
+def test_watchdog_next_deadline():
+    state = VersionedState(*NEUTRAL)
+    wd = LinkWatchdog(state, hold=0.35, zero=0.6, brake=1.0)
+    wd.start(None, None, None, thread=False)
+    t_rx = time.monotonic()
+    state.publish(*NEUTRAL, t_rx=t_rx)
+    assert wd.poll() == pytest.approx(t_rx + 0.35)
+
+
+def test_watchdog_steps_through_each_level_in_order(backend, actuators):
+    th, st, br = actuators
+    state = VersionedState(*NEUTRAL)
+    seen = []
+    wd = LinkWatchdog(state, hold=0.35, zero=0.6, brake=1.0,
+                      on_change=lambda: seen.append(wd.level))
+    wd.start(*actuators, thread=False)
+    th.set_wiper(120)
+
+    t_rx = time.monotonic() - 0.36
+    state.publish(*NEUTRAL, t_rx=t_rx)
+    assert wd.poll() == pytest.approx(t_rx + 0.6)        # next: ZERO
+    assert th.spi.wiper == 120                           # HOLD keeps the command
+
+    received(state, 0.61)
+    wd.poll()
+    assert th.spi.wiper == 0 and backend.level(ENABLE) == 1
+
+    received(state, 1.01)
+    wd.poll()
+    assert seen == [HOLD, ZERO, FAILSAFE]
+    low = [e.t for e in backend.edges if e.pin == ENABLE and not e.level]
+    brake = [e.t for e in backend.edges if e.pin == BRAKE_FWD and e.level]
+    assert low[-1] <= brake[-1]                          # enable drops first
+
+
+def test_watchdog_recovers_from_hold_without_acting(backend, actuators):
+    th, st, br = actuators
+    state = VersionedState(*NEUTRAL)
+    wd = LinkWatchdog(state, hold=0.35, zero=0.6, brake=1.0)
+    wd.start(*actuators, thread=False)
+    th.set_wiper(120)
+    received(state, 0.4)
+    wd.poll()
+    received(state, 0.0)
+    wd.poll()
+    assert wd.level == OK and wd.trips == 0
+    assert th.spi.wiper == 120 and backend.level(BRAKE_FWD) == 0
+
+
+def test_watchdog_trips_again_after_recovering(backend, actuators):
+    state = VersionedState(*NEUTRAL)
+    wd = LinkWatchdog(state, hold=0.35, zero=0.6, brake=1.0)
+    wd.start(*actuators, thread=False)
+    for _ in range(2):
+        received(state, 1.1)                             # straight past every deadline
+        wd.poll()
+        assert wd.level == FAILSAFE
+        received(state, 0.0)
+        wd.poll()
+        assert wd.level == OK
+    assert wd.trips == 2 and len(wd.reaction) == 2
+
+
+# ---------------------------------------------------------------------------
+# E-stop state machine
+# ---------------------------------------------------------------------------
+@pytest.fixture
+def machine():
+    calls = []
+    m = EstopMachine(enter=lambda cause: calls.append(("enter", cause)),
+                     hold=lambda: calls.append(("hold",)),
+                     release=lambda: calls.append(("release",)),
+                     clear_hold=0.25, reassert=0.5)
+    return m, calls
+
+
+def test_estop_acts_on_transitions_only(machine):
+    m, calls = machine
+    t = time.monotonic()
+    for i in range(10):                                  # held for 90 ms: one entry
+        m.step(CAUSE_SWITCH, now=t + i * 0.01)
+    assert m.state == ESTOPPED and calls == [("enter", CAUSE_SWITCH)]
+    assert m.trips == 1
+
+
+def test_estop_needs_clear_hold_before_release(machine):
+    m, calls = machine
+    t = time.monotonic()
+    m.step(CAUSE_LINK, now=t)
+    assert m.step(None, now=t + 0.1) == RECOVERING
+    assert m.step(None, now=t + 0.2) == RECOVERING       # 0.1 s clear: not yet
+    assert ("release",) not in calls
+    assert m.step(None, now=t + 0.36) == RUN
+    assert calls[-1] == ("release",)
+
+
+def test_estop_bounce_while_recovering_does_not_reenter(machine):
+    m, calls = machine
+    t = time.monotonic()
+    m.step(CAUSE_SWITCH, now=t)
+    m.step(None, now=t + 0.1)
+    assert m.step(CAUSE_SWITCH, now=t + 0.15) == ESTOPPED
+    assert calls == [("enter", CAUSE_SWITCH)] and m.trips == 1
+
+
+def test_estop_clear_hold_restarts_after_a_bounce(machine):
+    m, calls = machine
+    t = time.monotonic()
+    m.step(CAUSE_SWITCH, now=t)
+    m.step(None, now=t + 0.1)
+    m.step(CAUSE_SWITCH, now=t + 0.3)                    # back before the hold ran out
+    m.step(None, now=t + 0.31)
+    assert m.step(None, now=t + 0.45) == RECOVERING      # 0.25 s since t + 0.1, not since t + 0.31
+    assert m.step(None, now=t + 0.57) == RUN
+    assert calls.count(("release",)) == 1 and m.trips == 1
+
+def test_estop_reasserts_while_latched(machine):
+    m, calls = machine
+    t = time.monotonic()
+    m.step(CAUSE_SWITCH, now=t)
+    m.step(CAUSE_SWITCH, now=t + 0.3)
+    m.step(CAUSE_SWITCH, now=t + 0.6)
+    assert calls.count(("hold",)) == 1 and m.reasserts == 1
+
+
+def test_steering_disable_wins_race_with_commands(backend):
+    import threading
+    from steering import Steering
+    st = Steering(backend=backend)
+    stop = threading.Event()
+
+    def hammer():
+        d = 1
+        while not stop.is_set():
+            st.set_direction(d)
+            st.set_effort(0.9 * d)
+            d = -d
+
+    t = threading.Thread(target=hammer)
+    t.start()
+    try:
+        time.sleep(0.02)
+        st.disable()
+        for _ in range(20):                  # no command starts a jog afterwards
+            assert backend.level(JOG_NEG) == backend.level(JOG_POS) == 0
+            time.sleep(0.002)
+    finally:
+        stop.set()
+        t.join()
+        st.close()
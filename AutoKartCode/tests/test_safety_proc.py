@@ -0,0 +1,51 @@
+import time
+
+import pytest
+
+import gpio_backend
+from safety_proc import CLEAR, ESTOP, SupervisorLink
+
+NEUTRAL = ((992, 992, 1809, 1809, 1809, 1809), (0, 0, 1, 0, 0, 0))
+SWITCH = ((992, 992, 1809, 172, 1809, 1809), (0, 0, 1, 1, 0, 0))
+CLEAR_HOLD = 0.2
+
+
+@pytest.fixture(params=("thread", "process"))
+def link(request, backend, monkeypatch):
+    monkeypatch.setattr(gpio_backend, "_backend", backend)      # thread mode's pin
+    link = SupervisorLink(deadline=1.0, poll=0.002, mode=request.param, mock=True,
+                          clear_hold=CLEAR_HOLD, reassert=0.05)
+    link.publish(*NEUTRAL, time.monotonic())
+    assert link.start()
+    link.arm()
+    yield link
+    link.close()
+    link.release()
+
+
+def feed(link, frame, seconds):
+    """Publish *frame* at 200 Hz for *seconds*; the pin level at the end."""
+    t_end = time.monotonic() + seconds
+    while time.monotonic() < t_end:
+        link.publish(*frame, time.monotonic())
+        time.sleep(0.005)
+    return link.status()["level"]
+
+
+def test_supervisor_holds_the_clear_before_re_enabling(link):
+    assert feed(link, NEUTRAL, 0.05) == 1
+    assert feed(link, SWITCH, 0.05) == 0
+    assert feed(link, NEUTRAL, CLEAR_HOLD / 2) == 0       # cause gone, not for long enough
+    assert [a for a, _ in link.commands()] == [ESTOP]
+    assert feed(link, NEUTRAL, CLEAR_HOLD) == 1
+    assert [a for a, _ in link.commands()] == [CLEAR]
+
+
+def test_supervisor_bounce_while_recovering_stays_latched(link):
+    feed(link, NEUTRAL, 0.05)
+    feed(link, SWITCH, 0.05)
+    for _ in range(3):                                     # bounces shorter than the hold
+        assert feed(link, NEUTRAL, CLEAR_HOLD / 3) == 0
+        assert feed(link, SWITCH, 0.02) == 0
+    assert link.status()["trips"] == 1
+    assert [a for a, _ in link.commands()] == [ESTOP]
@@ -0,0 +1,46 @@
+import time
+
+import pytest
+
+from telemetry import Run, Telemetry
+
+
+@pytest.fixture
+def tele(tmp_path):
+    tel = Telemetry(str(tmp_path), raw=6, mapped=("throttle", "steering"))
+    yield tel
+    tel.close()
+
+
+def rows(tel, *names):
+    run = Run(tel.dir)
+    try:
+        segs = list(run.columns("packet", names))
+        return {n: [v for s in segs for v in s[n].tolist()] for n in ("t", *names)}
+    finally:
+        run.close()
+
+
+def test_out_of_range_values_are_clamped_to_the_column(tele):
+    t = time.monotonic()
+    tele.packet(t, 2 ** 32 + 5, [70000, -5, 992, 1809, 1809, 1809], [40000, -40000])
+    tele.packet(t + 0.01, 6, [992] * 6, [128, 0])
+    tele._safe_flush()
+    got = rows(tele, "seq", "raw0", "raw1", "throttle", "steering")
+    assert got["seq"] == [5, 6]
+    assert got["raw0"] == [0xFFFF, 992] and got["raw1"] == [0, 992]
+    assert got["throttle"] == [0x7FFF, 128] and got["steering"] == [-0x8000, 0]
+    assert tele.errors == 0 and tele.packets == 2
+
+
+def test_short_packet_is_dropped_and_columns_stay_in_step(tele):
+    t = time.monotonic()
+    tele.packet(t, 1, [992] * 6, [1, 0])
+    tele.packet(t + 0.01, 2, [992] * 4, [1, 0])              # short raw
+    tele.packet(t + 0.02, 3, [992] * 6, [1])                 # short mapped
+    tele.packet(t + 0.03, 4, [992] * 6, [2, 0])
+    tele._safe_flush()
+    got = rows(tele, "seq", "raw5", "throttle")
+    assert got["seq"] == [1, 4] and got["throttle"] == [1, 2]
+    assert len(got["t"]) == len(got["raw5"]) == 2
+    assert tele.dropped == 2 and tele.errors == 0
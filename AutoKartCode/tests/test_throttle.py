@@ -0,0 +1,70 @@
+import asyncio
+import time
+
+import pytest
+
+import sim
+
+WIPER0_WRITE = 0x00
+
+
+class DroppingSpi(sim.FakeSpiDev):
+    """Loses one wiper write after *after* good ones, so its readback fails."""
+
+    def __init__(self, after=0):
+        super().__init__()
+        self.after = after
+        self.drop = 1
+
+    def xfer2(self, data):
+        if data[0] == WIPER0_WRITE and self.drop and len(self.writes) >= self.after:
+            self.drop = 0
+            self.transfers += 1
+            return [0xFF] * len(data)
+        return super().xfer2(data)
+
+
+@pytest.fixture
+def throttle(backend):
+    from throttle import Throttle
+    th = Throttle(backend=backend)
+    th.spi = DroppingSpi()
+    return th
+
+
+def test_failed_readback_is_sent_again(throttle):
+    from throttle import ThrottleOutput
+    out = ThrottleOutput(throttle, verify=True)        # no refresh, no slew
+    out.set_wiper(100)
+    time.sleep(5 * out.RETRY)
+    assert throttle.spi.wiper == 100
+    assert out.verify_failures == 1 and out.written == 2
+    out.close()
+
+
+def test_failed_readback_keeps_the_ramp_origin(throttle):
+    from throttle import ThrottleOutput
+    throttle.spi.after = 2                            # fail mid-ramp
+    out = ThrottleOutput(throttle, verify=True, slew=2000)
+    out.set_wiper(120)
+    deadline = time.monotonic() + 1.0
+    while throttle.spi.wiper != 120 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    values = [v for _, v in throttle.spi.writes]
+    out.close()
+    assert values[-1] == 120 and out.verify_failures == 1
+    assert values == sorted(values)                   # never restarted from idle
+
+
+def test_loop_output_resends_a_failed_readback(throttle):
+    from aio_runtime import LoopThrottleOutput
+
+    async def run():
+        out = LoopThrottleOutput(throttle, asyncio.get_running_loop(), verify=True)
+        out.set_wiper(100)
+        await asyncio.sleep(5 * out.RETRY)
+        return out
+
+    out = asyncio.run(run())
+    assert throttle.spi.wiper == 100
+    assert out.verify_failures == 1 and out.written == 2
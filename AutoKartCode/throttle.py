@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 """
-throttle.py – MCP4162 digital-potentiometer driver (uses gpiozero)
+throttle.py – MCP4162 digital-potentiometer driver (GPIO through gpio_backend)
 
 Wiring (BCM numbering)
 ────────────────────────────────────────────────────────────
@@ -8,17 +8,31 @@ MCP4162   →  Pi 5
 ────────────────────────────────────────────────────────────
 SCLK      →  GPIO 11  (SPI0 SCLK)
 MOSI      →  GPIO 10  (SPI0 MOSI)
-MISO      →  —        (not used for simple writes)
+MISO      →  —        (only needed for ThrottleOutput(verify=True))
 CS (̅SS̅)   →  GPIO 27  (any free GPIO, active-low)
 EN (OE)   →  GPIO 24  (active-high enable for your H-bridge / ESC / etc.)
 VSS/GND   →  Pi GND
 VDD       →  3V3
 ────────────────────────────────────────────────────────────
+
+`ThrottleOutput` sits in front of a `Throttle` for the control loops: callers
+queue values without blocking, a writer thread sends only the newest one and
+skips it if the wiper already holds that value, and an optional refresh
+re-sends the last value periodically in case the wiper glitched.  With a
+`SlewLimiter` it ramps a rising wiper at a fixed rate instead of stepping;
+a falling one (lift-off, disable, e-stop) is written at once.
 """
 
+import threading
 import time
 import spidev
-from gpiozero import DigitalOutputDevice
+import gpio_backend
+from eventlog import log, SRC_THROTTLE, EV_WIPER, EV_THR_DISABLE
+from latency import TRACER
+
+WIPER0_WRITE = 0x00     # write volatile wiper 0
+WIPER0_READ = 0x0C      # read  volatile wiper 0 (addr 0, cmd 0b11)
+
 
 class Throttle:
     """
@@ -43,16 +57,24 @@ class Throttle:
         cs_pin: int = 27,
         en_pin: int = 24,
         spi_hz: int = 1_000_000,
+        enable=None,
+        backend=None,
     ):
+        """*enable*: an output to use instead of opening *en_pin* (e.g. the
+        `safety_proc.RemoteEnable` when another process owns GPIO 24);
+        *backend*: a `gpio_backend` backend instead of the process default."""
         # SPI setup
         self.spi = spidev.SpiDev()
         self.spi.open(spi_bus, spi_device)
         self.spi.mode = 0b00
         self.spi.max_speed_hz = spi_hz
 
-        # GPIO (gpiozero)
-        self.cs = DigitalOutputDevice(cs_pin, active_high=False, initial_value=True)
-        self.enable = DigitalOutputDevice(en_pin, active_high=True, initial_value=False)
+        # GPIO – CS is active-low
+        pins = dict(cs=cs_pin) if enable else dict(cs=cs_pin, enable=en_pin)
+        self._io = (backend or gpio_backend.default()).claim(
+            "throttle", pins, active_low=("cs",), initial=dict(cs=1))
+        self.cs = self._io.line("cs")
+        self.enable = enable or self._io.line("enable")
 
     # ------------------------------------------------------------------
     # Public helpers
@@ -67,15 +89,24 @@ class Throttle:
     def set_wiper(self, value: int) -> None:
         """Write an 8-bit value to the wiper (clamped 0-255)."""
         value = max(0, min(255, int(value)))
-        cmd = [0x00, value]  # 0x00 = Write P0 volatile register
+        cmd = [WIPER0_WRITE, value]
         self.cs.on()               # CS active (low)
         self.spi.xfer2(cmd)
         self.cs.off()              # CS inactive (high)
-        print(f"[Throttle] Wiper set to {value}")
+        if TRACER.enabled:
+            TRACER.write("throttle")
+        log(SRC_THROTTLE, EV_WIPER, value)
+
+    def read_wiper(self) -> int:
+        """Read the volatile wiper back over MISO (9-bit value)."""
+        self.cs.on()
+        resp = self.spi.xfer2([WIPER0_READ, 0x00])
+        self.cs.off()
+        return ((resp[0] & 0x01) << 8) | resp[1]
 
     def disable(self) -> None:
         """Disable throttle safely by turning off output and zeroing the wiper."""
-        print("[Throttle] Disabling throttle")
+        log(SRC_THROTTLE, EV_THR_DISABLE)
         self.set_wiper(0)
         self.enable_output(False)
 
@@ -88,8 +119,8 @@ class Throttle:
             self.disable()
             self.cs.off()
         finally:
-            self.cs.close()
-            self.enable.close()
+            self._io.close()
+            self.enable.close()        # a stand-in's; ours went with the group
             self.spi.close()
 
     def __enter__(self):
@@ -99,6 +130,162 @@ class Throttle:
     def __exit__(self, exc_type, exc_value, traceback):
         self.close()
 
+
+class SlewLimiter:
+    """Lets the wiper rise by at most *rate* counts per second."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tick = max(0.01, 1.0 / rate)      # ramp step period, ≥ 1 count per step
+        self._t = None
+
+        # statistics
+        self.limited = 0                       # writes held below their target
+
+    def next(self, target: int, last) -> int:
+        """The value to write now on the way from *last* to *target*."""
+        now = time.monotonic()
+        last = 0 if last is None else last     # unknown wiper: ramp from idle
+        if target <= last:
+            self._t = now
+            return target
+        dt = self.tick if self._t is None else min(now - self._t, self.tick)
+        self._t = now
+        step = max(1, int(self.rate * dt))
+        if target - last > step:
+            self.limited += 1
+            return last + step
+        return target
+
+
+class ThrottleOutput:
+    """
+    Non-blocking, write-coalescing output stage for a `Throttle`.
+
+    Offers the same `set_wiper` / `disable` / `enable` surface as `Throttle`,
+    so it can be handed to the workers and the safety supervisor directly.
+
+    Parameters
+    ----------
+    refresh
+        Re-send the last value if nothing was written for this many seconds
+        (None = never).
+    verify
+        Read the wiper back after every write and count mismatches; a value
+        that did not read back is sent again after RETRY s.
+    slew
+        Ramp a rising wiper at this many counts per second (None = step).
+    """
+
+    RETRY = 0.02                               # s, re-send after a failed readback
+
+    def __init__(self, throttle: Throttle, refresh: float = None, verify: bool = False,
+                 slew: float = None):
+        self.throttle = throttle
+        self.refresh = refresh
+        self.verify = verify
+        self.slew = SlewLimiter(slew) if slew else None
+        self._cv = threading.Condition()
+        self._pending = None
+        self._target = None                    # newest value, while ramping toward it
+        self._last = None                      # last value sent (intended, if unverified)
+        self._dirty = False                    # its readback failed: send it again
+        self._closed = False
+
+        # statistics
+        self.requested = 0
+        self.written = 0
+        self.refreshes = 0
+        self.verify_failures = 0
+
+        self._thread = threading.Thread(target=self._run, name="throttle-out", daemon=True)
+        self._thread.start()
+
+    @property
+    def enable(self):
+        """The drivetrain enable pin (GPIO 24), as on `Throttle`."""
+        return self.throttle.enable
+
+    # ------------------------------------------------------------------
+    # Public helpers
+    # ------------------------------------------------------------------
+    def set_wiper(self, value: int) -> None:
+        """Queue *value* (clamped 0-255); only the newest queued value is sent."""
+        value = max(0, min(255, int(value)))
+        with self._cv:
+            self.requested += 1
+            self._pending = value
+            self._cv.notify()
+
+    def enable_output(self, state: bool = True) -> None:
+        self.throttle.enable_output(state)
+
+    def disable(self) -> None:
+        """Drop the enable pin now and queue a zero wiper."""
+        self.throttle.enable_output(False)
+        self.set_wiper(0)
+
+    def flush(self, timeout: float = 1.0) -> bool:
+        """Wait until the queued value has been handled."""
+        with self._cv:
+            return self._cv.wait_for(lambda: self._pending is None, timeout)
+
+    def stats(self) -> dict:
+        sent = self.written - self.refreshes
+        return dict(requested=self.requested, written=self.written,
+                    refreshes=self.refreshes, saved=self.requested - sent,
+                    verify_failures=self.verify_failures,
+                    slew_limited=self.slew.limited if self.slew else 0)
+
+    def close(self) -> None:
+        self.flush()
+        with self._cv:
+            self._closed = True
+            self._cv.notify()
+        self._thread.join(timeout=1.0)
+        self.throttle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # ------------------------------------------------------------------
+    # Writer thread
+    # ------------------------------------------------------------------
+    def _run(self):
+        slew = self.slew
+        while True:
+            ramping = (slew is not None and self._target is not None
+                       and self._target != self._last)
+            timeout = (slew.tick if ramping else
+                       self.RETRY if self._dirty else self.refresh)
+            with self._cv:
+                self._cv.wait_for(lambda: self._pending is not None or self._closed,
+                                  timeout)
+                if self._closed:
+                    return
+                value, self._pending = self._pending, None
+                self._cv.notify_all()          # wake flush()
+            if slew is not None and (value is not None or ramping):
+                if value is not None:
+                    self._target = value
+                value = slew.next(self._target, self._last)
+            if value is None:                  # refresh period expired
+                if self._last is None:
+                    continue
+                value = self._last
+                self.refreshes += 1
+            elif value == self._last and not self._dirty:
+                continue
+            self.throttle.set_wiper(value)
+            self._last = value
+            self.written += 1
+            self._dirty = bool(self.verify and self.throttle.read_wiper() != value)
+            if self._dirty:
+                self.verify_failures += 1
+
 # ----------------------------------------------------------------------
 # Stand-alone test when executed directly
 # ----------------------------------------------------------------------
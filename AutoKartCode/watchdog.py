@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+watchdog.py – receiver link-loss watchdog with a bounded failsafe reaction
+
+Watches the receive time of the newest valid packet (the `t_rx` of the
+shared snapshot) and escalates when the link goes quiet:
+
+    age ≥ hold    HOLD      keep the last command, flag the link as stale
+    age ≥ zero    ZERO      queue throttle 0, workers stop commanding
+    age ≥ brake   FAILSAFE  drop GPIO-24, apply the brake, disable steering
+
+The watchdog sleeps on its own thread until exactly the next deadline, so
+its reaction never waits on the other workers; every action it takes is a
+GPIO write or a non-blocking queue/timer call.  For each FAILSAFE entry the
+time from the deadline to the enable pin going low is recorded; `stats()`
+reports it together with how often it exceeded `bound`.
+
+The first valid packet after a trip drops the level back to OK; the safety
+supervisor then re-enables the drive as it does after an e-stop.
+
+`start(..., thread=False)` skips the thread; the owner then calls `poll()`
+at (or after) the time it returns – the asyncio runtime does this with
+`loop.call_at`.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from eventlog import log, SRC_MAIN, EV_LINK
+
+OK, HOLD, ZERO, FAILSAFE = 0, 1, 2, 3
+LEVELS = ("OK", "HOLD", "ZERO", "FAILSAFE")
+
+
+class LinkWatchdog:
+    def __init__(self, state, hold: float = 0.35, zero: float = 0.6,
+                 brake: float = 1.0, bound: float = 0.02, on_change=None):
+        self.state = state
+        self.deadlines = (hold, zero, brake)
+        self.bound = bound
+        self.on_change = on_change
+        self.level = OK
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._acts = None
+
+        # statistics
+        self.trips = 0
+        self.reaction = deque(maxlen=256)     # deadline → enable low (s)
+        self.misses = 0
+
+    def start(self, throttle, steering, brake, thread: bool = True) -> None:
+        self._acts = (throttle, steering, brake)
+        if thread:
+            threading.Thread(target=self._run, name="link-watchdog", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def stats(self) -> dict:
+        r = sorted(self.reaction)
+        return dict(level=LEVELS[self.level], trips=self.trips, misses=self.misses,
+                    reaction_ms_max=r[-1] * 1e3 if r else None,
+                    reaction_ms_p50=r[len(r) // 2] * 1e3 if r else None)
+
+    # ------------------------------------------------------------------
+    def _run(self):
+        try:                                   # best effort: real-time priority
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(10))
+        except (AttributeError, OSError):
+            pass
+        while not self._stop.is_set():
+            nxt = self.poll()
+            self._wake.wait(max(0.0, nxt - time.monotonic()))
+
+    def poll(self) -> float:
+        """Re-evaluate the link age; returns when to poll next (monotonic)."""
+        t_rx = self.state.read().t_rx
+        now = time.monotonic()
+        age = now - t_rx
+        level = sum(age >= d for d in self.deadlines)
+        if level != self.level:
+            self._enter(level, t_rx)
+        if level < FAILSAFE:
+            return t_rx + self.deadlines[level]
+        return now + self.deadlines[0]         # tripped: look for packets again
+
+    def _enter(self, level: int, t_rx: float) -> None:
+        throttle, steering, brake = self._acts
+        prev, self.level = self.level, level
+        if level >= FAILSAFE > prev:
+            throttle.enable.off()              # first: the one that matters
+            t_low = time.monotonic()
+            late = t_low - (t_rx + self.deadlines[2])
+            self.reaction.append(late)
+            if late > self.bound:
+                self.misses += 1
+            self.trips += 1
+            throttle.set_wiper(0)
+            brake.apply()
+            steering.disable()
+        elif level >= ZERO > prev:
+            throttle.set_wiper(0)
+        log(SRC_MAIN, EV_LINK, level, prev)
+        if self.on_change is not None:
+            self.on_change()
@@ -0,0 +1,118 @@
+// cmd_vel_bridge – forwards geometry_msgs/Twist on /cmd_vel to the kart
+// controller's command socket (AutoKartCode/command_link.py).
+//
+// One 20-byte little-endian datagram per message:
+//   "AKC1", u32 seq, f64 CLOCK_MONOTONIC send time, i16 throttle 0-255,
+//   i8 steering (+1 left / 0 / -1 right), u8 brake
+//
+// The controller drops commands older than its --cmd-max-age, so this node
+// only needs to forward; when it stops publishing the kart brakes.  Sends
+// never block the callback: if the controller's queue is full the command
+// is dropped (and counted) – a newer one is on its way anyway.
+
+#include <sys/socket.h>
+#include <sys/un.h>
+#include <errno.h>
+#include <time.h>
+#include <unistd.h>
+
+#include <algorithm>
+#include <cmath>
+#include <cstdint>
+#include <cstring>
+#include <stdexcept>
+#include <memory>
+#include <string>
+
+#include "geometry_msgs/msg/twist.hpp"
+#include "rclcpp/rclcpp.hpp"
+
+class CmdVelBridge : public rclcpp::Node
+{
+public:
+  CmdVelBridge()
+  : Node("cmd_vel_bridge")
+  {
+    socket_path_ = declare_parameter<std::string>("socket_path", "/tmp/autokart-cmd.sock");
+    max_speed_ = declare_parameter<double>("max_speed", 2.0);        // m/s at full throttle
+    steer_deadband_ = declare_parameter<double>("steer_deadband", 0.05);  // rad/s
+    brake_speed_ = declare_parameter<double>("brake_speed", -0.05);  // linear.x below → brake
+
+    fd_ = socket(AF_UNIX, SOCK_DGRAM, 0);
+    if (fd_ < 0) {
+      throw std::runtime_error("cmd_vel_bridge: socket() failed");
+    }
+    std::memset(&addr_, 0, sizeof(addr_));
+    addr_.sun_family = AF_UNIX;
+    std::strncpy(addr_.sun_path, socket_path_.c_str(), sizeof(addr_.sun_path) - 1);
+
+    sub_ = create_subscription<geometry_msgs::msg::Twist>(
+      "cmd_vel", rclcpp::SensorDataQoS(),
+      [this](geometry_msgs::msg::Twist::ConstSharedPtr msg) {forward(*msg);});
+    RCLCPP_INFO(get_logger(), "cmd_vel → %s", socket_path_.c_str());
+  }
+
+  ~CmdVelBridge() override
+  {
+    close(fd_);
+  }
+
+private:
+  void forward(const geometry_msgs::msg::Twist & msg)
+  {
+    const double v = msg.linear.x;
+    const double w = msg.angular.z;
+    int16_t throttle = 0;
+    if (v > 0.0 && max_speed_ > 0.0) {
+      throttle = static_cast<int16_t>(std::lround(std::min(v / max_speed_, 1.0) * 255.0));
+    }
+    int8_t steering = w > steer_deadband_ ? 1 : (w < -steer_deadband_ ? -1 : 0);
+    uint8_t brake = v < brake_speed_ ? 1 : 0;
+
+    timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);    // same clock as Python's time.monotonic()
+    double t_sent = ts.tv_sec + ts.tv_nsec * 1e-9;
+
+    uint8_t buf[20];
+    uint32_t seq = ++seq_;
+    std::memcpy(buf, "AKC1", 4);             // host is little-endian (Pi / x86)
+    std::memcpy(buf + 4, &seq, 4);
+    std::memcpy(buf + 8, &t_sent, 8);
+    std::memcpy(buf + 16, &throttle, 2);
+    std::memcpy(buf + 18, &steering, 1);
+    std::memcpy(buf + 19, &brake, 1);
+
+    if (sendto(fd_, buf, sizeof(buf), MSG_DONTWAIT,
+      reinterpret_cast<const sockaddr *>(&addr_), sizeof(addr_)) < 0)
+    {
+      ++dropped_;
+      if (errno == EAGAIN || errno == EWOULDBLOCK) {
+        RCLCPP_WARN_THROTTLE(
+          get_logger(), *get_clock(), 2000,
+          "controller not draining %s (%lu dropped)", socket_path_.c_str(), dropped_);
+      } else {
+        RCLCPP_WARN_THROTTLE(
+          get_logger(), *get_clock(), 2000,
+          "controller not listening on %s", socket_path_.c_str());
+      }
+    }
+  }
+
+  std::string socket_path_;
+  double max_speed_;
+  double steer_deadband_;
+  double brake_speed_;
+  int fd_;
+  sockaddr_un addr_;
+  uint32_t seq_ = 0;
+  unsigned long dropped_ = 0;
+  rclcpp::Subscription<geometry_msgs::msg::Twist>::SharedPtr sub_;
+};
+
+int main(int argc, char ** argv)
+{
+  rclcpp::init(argc, argv);
+  rclcpp::spin(std::make_shared<CmdVelBridge>());
+  rclcpp::shutdown();
+  return 0;
+}